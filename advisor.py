@@ -1,74 +1,240 @@
-import openai
-import re
+import time
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from data_fetcher import CricketDataFetcher
+from data_fetcher import CricketDataFetcher, QUERY_TEMPLATES
 from database import VectorDatabase
 from langsmith import traceable
-from langchain_openai import ChatOpenAI 
+from clients import get_client_manager
+from response_cache import ResponseCache, source_fingerprint
+from result_cache import CachedResult
+from context_builder import build_context, approx_tokens
+import scoring
+import metrics
 import config
 
 class FantasyAdvisor:
     def __init__(self):
         self.data_fetcher = CricketDataFetcher()
         self.vector_db = VectorDatabase()
-        if config.OPENAI_API_KEY:
-             openai.api_key = config.OPENAI_API_KEY
+        self.clients = get_client_manager()
+        self.response_cache = None
+        if config.RESPONSE_CACHE_ENABLED:
+            self.response_cache = ResponseCache(
+                self.vector_db.get_embedding,
+                self.vector_db.dimension,
+                config.RESPONSE_CACHE_TTL_SECONDS,
+                config.RESPONSE_CACHE_DISTANCE,
+                config.RESPONSE_CACHE_MAX_ENTRIES
+            )
+
+    def _get_llm(self):
+        if not config.OPENAI_API_KEY:
+            raise ValueError("OpenAI API key is not set in config.")
+        return self.clients.llm()
+
+    def _generate(self, method: str, query: str, prompt_str: str, items: list, on_token=None, started: float = None):
+        """
+        Answer prompt_str with the LLM, or from the response cache when the same
+        (or a semantically close) query was answered from the same sources.
+        With on_token, the completion is streamed and on_token(text) is called
+        for each chunk as it arrives (once with the whole text on a cache hit).
+        Returns (text, cache_hit, time_to_first_token) with cache_hit "exact",
+        "semantic" or None, and the time measured from started.
+        """
+        started = started if started is not None else time.perf_counter()
+        first_token = []
+
+        def emit(text):
+            if not first_token:
+                first_token.append(time.perf_counter() - started)
+            if on_token is not None:
+                on_token(text)
+
+        def generate():
+            llm = self._get_llm()
+            with metrics.timer("llm"):
+                if on_token is None:
+                    message = llm.invoke(prompt_str)
+                    text = message.content
+                else:
+                    message = None
+                    chunks = []
+                    for chunk in llm.stream(prompt_str):
+                        if chunk.content:
+                            emit(chunk.content)
+                            chunks.append(chunk.content)
+                    text = "".join(chunks)
+            usage = getattr(message, "usage_metadata", None) or {}
+            metrics.record_llm_tokens(
+                usage.get("input_tokens") or approx_tokens(prompt_str),
+                usage.get("output_tokens") or approx_tokens(text)
+            )
+            return text
+
+        if self.response_cache is None:
+            text, cache_hit = generate(), None
+        else:
+            text, cache_hit = self.response_cache.get_or_generate(
+                method, query, prompt_str, source_fingerprint(items), generate
+            )
+            metrics.inc("cache_total", cache="response", result=cache_hit or "miss")
+        if not first_token:
+            emit(text)
+        return text, cache_hit, first_token[0]
+
+    def stream(self, method: str, *args, **kwargs):
+        """
+        Run one of the advisor methods (e.g. "get_player_recommendation") in
+        streaming mode. Yields ("token", text) as the LLM produces tokens, then
+        ("result", dict) with the usual result; errors are re-raised here.
+        """
+        events = queue.Queue()
+
+        def run():
+            try:
+                result = getattr(self, method)(*args, on_token=lambda t: events.put(("token", t)), **kwargs)
+                events.put(("result", result))
+            except Exception as e:
+                events.put(("error", e))
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), daemon=True).start()
+        while True:
+            kind, value = events.get()
+            if kind == "error":
+                raise value
+            yield kind, value
+            if kind == "result":
+                return
+
+    @traceable(name="local_retrieval", run_type="retriever")
+    def _local_results(self, method: str, params_list: list):
+        """
+        Look up each query of a QUERY_TEMPLATES method in the knowledge base.
+        Returns one result list per query, or None where the local store has
+        fewer than RETRIEVAL_MIN_HITS hits that are recent enough (by
+        metadata date), within RETRIEVAL_MAX_DISTANCE and about the query's
+        players or teams (see _is_about).
+        """
+        if not config.RETRIEVAL_LOCAL_FIRST:
+            return [None] * len(params_list)
+        queries = [QUERY_TEMPLATES[method].format(**params) for params in params_list]
+        max_age = config.RETRIEVAL_MAX_AGE.get(method, config.RETRIEVAL_DEFAULT_MAX_AGE)
+        try:
+            with metrics.timer("local_retrieval"):
+                found = self.vector_db.search_many(queries, config.RETRIEVAL_K, {"date_from": time.time() - max_age})
+        except Exception as e:
+            print(f"Warning: local retrieval for {method} failed: {e}")
+            return [None] * len(params_list)
+        local = []
+        for params, res in zip(params_list, found):
+            names = list(params.values())
+            hits = [h for h in res["hits"]
+                    if h["distance"] <= config.RETRIEVAL_MAX_DISTANCE and self._is_about(h, names)]
+            if len(hits) < config.RETRIEVAL_MIN_HITS:
+                local.append(None)
+                continue
+            local.append([
+                CachedResult(
+                    title=h["metadata"].get("title"),
+                    url=h["metadata"].get("url"),
+                    text=h["text"],
+                    published_date=h["metadata"].get("date")
+                )
+                for h in hits
+            ])
+        return local
+
+    @staticmethod
+    def _is_about(hit: dict, names: list) -> bool:
+        """
+        Whether a knowledge-base hit covers every player or team in names:
+        each must appear in its title or text, or be the refresh topic it
+        was fetched for. Embedding distance alone cannot tell one player's
+        news from another's.
+        """
+        metadata = hit["metadata"]
+        haystack = f"{metadata.get('title') or ''}\n{hit['text']}".lower()
+        topic = metadata.get("topic")
+        return all(
+            topic in (f"player:{name}", f"team:{name}") or name.lower() in haystack
+            for name in names
+        )
+
+    def _retrieve(self, method: str, **params):
+        """
+        Results for one advisor query and the path that served them:
+        "local" (knowledge base) or "exa".
+        """
+        results = self._local_results(method, [params])[0]
+        if results is not None:
+            return results, "local"
+        return getattr(self.data_fetcher, method)(**params)["results"], "exa"
 
     @traceable(name="update_knowledge_base", run_type="chain") 
+    @metrics.timed_request("update_knowledge_base")
     def update_knowledge_base(self):
         ipl_query = "Latest IPL cricket updates news player performance"
         ipl_resp = self.data_fetcher.get_player_data(ipl_query)
         ipl_results = ipl_resp["results"]
+        texts = []
+        metadatas = []
         for item in ipl_results:
             if hasattr(item, "text") and item.text:
-                self.vector_db.add_document(
-                    item.text,
-                    {"title": item.title, "url": item.url, "date": datetime.now().isoformat()}
-                )
+                texts.append(item.text)
+                metadatas.append({"title": item.title, "url": item.url, "date": datetime.now().isoformat()})
         inj_resp = self.data_fetcher.get_injury_updates()
         inj_results = inj_resp["results"]
         for item in inj_results:
             if hasattr(item, "text") and item.text:
-                self.vector_db.add_document(
-                    item.text,
-                    {"title": item.title, "url": item.url, "type": "injury", "date": datetime.now().isoformat()}
-                )
-        return {"status": "success", "docs_added": len(ipl_results) + len(inj_results)}
+                texts.append(item.text)
+                metadatas.append({"title": item.title, "url": item.url, "type": "injury", "date": datetime.now().isoformat()})
+        ingest = self.vector_db.add_documents(texts, metadatas)
+        return {
+            "status": "success",
+            "docs_added": ingest["added"] + ingest["replaced"],
+            "docs_replaced": ingest["replaced"],
+            "docs_skipped": ingest["skipped"]
+        }
 
-    @traceable(name="_assess_data_quality", run_type="chain") 
-    def _assess_data_quality(self, context: str):
-        length_score = min(len(context) / 10000, 1.0)
-        stats_pattern = r'\b\d+(?:\.\d+)?\s*(?:runs|wickets|average|strike rate|economy|points)\b'
-        stats_matches = re.findall(stats_pattern, context.lower())
-        stats_score = min(len(stats_matches) / 20, 1.0)
-        current_year = datetime.now().year
-        year_pattern = r'\b(20\d{2})\b'
-        years = [int(y) for y in re.findall(year_pattern, context)]
-        recency_score = 0.5
-        if years:
-            recent_years = [y for y in years if y >= current_year - 1]
-            recency_score = len(recent_years) / max(len(years), 1)
-        data_quality = 0.6 * length_score + 0.4 * stats_score
-        data_recency = recency_score
-        data_relevance = stats_score
-        return data_quality, data_recency, data_relevance
+    @traceable(name="build_context", run_type="chain")
+    def _build_context(self, items: list, query: str, token_budget: int = None, prefix: str = ""):
+        with metrics.timer("context_build"):
+            return build_context(
+                items,
+                query,
+                token_budget or config.CONTEXT_TOKEN_BUDGET,
+                config.CONTEXT_PASSAGE_TOKENS,
+                config.CONTEXT_DEDUPE_DISTANCE,
+                prefix
+            )
+
+    def _score(self, response: str, signals: dict):
+        """
+        Confidence fields of a result, from the response text and the
+        precomputed signals of the context it was generated from.
+        """
+        with metrics.timer("scoring"):
+            data_quality, data_recency, data_relevance = scoring.quality(signals)
+            confidence = scoring.confidence(response, data_quality, data_recency, data_relevance)
+        return {
+            "confidence_score": confidence,
+            "confidence_label": scoring.confidence_label(confidence),
+            "data_quality": data_quality,
+            "data_recency": data_recency,
+            "data_relevance": data_relevance
+        }
 
     @traceable(name="get_player_recommendation", run_type="chain") 
-    def get_player_recommendation(self, player_name: str):
-        player_resp = self.data_fetcher.get_player_data(player_name)
-        results = player_resp["results"]
-        context = ""
-        sources = 0
-        for item in results:
-            if hasattr(item, "text") and item.text:
-                context += f"Source: {item.title}\n{item.text}\n\n"
-                sources += 1
-        data_quality, data_recency, data_relevance = self._assess_data_quality(context)
-        
-        if not config.OPENAI_API_KEY:
-            raise ValueError("OpenAI API key is not set in config.")
-            
-        llm = ChatOpenAI(model_name=config.MODEL_NAME, openai_api_key=config.OPENAI_API_KEY) 
+    @metrics.timed_request("get_player_recommendation")
+    def get_player_recommendation(self, player_name: str, on_token=None):
+        started = time.perf_counter()
+        results, retrieval_path = self._retrieve("get_player_data", player_name=player_name)
+        context, used, signals = self._build_context(results, player_name)
+        sources = len(used)
 
         prompt_str = (
             f"You are a fantasy cricket expert advisor for IPL.\n"
@@ -76,191 +242,147 @@ class FantasyAdvisor:
             f"Include strengths, weaknesses, and specific statistics.\n\n{context}"
         )
 
-        recommendation_obj = llm.invoke(prompt_str)
-        recommendation = recommendation_obj.content 
-
-        uncertainty_phrases = [
-            "uncertain", "unclear", "might", "may", "could be",
-            "possibly", "perhaps", "not enough data", "limited information"
-        ]
-        certainty_factor = 1.0
-        for phrase in uncertainty_phrases:
-            if phrase in recommendation.lower():
-                certainty_factor *= 0.9
-        confidence = (
-            0.4 * data_quality + 0.3 * data_recency + 0.3 * data_relevance
-        ) * certainty_factor
-        confidence = max(0.0, min(confidence, 1.0))
-        label = (
-            "High Confidence" if confidence >= config.HIGH_CONFIDENCE else
-            "Medium Confidence" if confidence >= config.MEDIUM_CONFIDENCE else
-            "Low Confidence" if confidence >= config.LOW_CONFIDENCE else
-            "Very Low Confidence"
+        recommendation, cache_hit, time_to_first_token = self._generate(
+            "get_player_recommendation", player_name, prompt_str, used, on_token, started
         )
+
         return {
             "recommendation": recommendation,
-            "confidence_score": confidence,
-            "confidence_label": label,
+            **self._score(recommendation, signals),
             "sources_used": sources,
-            "data_quality": data_quality,
-            "data_recency": data_recency,
-            "data_relevance": data_relevance
+            "context_tokens": approx_tokens(context),
+            "cache_hit": cache_hit,
+            "retrieval_path": retrieval_path,
+            "time_to_first_token": time_to_first_token,
+            "total_latency": time.perf_counter() - started
         }
 
-    @traceable(name="get_team_advice", run_type="chain") 
-    def get_team_advice(self, team_name: str):
-        team_resp = self.data_fetcher.get_team_news(team_name)
-        items = team_resp["results"]
-        context = ""
-        sources = 0
-        for item in items:
-            if hasattr(item, "text") and item.text:
-                context += f"Source: {item.title}\n{item.text}\n\n"
-                sources += 1
-        data_quality, data_recency, data_relevance = self._assess_data_quality(context)
+    def get_player_recommendations(self, player_names: list, max_workers: int = None):
+        """
+        Recommend many players concurrently. Yields one dict per player as soon
+        as it is ready (completion order, not input order). A failed player
+        yields {"player": name, "error": "..."} and the batch carries on.
+        """
+        max_workers = max_workers or config.BATCH_MAX_WORKERS
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recommend") as pool:
+            futures = {pool.submit(self.get_player_recommendation, name): name for name in player_names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    yield {"player": name, "error": None, **future.result()}
+                except Exception as e:
+                    yield {"player": name, "error": str(e)}
 
-        if not config.OPENAI_API_KEY:
-            raise ValueError("OpenAI API key is not set in config.")
+    @traceable(name="get_team_advice", run_type="chain") 
+    @metrics.timed_request("get_team_advice")
+    def get_team_advice(self, team_name: str, on_token=None):
+        started = time.perf_counter()
+        items, retrieval_path = self._retrieve("get_team_news", team_name=team_name)
+        context, used, signals = self._build_context(items, team_name)
+        sources = len(used)
 
-        llm = ChatOpenAI(model_name=config.MODEL_NAME, openai_api_key=config.OPENAI_API_KEY) 
         prompt_str = (
             f"You are a fantasy cricket expert advisor for IPL.\n"
             f"Based on the following information about {team_name}, which players from this team should I consider for my fantasy team?\n"
             f"List the top 3–5 players with reasons:\n\n{context}"
         )
-        advice_obj = llm.invoke(prompt_str)
-        advice = advice_obj.content
-
-        uncertainty_phrases = [
-            "uncertain", "unclear", "might", "may", "could be",
-            "possibly", "perhaps", "not enough data", "limited information"
-        ]
-        certainty_factor = 1.0
-        for phrase in uncertainty_phrases:
-            if phrase in advice.lower():
-                certainty_factor *= 0.9
-        confidence = (
-            0.4 * data_quality + 0.3 * data_recency + 0.3 * data_relevance
-        ) * certainty_factor
-        confidence = max(0.0, min(confidence, 1.0))
-        label = (
-            "High Confidence" if confidence >= config.HIGH_CONFIDENCE else
-            "Medium Confidence" if confidence >= config.MEDIUM_CONFIDENCE else
-            "Low Confidence" if confidence >= config.LOW_CONFIDENCE else
-            "Very Low Confidence"
+        advice, cache_hit, time_to_first_token = self._generate(
+            "get_team_advice", team_name, prompt_str, used, on_token, started
         )
+
         return {
             "advice": advice,
-            "confidence_score": confidence,
-            "confidence_label": label,
+            **self._score(advice, signals),
             "sources_used": sources,
-            "data_quality": data_quality,
-            "data_recency": data_recency,
-            "data_relevance": data_relevance
+            "context_tokens": approx_tokens(context),
+            "cache_hit": cache_hit,
+            "retrieval_path": retrieval_path,
+            "time_to_first_token": time_to_first_token,
+            "total_latency": time.perf_counter() - started
         }
 
     @traceable(name="get_captain_recommendation", run_type="chain") 
-    def get_captain_recommendation(self, player_options: list):
+    @metrics.timed_request("get_captain_recommendation")
+    def get_captain_recommendation(self, player_options: list, on_token=None):
+        started = time.perf_counter()
         context = ""
         total_sources = 0
+        used = []
+        signal_parts = []
+        local = self._local_results("get_player_data", [{"player_name": p} for p in player_options])
+        player_data = {p: {"results": r} for p, r in zip(player_options, local) if r is not None}
+        missing = [p for p in player_options if p not in player_data]
+        if missing:
+            player_data.update(self.data_fetcher.gather_player_data(missing))
+        retrieval_paths = {p: "exa" if p in missing else "local" for p in player_options}
+        retrieval_path = (
+            "local" if not missing else
+            "exa" if len(missing) == len(player_options) else
+            "mixed"
+        )
         for player in player_options:
-            player_resp = self.data_fetcher.get_player_data(player)
-            for item in player_resp["results"][:2]:
-                if hasattr(item, "text") and item.text:
-                    snippet = item.text[:1000]
-                    context += f"Player: {player}\nSource: {item.title}\n{snippet}\n\n"
-                    total_sources += 1
-        data_quality, data_recency, data_relevance = self._assess_data_quality(context)
-        
-        if not config.OPENAI_API_KEY:
-            raise ValueError("OpenAI API key is not set in config.")
+            player_resp = player_data[player]
+            if isinstance(player_resp, Exception):
+                print(f"Warning: could not fetch data for {player}: {player_resp}")
+                continue
+            player_context, player_used, player_signals = self._build_context(
+                player_resp["results"],
+                player,
+                config.CONTEXT_TOKEN_BUDGET // max(len(player_options), 1),
+                f"Player: {player}\n"
+            )
+            context += player_context
+            total_sources += len(player_used)
+            used.extend(player_used)
+            signal_parts.append(player_signals)
+        signals = scoring.merge(signal_parts)
 
-        llm = ChatOpenAI(model_name=config.MODEL_NAME, openai_api_key=config.OPENAI_API_KEY) 
         prompt_str = (
             f"You are a fantasy cricket expert advisor for IPL.\n"
             f"Given these players: {', '.join(player_options)}, who should I select as captain for my fantasy team?\n"
             f"Compare their recent form with statistics:\n\n{context}"
         )
-        recommendation_obj = llm.invoke(prompt_str)
-        recommendation = recommendation_obj.content 
-        
-        uncertainty_phrases = [
-            "uncertain", "unclear", "might", "may", "could be",
-            "possibly", "perhaps", "not enough data", "limited information"
-        ]
-        certainty_factor = 1.0
-        for phrase in uncertainty_phrases:
-            if phrase in recommendation.lower():
-                certainty_factor *= 0.9
-        confidence = (
-            0.4 * data_quality + 0.3 * data_recency + 0.3 * data_relevance
-        ) * certainty_factor
-        confidence = max(0.0, min(confidence, 1.0))
-        label = (
-            "High Confidence" if confidence >= config.HIGH_CONFIDENCE else
-            "Medium Confidence" if confidence >= config.MEDIUM_CONFIDENCE else
-            "Low Confidence" if confidence >= config.LOW_CONFIDENCE else
-            "Very Low Confidence"
+        recommendation, cache_hit, time_to_first_token = self._generate(
+            "get_captain_recommendation", ", ".join(player_options), prompt_str, used, on_token, started
         )
+
         return {
             "recommendation": recommendation,
-            "confidence_score": confidence,
-            "confidence_label": label,
+            **self._score(recommendation, signals),
             "players_analyzed": player_options,
+            "retrieval_paths": retrieval_paths,
             "sources_used": total_sources,
-            "data_quality": data_quality,
-            "data_recency": data_recency,
-            "data_relevance": data_relevance
+            "context_tokens": approx_tokens(context),
+            "cache_hit": cache_hit,
+            "retrieval_path": retrieval_path,
+            "time_to_first_token": time_to_first_token,
+            "total_latency": time.perf_counter() - started
         }
 
     @traceable(name="get_match_analysis", run_type="chain")
-    def get_match_analysis(self, team1: str, team2: str):
-        match_resp = self.data_fetcher.get_match_predictions(team1, team2)
-        results = match_resp["results"]
-        context = ""
-        sources = 0
-        for item in results:
-            if hasattr(item, "text") and item.text:
-                context += f"Source: {item.title}\n{item.text}\n\n"
-                sources += 1
-        data_quality, data_recency, data_relevance = self._assess_data_quality(context)
+    @metrics.timed_request("get_match_analysis")
+    def get_match_analysis(self, team1: str, team2: str, on_token=None):
+        started = time.perf_counter()
+        results, retrieval_path = self._retrieve("get_match_predictions", team1=team1, team2=team2)
+        context, used, signals = self._build_context(results, f"{team1} {team2}")
+        sources = len(used)
 
-        if not config.OPENAI_API_KEY:
-            raise ValueError("OpenAI API key is not set in config.")
-            
-        llm = ChatOpenAI(model_name=config.MODEL_NAME, openai_api_key=config.OPENAI_API_KEY)
         prompt_str = (
             f"You are a fantasy cricket expert advisor for IPL.\n"
             f"Analyze the upcoming match between {team1} and {team2}. Provide fantasy recommendations including key players from both teams.\n\n{context}"
         )
-        analysis_obj = llm.invoke(prompt_str)
-        analysis = analysis_obj.content 
-
-        uncertainty_phrases = [
-            "uncertain", "unclear", "might", "may", "could be",
-            "possibly", "perhaps", "not enough data", "limited information"
-        ]
-        certainty_factor = 1.0
-        for phrase in uncertainty_phrases:
-            if phrase in analysis.lower():
-                certainty_factor *= 0.9
-        confidence = (
-            0.4 * data_quality + 0.3 * data_recency + 0.3 * data_relevance
-        ) * certainty_factor
-        confidence = max(0.0, min(confidence, 1.0))
-        label = (
-            "High Confidence" if confidence >= config.HIGH_CONFIDENCE else
-            "Medium Confidence" if confidence >= config.MEDIUM_CONFIDENCE else
-            "Low Confidence" if confidence >= config.LOW_CONFIDENCE else
-            "Very Low Confidence"
+        analysis, cache_hit, time_to_first_token = self._generate(
+            "get_match_analysis", f"{team1} vs {team2}", prompt_str, used, on_token, started
         )
+
         return {
             "analysis": analysis,
-            "confidence_score": confidence,
-            "confidence_label": label,
+            **self._score(analysis, signals),
             "teams_analyzed": [team1, team2],
             "sources_used": sources,
-            "data_quality": data_quality,
-            "data_recency": data_recency,
-            "data_relevance": data_relevance
+            "context_tokens": approx_tokens(context),
+            "cache_hit": cache_hit,
+            "retrieval_path": retrieval_path,
+            "time_to_first_token": time_to_first_token,
+            "total_latency": time.perf_counter() - started
         }
\ No newline at end of file
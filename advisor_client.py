@@ -0,0 +1,75 @@
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import config
+
+class AdvisorClient:
+    """
+    Thin client for a running `main.py --serve`, with the same methods as
+    FantasyAdvisor. Needs only the standard library.
+    """
+    def __init__(self, url: str, timeout: float = None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout or config.SERVER_TIMEOUT_SECONDS
+
+    def _post(self, method: str, params: dict):
+        request = urllib.request.Request(
+            f"{self.url}/{method}",
+            data=json.dumps(params).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f"Advisor server error {e.code}: {message}") from None
+
+    def _call(self, method: str, on_token=None, **params):
+        if on_token is None:
+            with self._post(method, params) as response:
+                return json.loads(response.read())
+        with self._post(method, {**params, "stream": True}) as response:
+            for line in response:
+                event = json.loads(line)
+                if "token" in event:
+                    on_token(event["token"])
+                elif "result" in event:
+                    return event["result"]
+                elif "error" in event:
+                    raise RuntimeError(f"Advisor server error: {event['error']}")
+        raise RuntimeError("Advisor server closed the stream without a result")
+
+    def health(self):
+        with urllib.request.urlopen(f"{self.url}/health", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def update_knowledge_base(self):
+        return self._call("update_knowledge_base")
+
+    def get_player_recommendation(self, player_name: str, on_token=None):
+        return self._call("get_player_recommendation", on_token, player_name=player_name)
+
+    def get_player_recommendations(self, player_names: list, max_workers: int = None):
+        max_workers = max_workers or config.BATCH_MAX_WORKERS
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recommend") as pool:
+            futures = {pool.submit(self.get_player_recommendation, name): name for name in player_names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    yield {"player": name, "error": None, **future.result()}
+                except Exception as e:
+                    yield {"player": name, "error": str(e)}
+
+    def get_team_advice(self, team_name: str, on_token=None):
+        return self._call("get_team_advice", on_token, team_name=team_name)
+
+    def get_captain_recommendation(self, player_options: list, on_token=None):
+        return self._call("get_captain_recommendation", on_token, player_options=player_options)
+
+    def get_match_analysis(self, team1: str, team2: str, on_token=None):
+        return self._call("get_match_analysis", on_token, team1=team1, team2=team2)
@@ -0,0 +1,111 @@
+import math
+import faiss
+import numpy as np
+import config
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+def index_type(index) -> str:
+    """
+    Name of the backend an index was built with, as used in config.VECTOR_INDEX_TYPE.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def _nlist_for(n: int) -> int:
+    # FAISS wants roughly 39+ training points per centroid.
+    return max(1, min(config.IVF_NLIST, n // 39, int(4 * math.sqrt(max(n, 1)))))
+
+def build_index(kind: str, dimension: int, training_vectors=None):
+    """
+    Create an empty index of the given kind. IVF variants are trained on
+    training_vectors, which is required for them.
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {kind!r}. Expected one of {', '.join(INDEX_TYPES)}.")
+    if kind == "flat":
+        return faiss.IndexFlatL2(dimension)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, config.HNSW_M)
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+        configure_search(index)
+        return index
+    if training_vectors is None or len(training_vectors) == 0:
+        raise ValueError(f"Index type {kind!r} needs training vectors")
+    sample = training_vectors
+    if len(sample) > config.INDEX_TRAINING_SAMPLE:
+        rng = np.random.default_rng(0)
+        sample = sample[rng.choice(len(sample), config.INDEX_TRAINING_SAMPLE, replace=False)]
+    nlist = _nlist_for(len(sample))
+    quantizer = faiss.IndexFlatL2(dimension)
+    if kind == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, config.PQ_M, 8)
+    index.train(np.ascontiguousarray(sample, dtype=np.float32))
+    configure_search(index)
+    return index
+
+def configure_search(index, nprobe: int = None, ef_search: int = None):
+    """
+    Apply query-time knobs (IVF nprobe, HNSW efSearch) from config or overrides.
+    Returns the index passed in; the downcast view does not own the C++ object.
+    """
+    concrete = faiss.downcast_index(index)
+    if isinstance(concrete, faiss.IndexIVF):
+        concrete.nprobe = min(nprobe or config.IVF_NPROBE, concrete.nlist)
+    elif isinstance(concrete, faiss.IndexHNSW):
+        concrete.hnsw.efSearch = ef_search or config.HNSW_EF_SEARCH
+    return index
+
+def reconstruct_all(index):
+    """
+    All stored vectors in id order. IVF indexes need a direct map for this,
+    and IVF-PQ returns the (lossy) decoded vectors.
+    """
+    if isinstance(faiss.downcast_index(index), faiss.IndexIVF):
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def reconstruct_ids(index, ids):
+    """
+    Stored vectors for the given ids, in the given order.
+    """
+    concrete = faiss.downcast_index(index)
+    if isinstance(concrete, faiss.IndexIVF) and concrete.direct_map.type == faiss.DirectMap.NoMap:
+        concrete.make_direct_map()
+    return index.reconstruct_batch(np.ascontiguousarray(ids, dtype=np.int64))
+
+def search_params(index, selector):
+    """
+    SearchParameters carrying an IDSelector plus the index's own query knobs.
+    """
+    concrete = faiss.downcast_index(index)
+    if isinstance(concrete, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=concrete.nprobe)
+    if isinstance(concrete, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=concrete.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+def should_promote(index, kind: str = None) -> bool:
+    kind = kind or config.VECTOR_INDEX_TYPE
+    return kind != "flat" and index_type(index) == "flat" and \
+        index.ntotal >= config.INDEX_PROMOTION_THRESHOLD
+
+def promote(index, kind: str = None):
+    """
+    Rebuild a flat index as the configured ANN type. Vectors are re-added in
+    their original order, so FAISS ids (and the documents mapping) are unchanged.
+    """
+    kind = kind or config.VECTOR_INDEX_TYPE
+    vectors = reconstruct_all(index)
+    new_index = build_index(kind, index.d, vectors)
+    for start in range(0, len(vectors), 65536):
+        new_index.add(vectors[start:start + 65536])
+    return new_index
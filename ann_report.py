@@ -0,0 +1,117 @@
+"""
+Recall@k versus latency of the ANN index types against the flat baseline.
+
+Uses the vectors in the local store when it has enough of them, otherwise a
+synthetic clustered set of the same dimension:
+
+    python ann_report.py --k 10 --queries 200
+    python ann_report.py --synthetic 200000 --json ann_report.json
+"""
+import os
+import json
+import time
+import argparse
+import faiss
+import numpy as np
+import config
+import ann_index
+
+def load_vectors(min_vectors: int):
+    path = f"{config.VECTOR_DB_PATH}/faiss_index.bin"
+    if not os.path.exists(path):
+        return None
+    index = faiss.read_index(path)
+    if index.ntotal < min_vectors:
+        return None
+    return ann_index.reconstruct_all(index)
+
+def synthetic_vectors(n: int, dimension: int, clusters: int = 256, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+def measure(index, queries, k: int, truth=None):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    recall = 1.0
+    if truth is not None:
+        found = sum(len(set(row) & set(t)) for row, t in zip(ids, truth))
+        recall = found / truth.size
+    return {
+        "recall_at_k": recall,
+        "latency_ms_per_query": 1000 * elapsed / len(queries),
+        "qps": len(queries) / elapsed if elapsed else float("inf")
+    }, ids
+
+def run_report(vectors, kinds, k: int, num_queries: int, nprobes, ef_searches):
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    flat = ann_index.build_index("flat", vectors.shape[1])
+    flat.add(vectors)
+    baseline, truth = measure(flat, queries, k)
+    rows = [dict(index_type="flat", setting="exact", build_s=0.0, **baseline)]
+
+    for kind in kinds:
+        if kind == "flat":
+            continue
+        start = time.perf_counter()
+        index = ann_index.build_index(kind, vectors.shape[1], vectors)
+        index.add(vectors)
+        build_s = time.perf_counter() - start
+        if kind == "hnsw":
+            settings = [("efSearch", ef) for ef in ef_searches]
+        else:
+            settings = [("nprobe", p) for p in nprobes]
+        for name, value in settings:
+            if name == "efSearch":
+                ann_index.configure_search(index, ef_search=value)
+            else:
+                ann_index.configure_search(index, nprobe=value)
+            result, _ = measure(index, queries, k, truth)
+            rows.append(dict(index_type=kind, setting=f"{name}={value}", build_s=build_s, **result))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN recall@k vs latency report")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Use N synthetic vectors instead of the local store")
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--types", default=",".join(ann_index.INDEX_TYPES))
+    parser.add_argument("--nprobe", default="1,4,16,64", help="IVF nprobe values to sweep")
+    parser.add_argument("--ef-search", default="16,32,64,128", help="HNSW efSearch values to sweep")
+    parser.add_argument("--json", help="Also write the rows to this file")
+    args = parser.parse_args()
+
+    vectors = None if args.synthetic else load_vectors(min_vectors=1000)
+    if vectors is None:
+        n = args.synthetic or 50000
+        print(f"Using {n} synthetic vectors of dimension {args.dimension}")
+        vectors = synthetic_vectors(n, args.dimension)
+    else:
+        print(f"Using {len(vectors)} vectors from {config.VECTOR_DB_PATH}")
+
+    rows = run_report(
+        vectors,
+        [t.strip() for t in args.types.split(",") if t.strip()],
+        args.k,
+        args.queries,
+        [int(v) for v in args.nprobe.split(",")],
+        [int(v) for v in args.ef_search.split(",")]
+    )
+    print(f"{'index':<10} {'setting':<14} {'recall@' + str(args.k):>10} {'ms/query':>10} {'qps':>10} {'build s':>9}")
+    for row in rows:
+        print(f"{row['index_type']:<10} {row['setting']:<14} {row['recall_at_k']:>10.3f} "
+              f"{row['latency_ms_per_query']:>10.3f} {row['qps']:>10.0f} {row['build_s']:>9.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"k": args.k, "num_vectors": len(vectors), "rows": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+"""
+Offline benchmark for the advisor pipeline, with deterministic local
+stand-ins for Exa search, OpenAI embeddings and the chat model, so it runs
+without API keys or network access.
+
+Phases:
+  ingest   update_knowledge_base throughput (documents per second)
+  search   VectorDatabase.search latency as the index grows (default 1k to 1M)
+  methods  end-to-end latency of each FantasyAdvisor method
+
+Each fake can add simulated latency. Results, peak RSS and the run's settings
+are written as JSON so runs can be compared:
+
+    python benchmark.py
+    python benchmark.py --phases search --sizes 1000 100000 1000000 --index-type ivf_pq
+    python benchmark.py --exa-ms 800 --embedding-ms 150 --llm-ms 400 --llm-token-ms 20 --stream
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from functools import lru_cache
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+import numpy as np
+import config
+import metrics
+
+PLAYERS = [
+    "Virat Kohli", "MS Dhoni", "Rohit Sharma", "Jasprit Bumrah", "Shubman Gill",
+    "Rashid Khan", "Suryakumar Yadav", "Hardik Pandya", "Ravindra Jadeja", "KL Rahul",
+    "Yuzvendra Chahal", "Rishabh Pant", "Andre Russell", "Sunil Narine", "Jos Buttler",
+    "Mohammed Siraj",
+]
+TEAMS = [
+    "Chennai Super Kings", "Mumbai Indians", "Royal Challengers Bengaluru", "Kolkata Knight Riders",
+    "Sunrisers Hyderabad", "Rajasthan Royals", "Delhi Capitals", "Punjab Kings",
+    "Lucknow Super Giants", "Gujarat Titans",
+]
+VENUES = ["Wankhede Stadium", "Eden Gardens", "Chepauk", "Chinnaswamy Stadium", "Narendra Modi Stadium"]
+SOURCES = ["espncricinfo.com", "cricbuzz.com", "iplt20.com", "ndtvsports.com"]
+SENTENCES = [
+    "{player} scored {runs} runs off {balls} balls against {team} in {year}.",
+    "{player} took {wickets} wickets for {conceded} runs in four overs at {venue}.",
+    "{player} has a strike rate of {sr} and an average of {avg} this season.",
+    "{team} are expected to bat {player} at number {position} in the next match.",
+    "Reports suggest {player} is doubtful with a hamstring strain before the {team} game.",
+    "{team} may rest {player} at {venue}, where the pitch has favoured spinners.",
+    "{player} has an economy rate of {economy} in the powerplay since {year}.",
+    "Analysts expect {player} to be a popular fantasy pick against {team}.",
+]
+
+def _rng(*parts):
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode("utf-8")).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], "little"))
+
+def _sleep(ms: float):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+def fake_text(seed, max_chars: int) -> str:
+    """
+    Deterministic cricket-flavoured prose of up to max_chars characters.
+    """
+    rng = _rng("text", seed)
+    sentences = []
+    length = 0
+    while True:
+        sentence = SENTENCES[rng.integers(len(SENTENCES))].format(
+            player=PLAYERS[rng.integers(len(PLAYERS))],
+            team=TEAMS[rng.integers(len(TEAMS))],
+            venue=VENUES[rng.integers(len(VENUES))],
+            runs=rng.integers(0, 130), balls=rng.integers(6, 70), wickets=rng.integers(0, 6),
+            conceded=rng.integers(10, 60), sr=rng.integers(90, 220), avg=rng.integers(10, 60),
+            position=rng.integers(1, 8), economy=round(float(rng.uniform(5, 12)), 1),
+            year=rng.integers(2019, 2026)
+        )
+        if length + len(sentence) + 1 > max_chars:
+            break
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)
+
+@lru_cache(maxsize=50000)
+def _token_vector(token: str, dimension: int):
+    return _rng("token", token).standard_normal(dimension).astype(np.float32)
+
+def fake_embedding(text: str, dimension: int):
+    """
+    Hashed bag-of-words vector, L2-normalized: deterministic, and texts that
+    share words land close together, so local retrieval behaves plausibly.
+    """
+    tokens = re.findall(r"\w+", text.lower()) or [""]
+    vector = np.sum([_token_vector(token, dimension) for token in tokens], axis=0)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+class FakeExa:
+    """
+    Stands in for Exa.search_and_contents. Every call returns new documents
+    (seeded by the query and the call number), so repeated ingests add data.
+    """
+    def __init__(self, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search_and_contents(self, query: str, text=None, num_results: int = None, **kwargs):
+        with self._lock:
+            call = self.calls
+            self.calls += 1
+        _sleep(self.latency_ms)
+        max_chars = text.get("max_characters", config.MAX_CHARS) if isinstance(text, dict) else config.MAX_CHARS
+        published = datetime.now() - timedelta(hours=call % 72)
+        results = []
+        for i in range(num_results or config.MAX_RESULTS):
+            seed = f"{query}|{call}|{i}"
+            slug = hashlib.sha256(seed.encode("utf-8")).hexdigest()[:16]
+            results.append(SimpleNamespace(
+                id=slug,
+                title=f"{query[:60]} ({i + 1})",
+                url=f"https://www.{SOURCES[i % len(SOURCES)]}/news/{slug}",
+                text=fake_text(seed, max_chars),
+                published_date=published.isoformat(),
+                author=None,
+                score=1.0 - i / 100
+            ))
+        return SimpleNamespace(results=results)
+
+class FakeEmbeddings:
+    """
+    Stands in for openai.OpenAI().embeddings.
+    """
+    def __init__(self, dimension: int = 1536, latency_ms: float = 0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, model: str, input):
+        with self._lock:
+            self.calls += 1
+        _sleep(self.latency_ms)
+        texts = [input] if isinstance(input, str) else list(input)
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=fake_embedding(t, self.dimension)) for i, t in enumerate(texts)],
+            usage=SimpleNamespace(total_tokens=sum(len(t.split()) for t in texts))
+        )
+
+class FakeChatModel:
+    """
+    Stands in for ChatOpenAI: invoke() and stream(). latency_ms is the delay
+    before the first token, token_latency_ms the delay per streamed word.
+    """
+    def __init__(self, latency_ms: float = 0, token_latency_ms: float = 0, words: int = 150):
+        self.latency_ms = latency_ms
+        self.token_latency_ms = token_latency_ms
+        self.words = words
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        words = fake_text(prompt, self.words * 8).split()[:self.words]
+        return "Recommendation: " + " ".join(words)
+
+    def _usage(self, prompt: str, text: str):
+        return {"input_tokens": len(prompt.split()), "output_tokens": len(text.split())}
+
+    def invoke(self, prompt):
+        self.calls += 1
+        prompt = str(prompt)
+        text = self._answer(prompt)
+        _sleep(self.latency_ms + self.token_latency_ms * len(text.split()))
+        return SimpleNamespace(content=text, usage_metadata=self._usage(prompt, text))
+
+    def stream(self, prompt):
+        self.calls += 1
+        prompt = str(prompt)
+        _sleep(self.latency_ms)
+        for word in self._answer(prompt).split(" "):
+            _sleep(self.token_latency_ms)
+            yield SimpleNamespace(content=word + " ")
+
+def install_fakes(exa_ms: float = 0, embedding_ms: float = 0, llm_ms: float = 0, llm_token_ms: float = 0):
+    """
+    Put the fakes behind the shared ClientManager, so every component that
+    asks it for a client gets a fake. Must run before the advisor is built.
+    """
+    from clients import get_client_manager
+    manager = get_client_manager()
+    fakes = SimpleNamespace(
+        exa=FakeExa(exa_ms),
+        embeddings=FakeEmbeddings(1536, embedding_ms),
+        llm=FakeChatModel(llm_ms, llm_token_ms)
+    )
+    with manager._lock:
+        manager._exa = fakes.exa
+        manager._openai = SimpleNamespace(embeddings=fakes.embeddings)
+        manager._llm = fakes.llm
+    return fakes
+
+def use_data_dir(path: str):
+    """
+    Point every on-disk store at path, so runs never touch the real data.
+    """
+    os.makedirs(path, exist_ok=True)
+    config.VECTOR_DB_PATH = path
+    config.EMBEDDING_CACHE_PATH = f"{path}/embedding_cache"
+    config.FETCH_CACHE_PATH = f"{path}/fetch_cache.sqlite3"
+    config.TELEMETRY_SPILL_PATH = f"{path}/telemetry_spill.jsonl"
+
+def summarize(samples) -> dict:
+    """
+    Milliseconds summary of a list of durations in seconds.
+    """
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]).tolist()
+    return {"count": len(ms), "mean": float(ms.mean()), "p50": p50, "p95": p95, "p99": p99, "max": float(ms.max())}
+
+def stage_breakdown() -> dict:
+    """
+    Total seconds and calls per pipeline stage since the last metrics reset.
+    """
+    snapshot = metrics.registry.snapshot()
+    return {
+        entry["labels"]["stage"]: {"seconds": entry["sum"], "calls": entry["count"]}
+        for entry in snapshot["histograms"].get("stage_seconds", [])
+    }
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def bench_ingest(data_dir: str, rounds: int):
+    from advisor import FantasyAdvisor
+    use_data_dir(data_dir)
+    # Every round must reach the (fake) search API to get new documents.
+    fetch_cache, config.FETCH_CACHE_ENABLED = config.FETCH_CACHE_ENABLED, False
+    try:
+        advisor = FantasyAdvisor()
+    finally:
+        config.FETCH_CACHE_ENABLED = fetch_cache
+    metrics.registry.reset()
+    durations = []
+    added = skipped = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = advisor.update_knowledge_base()
+        durations.append(time.perf_counter() - started)
+        added += result["docs_added"]
+        skipped += result["docs_skipped"]
+    total = sum(durations)
+    advisor.vector_db.close()
+    return {
+        "rounds": rounds,
+        "docs_added": added,
+        "docs_skipped": skipped,
+        "seconds": total,
+        "docs_per_second": added / total if total else None,
+        "round_ms": summarize(durations),
+        "stages": stage_breakdown(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def synthetic_chunks(n: int, dimension: int, chunk_size: int, seed: int = 0, clusters: int = 256):
+    """
+    n clustered vectors in chunks, without holding them all in memory.
+    """
+    centers = np.random.default_rng(seed).standard_normal((clusters, dimension)).astype(np.float32)
+    for start in range(0, n, chunk_size):
+        rng = np.random.default_rng([seed, start])
+        size = min(chunk_size, n - start)
+        labels = rng.integers(0, clusters, size=size)
+        yield np.ascontiguousarray(centers[labels] + 0.3 * rng.standard_normal((size, dimension), dtype=np.float32))
+
+def index_kind_for(n: int, index_type: str) -> str:
+    # The same rule VectorDatabase applies when it promotes its flat index.
+    return index_type if index_type != "flat" and n >= config.INDEX_PROMOTION_THRESHOLD else "flat"
+
+def estimated_index_bytes(kind: str, n: int, dimension: int) -> int:
+    if kind == "ivf_pq":
+        return n * (config.PQ_M + 8)
+    if kind == "hnsw":
+        return n * (4 * dimension + 8 * config.HNSW_M)
+    return n * 4 * dimension
+
+def available_memory_bytes():
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def load_synthetic_store(db, n: int, kind: str, chunk_size: int = 20000):
+    """
+    Fill an empty VectorDatabase with n synthetic documents and vectors,
+    written straight to the index and stores (no embedding calls, no WAL).
+    Dates rise with the id, spread over the last 60 days.
+    """
+    import ann_index
+    if kind == "flat":
+        db.index = ann_index.build_index("flat", db.dimension)
+    else:
+        training = next(synthetic_chunks(min(n, config.INDEX_TRAINING_SAMPLE), db.dimension, config.INDEX_TRAINING_SAMPLE, seed=1))
+        db.index = ann_index.build_index(kind, db.dimension, training)
+    first = datetime.now() - timedelta(days=60)
+    step = timedelta(days=60) / n
+    doc_id = 0
+    for chunk in synthetic_chunks(n, db.dimension, chunk_size):
+        db.index.add(chunk)
+        for _ in range(len(chunk)):
+            metadata = {
+                "title": f"Synthetic document {doc_id}",
+                "url": f"https://www.{SOURCES[doc_id % len(SOURCES)]}/doc/{doc_id}",
+                "date": (first + step * doc_id).isoformat(),
+            }
+            if doc_id % 10 == 0:
+                metadata["type"] = "injury"
+            db.documents.append(f"Synthetic document {doc_id} about {PLAYERS[doc_id % len(PLAYERS)]}.", metadata)
+            db.metadata_index.add(doc_id, metadata)
+            doc_id += 1
+    db.documents.flush()
+
+def time_searches(db, queries: list, k: int, filters: dict = None):
+    metrics.registry.reset()
+    durations = []
+    for query in queries:
+        started = time.perf_counter()
+        db.search(query, k, filters)
+        durations.append(time.perf_counter() - started)
+    return summarize(durations), summarize(metrics.registry.samples("stage_seconds", stage="faiss_search"))
+
+def bench_search(data_dir: str, sizes: list, index_type: str, num_queries: int, k: int):
+    from database import VectorDatabase
+    rows = []
+    for n in sizes:
+        kind = index_kind_for(n, index_type)
+        needed = estimated_index_bytes(kind, n, 1536)
+        available = available_memory_bytes()
+        if available is not None and needed > 0.8 * available:
+            print(f"Skipping search at {n} vectors: a {kind} index needs about {needed / 2**30:.1f} GiB, "
+                  f"{available / 2**30:.1f} GiB available. Try --index-type ivf_pq.")
+            rows.append({"size": n, "index_type": kind, "skipped": "insufficient memory"})
+            continue
+        use_data_dir(f"{data_dir}/search_{n}")
+        db = VectorDatabase()
+        print(f"Loading {n} synthetic vectors ({kind} index)...")
+        started = time.perf_counter()
+        load_synthetic_store(db, n, kind)
+        build_seconds = time.perf_counter() - started
+        queries = [f"{PLAYERS[i % len(PLAYERS)]} form against {TEAMS[i % len(TEAMS)]} query {i}" for i in range(num_queries)]
+        for query in queries[:5]:
+            db.search(query, k)
+        search_ms, faiss_ms = time_searches(db, queries, k)
+        week_ago = (datetime.now() - timedelta(days=7)).isoformat()
+        filtered_ms, filtered_faiss_ms = time_searches(db, [f"{q} filtered" for q in queries], k, {"date_from": week_ago})
+        rows.append({
+            "size": n,
+            "index_type": kind,
+            "build_seconds": build_seconds,
+            "search_ms": search_ms,
+            "faiss_search_ms": faiss_ms,
+            "filtered_search_ms": filtered_ms,
+            "filtered_faiss_search_ms": filtered_faiss_ms,
+            "peak_rss_mb": peak_rss_mb(),
+        })
+        db.close()
+        del db
+        shutil.rmtree(f"{data_dir}/search_{n}", ignore_errors=True)
+    return rows
+
+METHOD_ARGS = {
+    "get_player_recommendation": lambda i: (PLAYERS[i % len(PLAYERS)],),
+    "get_team_advice": lambda i: (TEAMS[i % len(TEAMS)],),
+    "get_captain_recommendation": lambda i: ([PLAYERS[(i + j) % len(PLAYERS)] for j in range(3)],),
+    "get_match_analysis": lambda i: (TEAMS[i % len(TEAMS)], TEAMS[(i + 1) % len(TEAMS)]),
+}
+
+def bench_methods(data_dir: str, iterations: int, warmup_rounds: int, stream: bool):
+    from advisor import FantasyAdvisor
+    use_data_dir(data_dir)
+    advisor = FantasyAdvisor()
+    for _ in range(warmup_rounds):
+        advisor.update_knowledge_base()
+    on_token = (lambda text: None) if stream else None
+    results = {}
+    for method, make_args in METHOD_ARGS.items():
+        metrics.registry.reset()
+        durations = []
+        first_tokens = []
+        cache_hits = {}
+        paths = {}
+        for i in range(iterations):
+            started = time.perf_counter()
+            result = getattr(advisor, method)(*make_args(i), on_token=on_token)
+            durations.append(time.perf_counter() - started)
+            first_tokens.append(result["time_to_first_token"])
+            hit = result.get("cache_hit") or "miss"
+            cache_hits[hit] = cache_hits.get(hit, 0) + 1
+            path = result.get("retrieval_path")
+            paths[path] = paths.get(path, 0) + 1
+        results[method] = {
+            "latency_ms": summarize(durations),
+            "time_to_first_token_ms": summarize(first_tokens),
+            "response_cache": cache_hits,
+            "retrieval_paths": paths,
+            "stages": stage_breakdown(),
+        }
+    advisor.vector_db.close()
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark with fake Exa and OpenAI backends")
+    parser.add_argument("--phases", nargs="+", choices=["ingest", "search", "methods"], default=["ingest", "search", "methods"])
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write the results to")
+    parser.add_argument("--ingest-rounds", type=int, default=20, help="update_knowledge_base calls in the ingest phase")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000], help="Index sizes for the search phase")
+    parser.add_argument("--index-type", choices=["flat", "ivf_flat", "hnsw", "ivf_pq"], default=config.VECTOR_INDEX_TYPE,
+                        help="Index type used past INDEX_PROMOTION_THRESHOLD vectors (default: VECTOR_INDEX_TYPE)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per index size")
+    parser.add_argument("--k", type=int, default=config.RETRIEVAL_K)
+    parser.add_argument("--iterations", type=int, default=10, help="Calls per advisor method")
+    parser.add_argument("--warmup-rounds", type=int, default=3, help="update_knowledge_base calls before timing the advisor methods")
+    parser.add_argument("--stream", action="store_true", help="Call the advisor methods with on_token, as --stream does")
+    parser.add_argument("--exa-ms", type=float, default=0, help="Simulated latency per Exa search")
+    parser.add_argument("--embedding-ms", type=float, default=0, help="Simulated latency per embeddings request")
+    parser.add_argument("--llm-ms", type=float, default=0, help="Simulated LLM latency before the first token")
+    parser.add_argument("--llm-token-ms", type=float, default=0, help="Simulated LLM latency per generated word")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the temporary data directory")
+    args = parser.parse_args()
+
+    # Offline: never send traces, whatever the environment says.
+    os.environ["LANGSMITH_TRACING"] = "false"
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    fakes = install_fakes(args.exa_ms, args.embedding_ms, args.llm_ms, args.llm_token_ms)
+    data_dir = tempfile.mkdtemp(prefix="ipl-benchmark-")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "config": {
+                name: getattr(config, name) for name in (
+                    "VECTOR_INDEX_TYPE", "INDEX_PROMOTION_THRESHOLD", "EMBEDDING_BATCH_SIZE", "MAX_RESULTS",
+                    "MAX_CHARS", "RETRIEVAL_LOCAL_FIRST", "RESPONSE_CACHE_ENABLED", "CONTEXT_TOKEN_BUDGET",
+                )
+            },
+        }
+    }
+    try:
+        if "ingest" in args.phases:
+            print(f"Ingest: {args.ingest_rounds} update_knowledge_base rounds...")
+            report["ingest"] = bench_ingest(f"{data_dir}/ingest", args.ingest_rounds)
+            print(f"  {report['ingest']['docs_added']} documents at {report['ingest']['docs_per_second']:.1f} docs/s")
+        if "search" in args.phases:
+            report["search"] = bench_search(data_dir, args.sizes, args.index_type, args.queries, args.k)
+            for row in report["search"]:
+                if "skipped" not in row:
+                    print(f"  {row['size']:>8} {row['index_type']:<8} search p50 {row['search_ms']['p50']:.2f} ms, "
+                          f"p99 {row['search_ms']['p99']:.2f} ms, filtered p50 {row['filtered_search_ms']['p50']:.2f} ms")
+        if "methods" in args.phases:
+            print(f"Methods: {args.iterations} calls each...")
+            report["methods"] = bench_methods(f"{data_dir}/methods", args.iterations, args.warmup_rounds, args.stream)
+            for method in METHOD_ARGS:
+                latency = report["methods"][method]["latency_ms"]
+                print(f"  {method:<28} p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms")
+    finally:
+        if not args.keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report["fake_calls"] = {"exa": fakes.exa.calls, "embeddings": fakes.embeddings.calls, "llm": fakes.llm.calls}
+    report["peak_rss_mb"] = peak_rss_mb()
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Peak RSS {report['peak_rss_mb']:.0f} MB. Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
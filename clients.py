@@ -0,0 +1,230 @@
+import os
+import re
+import json
+import time
+import random
+import weakref
+import threading
+import httpx
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from exa_py import Exa
+from exa_py.api import ExaJSONEncoder
+import config
+import metrics
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_STATUS_RE = re.compile(r"status code (\d{3})")
+
+class PooledExa(Exa):
+    """
+    Exa client whose plain GET/POST calls go through a shared requests.Session,
+    so connections are kept alive and reused. Streaming and other methods fall
+    back to the stock implementation.
+    """
+    def __init__(self, api_key: str, session: requests.Session, timeout: float):
+        super().__init__(api_key)
+        self._session = session
+        self._timeout = timeout
+
+    def request(self, endpoint, data=None, method="POST", params=None, headers=None):
+        request_headers = {**self.headers, **(headers or {})}
+        streaming = (
+            (isinstance(data, dict) and data.get("stream"))
+            or (params and params.get("stream") == "true")
+            or request_headers.get("Accept") == "text/event-stream"
+        )
+        if streaming or method.upper() not in ("GET", "POST"):
+            return super().request(endpoint, data, method, params, headers)
+        if isinstance(data, str):
+            json_data = data
+        else:
+            json_data = json.dumps(data, cls=ExaJSONEncoder) if data else None
+        res = self._session.request(
+            method.upper(),
+            self.base_url + endpoint,
+            data=json_data if method.upper() == "POST" else None,
+            params=params,
+            headers=request_headers,
+            timeout=self._timeout
+        )
+        if res.status_code >= 400:
+            raise ValueError(f"Request failed with status code {res.status_code}: {res.text}")
+        return res.json()
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        match = _STATUS_RE.search(str(error))
+        status = int(match.group(1)) if match else None
+    return status in RETRYABLE_STATUS
+
+class ClientManager:
+    """
+    Owns the long-lived API clients shared by the advisor, the vector store and
+    the data fetcher: one pooled httpx client behind the OpenAI SDK and
+    ChatOpenAI, and one pooled requests session behind Exa. All are created
+    lazily and are safe to share between threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._http = None
+        self._openai = None
+        self._llm = None
+        self._exa = None
+        self._session = None
+        self._streams = weakref.WeakSet()
+        self.counters = {
+            "http_requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "retries": 0,
+        }
+
+    def _track_connection(self, response):
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self.counters["http_requests"] += 1
+            if stream is None:
+                return
+            if stream in self._streams:
+                self.counters["reused_connections"] += 1
+            else:
+                self._streams.add(stream)
+                self.counters["new_connections"] += 1
+
+    def http_client(self) -> httpx.Client:
+        with self._lock:
+            if self._http is None:
+                self._http = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=config.HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY_SECONDS
+                    ),
+                    timeout=httpx.Timeout(config.HTTP_TIMEOUT_SECONDS, connect=config.HTTP_CONNECT_TIMEOUT_SECONDS),
+                    event_hooks={"response": [self._track_connection]}
+                )
+            return self._http
+
+    def _api_key(self):
+        key = config.OPENAI_API_KEY or os.getenv("OPENAI_API_KEY")
+        if not key:
+            raise ValueError("OpenAI API key not configured. Set OPENAI_API_KEY environment variable or in config.py.")
+        return key
+
+    def openai_client(self) -> openai.OpenAI:
+        http = self.http_client()
+        with self._lock:
+            if self._openai is None:
+                self._openai = openai.OpenAI(
+                    api_key=self._api_key(),
+                    http_client=http,
+                    max_retries=config.HTTP_MAX_RETRIES,
+                    timeout=config.HTTP_TIMEOUT_SECONDS
+                )
+            return self._openai
+
+    def llm(self):
+        # langchain_openai is the slowest import here; only pay for it when an
+        # LLM is actually used (not for --update or embeddings-only work).
+        from langchain_openai import ChatOpenAI
+        http = self.http_client()
+        with self._lock:
+            if self._llm is None:
+                self._llm = ChatOpenAI(
+                    model_name=config.MODEL_NAME,
+                    openai_api_key=self._api_key(),
+                    http_client=http,
+                    max_retries=config.HTTP_MAX_RETRIES,
+                    request_timeout=config.HTTP_TIMEOUT_SECONDS
+                )
+            return self._llm
+
+    def exa_client(self) -> Exa:
+        with self._lock:
+            if self._exa is None:
+                self._session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=config.HTTP_MAX_CONNECTIONS,
+                    max_retries=0
+                )
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+                self._exa = PooledExa(config.EXA_API_KEY, self._session, config.HTTP_TIMEOUT_SECONDS)
+            return self._exa
+
+    def call_with_retries(self, fn, *args, **kwargs):
+        """
+        Call fn, retrying transient failures with exponential backoff and full
+        jitter. The OpenAI SDK retries on its own; this is for Exa.
+        """
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= config.HTTP_MAX_RETRIES or not is_retryable(e):
+                    raise
+                delay = min(config.HTTP_BACKOFF_MAX_SECONDS, config.HTTP_BACKOFF_BASE_SECONDS * (2 ** attempt))
+                attempt += 1
+                with self._lock:
+                    self.counters["retries"] += 1
+                time.sleep(random.uniform(0, delay))
+
+    def connection_stats(self):
+        """
+        Connection reuse counters. httpx traffic (OpenAI, ChatOpenAI) is counted
+        per response; Exa traffic is read from the urllib3 pools.
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            session = self._session
+        exa_requests = exa_connections = 0
+        if session is not None:
+            for adapter in set(session.adapters.values()):
+                for key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is not None:
+                        exa_requests += pool.num_requests
+                        exa_connections += pool.num_connections
+        stats["exa_requests"] = exa_requests
+        stats["exa_new_connections"] = exa_connections
+        stats["exa_reused_connections"] = max(exa_requests - exa_connections, 0)
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            if self._session is not None:
+                self._session.close()
+            self._http = self._openai = self._llm = self._exa = self._session = None
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_client_manager() -> ClientManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ClientManager()
+        return _manager
+
+def _connection_metrics():
+    stats = get_client_manager().connection_stats()
+    return [
+        ("http_requests_total", {"client": "openai"}, stats["http_requests"]),
+        ("http_requests_total", {"client": "exa"}, stats["exa_requests"]),
+        ("http_connections_total", {"client": "openai", "reused": "false"}, stats["new_connections"]),
+        ("http_connections_total", {"client": "openai", "reused": "true"}, stats["reused_connections"]),
+        ("http_connections_total", {"client": "exa", "reused": "false"}, stats["exa_new_connections"]),
+        ("http_connections_total", {"client": "exa", "reused": "true"}, stats["exa_reused_connections"]),
+        ("http_retries_total", {"client": "exa"}, stats["retries"]),
+    ]
+
+metrics.registry.collect(_connection_metrics)
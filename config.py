@@ -12,9 +12,154 @@ MAX_CHARS = 5000
 
 # Vector DB settings
 VECTOR_DB_PATH = "cricket_data_store"
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_BATCH_SIZE = 100          # max inputs per embeddings request
+EMBEDDING_BATCH_MAX_CHARS = 200000  # max total characters per embeddings request
+WAL_CHECKPOINT_BYTES = 8 * 1024 * 1024  # fold the write-ahead log into the index past this size
+WAL_CHECKPOINT_SECONDS = 300            # ... or when the last checkpoint is older than this
+WAL_FSYNC = False                       # fsync the write-ahead log after every append
+EMBEDDING_CACHE_PATH = f"{VECTOR_DB_PATH}/embedding_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 20000     # LRU-evicted beyond this many vectors
+FAISS_MMAP = True                       # open saved flat and HNSW indexes with IO_FLAG_MMAP (IVF ones load into memory)
+DEDUPE_NEAR_DUPLICATES = True           # also skip SimHash near-duplicates at ingest
+DEDUPE_SIMHASH_DISTANCE = 3             # max differing SimHash bits for a near-duplicate
+
+# Search result cache
+FETCH_CACHE_ENABLED = True
+FETCH_CACHE_PATH = f"{VECTOR_DB_PATH}/fetch_cache.sqlite3"
+FETCH_CACHE_MAX_ENTRIES = 5000
+FETCH_CACHE_DEFAULT_TTL = 3600          # seconds
+FETCH_CACHE_TTLS = {
+    "get_player_data": 6 * 3600,
+    "get_team_news": 2 * 3600,
+    "get_match_predictions": 3600,
+    "get_injury_updates": 15 * 60,
+}
+FETCH_CACHE_STALE_SECONDS = 15 * 60     # serve expired entries this long while refreshing them
+FETCH_MAX_CONCURRENCY = 5               # concurrent Exa calls in AsyncCricketDataFetcher
+FETCH_TIMEOUT_SECONDS = 30              # per-call timeout in AsyncCricketDataFetcher
+
+# ANN index settings
+VECTOR_INDEX_TYPE = "flat"              # "flat", "ivf_flat", "hnsw" or "ivf_pq"
+INDEX_PROMOTION_THRESHOLD = 50000       # promote a flat index to VECTOR_INDEX_TYPE past this many vectors
+INDEX_TRAINING_SAMPLE = 100000          # max vectors used to train IVF centroids
+IVF_NLIST = 4096
+IVF_NPROBE = 16
+PQ_M = 64                               # PQ sub-quantizers; must divide the embedding dimension
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+FILTER_EXACT_SCAN_MAX = 4096            # filtered searches over at most this many docs score them directly
+
+# Passage index (opt-in ingest mode): documents are split into overlapping
+# passages and only the passages are embedded; a document's vector is the mean
+# of its passages. Search returns only the matching passages per document.
+PASSAGE_INDEX_ENABLED = False
+PASSAGE_CHARS = 600                     # target passage length
+PASSAGE_OVERLAP_CHARS = 120             # characters shared by consecutive passages
+PASSAGE_SEARCH_FANOUT = 4               # passages retrieved per requested document hit
 
 # OpenAI settings
 MODEL_NAME = "gpt-3.5-turbo"
+# Shared HTTP clients (OpenAI, ChatOpenAI, Exa)
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 60
+HTTP_TIMEOUT_SECONDS = 60
+HTTP_CONNECT_TIMEOUT_SECONDS = 10
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_BASE_SECONDS = 0.5         # retry delays are drawn from [0, base * 2**attempt]
+HTTP_BACKOFF_MAX_SECONDS = 8
+
+BATCH_MAX_WORKERS = 8                   # concurrent players in FantasyAdvisor.get_player_recommendations
+
+# Local-first retrieval: serve advisor context from the knowledge base when it
+# has enough recent, close hits; otherwise search Exa.
+RETRIEVAL_LOCAL_FIRST = True
+RETRIEVAL_K = 5
+RETRIEVAL_MIN_HITS = 3                  # local hits needed to skip Exa
+RETRIEVAL_MAX_DISTANCE = 0.35           # max squared L2 distance for a local hit
+RETRIEVAL_DEFAULT_MAX_AGE = 6 * 3600    # seconds, by metadata "date"
+RETRIEVAL_MAX_AGE = {
+    "get_player_data": 6 * 3600,
+    "get_team_news": 2 * 3600,
+    "get_match_predictions": 3600,
+}
+
+# Context assembly
+CONTEXT_TOKEN_BUDGET = 3000             # approximate tokens of source text sent to the LLM per request
+CONTEXT_PASSAGE_TOKENS = 120            # sources are split into passages of about this size
+CONTEXT_DEDUPE_DISTANCE = 3             # max differing SimHash bits for a near-duplicate sentence
+
+# LLM response cache
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_TTL_SECONDS = 30 * 60
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_DISTANCE = 0.04          # max squared L2 distance between query embeddings for a semantic hit
+
+# Advisor server (main.py --serve / --server)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_TIMEOUT_SECONDS = 300            # thin-client timeout per request
+
+# Telemetry export (LangSmithMonitor)
+TELEMETRY_QUEUE_SIZE = 10000            # queued runs + feedback; new items are dropped beyond this
+TELEMETRY_BATCH_SIZE = 100
+TELEMETRY_FLUSH_INTERVAL_SECONDS = 2
+TELEMETRY_SHUTDOWN_TIMEOUT_SECONDS = 5  # max wait to flush at exit
+TELEMETRY_SPILL_PATH = f"{VECTOR_DB_PATH}/telemetry_spill.jsonl"  # None to drop instead of spilling
+TELEMETRY_SPILL_MAX_BYTES = 50 * 1024 * 1024
+TELEMETRY_TRACE_CACHE_SIZE = 10000      # recent run ids remembered for parent_run_id nesting
+
+# CLI cold-start budgets for startup_benchmark.py (median wall time, ms)
+STARTUP_BUDGETS_MS = {
+    "help": 300,
+    "player": 4000,
+}
+
+# In-process metrics (metrics.py)
+METRICS_WINDOW = 2048                   # recent samples kept per histogram for p50/p95/p99
+
+# Knowledge-base refresh scheduler (refresh.py, main.py --refresh-once / --refresh-daemon)
+REFRESH_TEAMS = [
+    "Chennai Super Kings", "Mumbai Indians", "Royal Challengers Bengaluru", "Kolkata Knight Riders",
+    "Sunrisers Hyderabad", "Rajasthan Royals", "Delhi Capitals", "Punjab Kings",
+    "Lucknow Super Giants", "Gujarat Titans",
+]
+REFRESH_PLAYERS = [
+    "Virat Kohli", "MS Dhoni", "Rohit Sharma", "Jasprit Bumrah", "Shubman Gill",
+    "Rashid Khan", "Suryakumar Yadav", "Hardik Pandya", "Ravindra Jadeja", "KL Rahul",
+]
+REFRESH_INTERVALS = {                   # seconds before a topic is due again
+    "team": 6 * 3600,
+    "player": 12 * 3600,
+    "injuries": 3600,
+}
+REFRESH_RETRY_SECONDS = 15 * 60         # wait this long before retrying a topic whose refresh failed
+REFRESH_OVERLAP_SECONDS = 3600          # re-read this much before a topic's watermark; duplicates are skipped
+REFRESH_STATE_PATH = f"{VECTOR_DB_PATH}/refresh_state.json"
+REFRESH_RATE_PER_SECOND = 1.0           # token bucket refill rate for Exa calls
+REFRESH_BURST = 5                       # token bucket capacity
+REFRESH_MAX_CONCURRENCY = 3             # concurrent Exa calls
+REFRESH_QUEUE_SIZE = 64                 # documents buffered between pipeline stages
+REFRESH_BATCH_WAIT_SECONDS = 1.0        # embed a partial batch after this long without new documents
+REFRESH_MIN_CHARS = 200                 # drop results with less text than this
+REFRESH_MIN_SLEEP_SECONDS = 60          # daemon: shortest pause between cycles
+
+# Fantasy XI optimizer (optimizer.py, main.py --optimize)
+OPTIMIZER_TEAM_SIZE = 11
+OPTIMIZER_CREDIT_LIMIT = 100.0
+OPTIMIZER_CREDIT_STEP = 0.5             # credit granularity of the pruning tables
+OPTIMIZER_MAX_PER_TEAM = 7
+OPTIMIZER_ROLE_LIMITS = {               # (min, max) players per role
+    "WK": (1, 4),
+    "BAT": (3, 6),
+    "AR": (1, 4),
+    "BOWL": (3, 6),
+}
+OPTIMIZER_CAPTAIN_MULTIPLIER = 2.0
+OPTIMIZER_VICE_CAPTAIN_MULTIPLIER = 1.5
+OPTIMIZER_TOP_N = 3                     # lineups printed by --optimize
 
 # Confidence thresholds
 HIGH_CONFIDENCE = 0.8
@@ -0,0 +1,109 @@
+import re
+from datetime import datetime
+from dedupe import DedupeIndex, content_hash, simhash
+import scoring
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\s*\n\s*")
+SIMHASH_MIN_WORDS = 8  # shorter sentences are only deduplicated exactly
+
+def approx_tokens(text: str) -> int:
+    """
+    Local token estimate: one token per word and per punctuation mark. Close
+    to the OpenAI tokenizers on English news text, and needs no model files.
+    """
+    return len(_TOKEN_RE.findall(text))
+
+def split_sentences(text: str):
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+
+def _passages(sentences: list, passage_tokens: int):
+    passage, size = [], 0
+    for sentence in sentences:
+        tokens = approx_tokens(sentence)
+        if passage and size + tokens > passage_tokens:
+            yield " ".join(passage)
+            passage, size = [], 0
+        passage.append(sentence)
+        size += tokens
+    if passage:
+        yield " ".join(passage)
+
+def score_passage(text: str, signals: dict, query_terms: set, current_year: int) -> float:
+    """
+    Rank a passage by query-term overlap, stat density and recency of the
+    years it mentions (signals from scoring.scan).
+    """
+    tokens = max(approx_tokens(text), 1)
+    relevance = 0.0
+    if query_terms:
+        relevance = len(query_terms & set(_WORD_RE.findall(text.lower()))) / len(query_terms)
+    stat_density = min(signals["stats"] * 20 / tokens, 1.0)
+    years = sum(signals["years"].values())
+    recent = sum(n for year, n in signals["years"].items() if year >= current_year - 1)
+    recency = recent / years if years else 0.5
+    return 0.5 * relevance + 0.35 * stat_density + 0.15 * recency
+
+def build_context(items: list, query: str, token_budget: int, passage_tokens: int = 120,
+                  near_duplicate_distance: int = 3, prefix: str = ""):
+    """
+    Assemble LLM context from search results within token_budget.
+
+    Sources are split into passages of about passage_tokens, sentences
+    repeated (exactly or by SimHash) across sources are dropped, and the
+    highest-scoring passages are packed into the budget. Kept passages are
+    emitted in their original order under a "Source: <title>" header.
+    Returns (context, items_used, signals) where signals are the
+    scoring.scan signals of the context, merged from its passages.
+    """
+    query_terms = set(_WORD_RE.findall(query.lower()))
+    current_year = datetime.now().year
+    seen = DedupeIndex(near_duplicate_distance)
+    candidates = []
+    sentence_id = 0
+    for source, item in enumerate(items):
+        if not getattr(item, "text", None):
+            continue
+        kept = []
+        for sentence in split_sentences(item.text):
+            words = _WORD_RE.findall(sentence.lower())
+            if not words:
+                continue
+            chash = content_hash(sentence)
+            if chash in seen.by_hash:
+                continue
+            shash = simhash(sentence) if len(words) >= SIMHASH_MIN_WORDS else None
+            if shash is not None and seen.find_near_duplicate(shash) is not None:
+                continue
+            seen.add(sentence_id, None, chash, shash)
+            sentence_id += 1
+            kept.append(sentence)
+        for position, passage in enumerate(_passages(kept, passage_tokens)):
+            signals = scoring.scan(passage)
+            score = score_passage(passage, signals, query_terms, current_year)
+            candidates.append((score, source, position, passage, signals))
+
+    selected = {}
+    used_tokens = 0
+    passage_signals = []
+    for score, source, position, passage, signals in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        cost = approx_tokens(passage)
+        if source not in selected:
+            cost += approx_tokens(f"{prefix}Source: {items[source].title}")
+        if used_tokens + cost > token_budget:
+            continue
+        selected.setdefault(source, []).append((position, passage))
+        passage_signals.append(signals)
+        used_tokens += cost
+
+    context = ""
+    used = []
+    for source in sorted(selected):
+        item = items[source]
+        body = "\n".join(passage for _, passage in sorted(selected[source]))
+        context += f"{prefix}Source: {item.title}\n{body}\n\n"
+        used.append(item)
+    signals = scoring.merge(passage_signals)
+    signals["chars"] = len(context)
+    return context, used, signals
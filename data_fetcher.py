@@ -1,48 +1,194 @@
-from exa_py import Exa
+import asyncio
+import functools
+import threading
+import weakref
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import config
-from datetime import datetime
+from clients import get_client_manager
+from datetime import datetime, timezone
 from langsmith import traceable
+from result_cache import ResultCache
+import metrics
 
-class CricketDataFetcher:
-    def __init__(self):
-        self.client = Exa(config.EXA_API_KEY)
+QUERY_TEMPLATES = {
+    "get_player_data": "IPL cricket player {player_name} recent performance statistics",
+    "get_team_news": "IPL cricket team {team_name} recent news updates squad changes",
+    "get_match_predictions": "IPL cricket match prediction {team1} vs {team2} analysis",
+    "get_injury_updates": "IPL cricket recent player injuries updates team changes",
+}
+
+class AsyncCricketDataFetcher:
+    """
+    asyncio front end over Exa search with the result cache. Blocking Exa
+    calls run in worker threads, bounded by max_concurrency and each limited
+    to timeout seconds.
+    """
+    def __init__(self, use_cache: bool = True, max_concurrency: int = None, timeout: float = None):
+        self.clients = get_client_manager()
+        self.client = self.clients.exa_client()
+        self.cache = None
+        if use_cache and config.FETCH_CACHE_ENABLED:
+            self.cache = ResultCache(config.FETCH_CACHE_PATH, config.FETCH_CACHE_MAX_ENTRIES)
+        self.max_concurrency = max_concurrency or config.FETCH_MAX_CONCURRENCY
+        self.timeout = timeout or config.FETCH_TIMEOUT_SECONDS
+        self._semaphores = weakref.WeakKeyDictionary()
+        # A dedicated pool, so a timed-out call does not hold up asyncio.run()
+        # shutting down the loop's default executor.
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="exa-fetch")
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    def _fetch(self, query: str, **options):
+        with metrics.timer("exa_fetch"):
+            results = self.clients.call_with_retries(
+                self.client.search_and_contents,
+                query,
+                text={"max_characters": config.MAX_CHARS},
+                num_results=config.MAX_RESULTS,
+                type="auto",
+                **options
+            )
+        metrics.record_exa_results(results.results)
+        return results.results
+
+    def _fetch_and_store(self, method: str, key: str, query: str):
+        results = self._fetch(query)
+        if self.cache is not None:
+            self.cache.put(key, method, results)
+        return results
+
+    def _refresh_in_background(self, method: str, key: str, query: str):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch_and_store(method, key, query)
+            except Exception as e:
+                print(f"Warning: background refresh of {method} failed: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def search(self, method: str, bypass_cache: bool = False, **params):
+        """
+        Blocking search for one of the QUERY_TEMPLATES. Serves from the result
+        cache while fresh, serves stale entries while refreshing them in the
+        background, otherwise fetches from Exa.
+        """
+        query = QUERY_TEMPLATES[method].format(**params)
+        if self.cache is None:
+            return self._fetch(query)
+        key = ResultCache.make_key(method, query, config.MAX_RESULTS, config.MAX_CHARS)
+        if not bypass_cache:
+            entry = self.cache.get(key)
+            if entry is not None:
+                results, age = entry
+                ttl = config.FETCH_CACHE_TTLS.get(method, config.FETCH_CACHE_DEFAULT_TTL)
+                if age <= ttl:
+                    metrics.inc("cache_total", cache="fetch", result="hit")
+                    return results
+                if age <= ttl + config.FETCH_CACHE_STALE_SECONDS:
+                    metrics.inc("cache_total", cache="fetch", result="stale")
+                    self._refresh_in_background(method, key, query)
+                    return results
+        metrics.inc("cache_total", cache="fetch", result="miss")
+        return self._fetch_and_store(method, key, query)
+
+    def fetch_since(self, method: str, since: float = None, **params):
+        """
+        Uncached search for one of the QUERY_TEMPLATES, limited to results
+        published after the timestamp since when it is given.
+        """
+        query = QUERY_TEMPLATES[method].format(**params)
+        if since is None:
+            return self._fetch(query)
+        start = datetime.fromtimestamp(since, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        return self._fetch(query, start_published_date=start)
+
+    def _semaphore(self):
+        # asyncio primitives belong to one event loop; keep one per loop.
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _run(self, method: str, bypass_cache: bool, **params):
+        call = functools.partial(self.search, method, bypass_cache, **params)
+        context = contextvars.copy_context()
+        async with self._semaphore():
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(self._executor, context.run, call),
+                self.timeout
+            )
 
     @traceable(name="get_player_data", run_type="tool")
-    def get_player_data(self, player_name: str):
-        results = self.client.search_and_contents(
-            f"IPL cricket player {player_name} recent performance statistics",
-            text={"max_characters": config.MAX_CHARS},
-            num_results=config.MAX_RESULTS,
-            type="auto"
-        )
-        return {"results": results.results}
-
-    @traceable(name="get_team_news", run_type="tool") 
-    def get_team_news(self, team_name: str):
-        results = self.client.search_and_contents(
-            f"IPL cricket team {team_name} recent news updates squad changes",
-            text={"max_characters": config.MAX_CHARS},
-            num_results=config.MAX_RESULTS,
-            type="auto"
-        )
-        return {"results": results.results}
+    async def get_player_data(self, player_name: str, bypass_cache: bool = False):
+        return {"results": await self._run("get_player_data", bypass_cache, player_name=player_name)}
+
+    @traceable(name="get_team_news", run_type="tool")
+    async def get_team_news(self, team_name: str, bypass_cache: bool = False):
+        return {"results": await self._run("get_team_news", bypass_cache, team_name=team_name)}
 
     @traceable(name="get_match_predictions", run_type="tool")
-    def get_match_predictions(self, team1: str, team2: str):
-        results = self.client.search_and_contents(
-            f"IPL cricket match prediction {team1} vs {team2} analysis",
-            text={"max_characters": config.MAX_CHARS},
-            num_results=config.MAX_RESULTS,
-            type="auto"
-        )
-        return {"results": results.results}
+    async def get_match_predictions(self, team1: str, team2: str, bypass_cache: bool = False):
+        return {"results": await self._run("get_match_predictions", bypass_cache, team1=team1, team2=team2)}
 
     @traceable(name="get_injury_updates", run_type="tool")
-    def get_injury_updates(self):
-        results = self.client.search_and_contents(
-            "IPL cricket recent player injuries updates team changes",
-            text={"max_characters": config.MAX_CHARS},
-            num_results=config.MAX_RESULTS,
-            type="auto"
+    async def get_injury_updates(self, bypass_cache: bool = False):
+        return {"results": await self._run("get_injury_updates", bypass_cache)}
+
+    @traceable(name="gather_player_data", run_type="tool")
+    async def gather_player_data(self, player_names: list, bypass_cache: bool = False):
+        """
+        Fetch several players concurrently. Returns {name: response}; a player
+        whose fetch failed or timed out maps to the exception instead.
+        """
+        responses = await asyncio.gather(
+            *(self.get_player_data(name, bypass_cache) for name in player_names),
+            return_exceptions=True
         )
-        return {"results": results.results}
\ No newline at end of file
+        return dict(zip(player_names, responses))
+
+class CricketDataFetcher:
+    """
+    Synchronous wrapper over AsyncCricketDataFetcher.
+    """
+    def __init__(self, use_cache: bool = True):
+        self.async_fetcher = AsyncCricketDataFetcher(use_cache)
+
+    @property
+    def client(self):
+        return self.async_fetcher.client
+
+    @property
+    def cache(self):
+        return self.async_fetcher.cache
+
+    @traceable(name="get_player_data", run_type="tool")
+    def get_player_data(self, player_name: str, bypass_cache: bool = False):
+        return {"results": self.async_fetcher.search("get_player_data", bypass_cache, player_name=player_name)}
+
+    @traceable(name="get_team_news", run_type="tool")
+    def get_team_news(self, team_name: str, bypass_cache: bool = False):
+        return {"results": self.async_fetcher.search("get_team_news", bypass_cache, team_name=team_name)}
+
+    @traceable(name="get_match_predictions", run_type="tool")
+    def get_match_predictions(self, team1: str, team2: str, bypass_cache: bool = False):
+        return {"results": self.async_fetcher.search("get_match_predictions", bypass_cache, team1=team1, team2=team2)}
+
+    @traceable(name="get_injury_updates", run_type="tool")
+    def get_injury_updates(self, bypass_cache: bool = False):
+        return {"results": self.async_fetcher.search("get_injury_updates", bypass_cache)}
+
+    def fetch_since(self, method: str, since: float = None, **params):
+        return self.async_fetcher.fetch_since(method, since, **params)
+
+    def gather_player_data(self, player_names: list, bypass_cache: bool = False):
+        return asyncio.run(self.async_fetcher.gather_player_data(player_names, bypass_cache))
@@ -1,94 +1,807 @@
 import os
+import atexit
+import struct
+import time
+import threading
+from contextlib import contextmanager
 import faiss
 import numpy as np
 import pickle
-import openai
 import config
+from clients import get_client_manager
+import ann_index
+from doc_store import DocumentStore
+from embedding_cache import EmbeddingCache
+from metadata_index import MetadataIndex
+from dedupe import DedupeIndex, normalize_url, content_hash, simhash
+from passages import PassageTable, split_passages, merge_spans
+from locks import ReadWriteLock, FileLock
+import metrics
+from context_builder import approx_tokens
 from datetime import datetime
 from langsmith import traceable
 
 class VectorDatabase:
+    """
+    FAISS index over a columnar document store, with a write-ahead log.
+
+    Safe to share between threads: searches run concurrently under the
+    read side of a readers/writer lock. Changes to the index, store and
+    lookup tables take the write side. Writers are serialized by their own
+    lock, which is held while they wait on embedding requests, so searches
+    keep running during ingest.
+
+    Several processes may share one store (e.g. --serve next to
+    --refresh-daemon or a cron --update). Writes hold an flock on
+    store.lock. Each write first reloads the store if another process
+    changed it, and leaves the document store committed for the others.
+    """
     def __init__(self):
         self.dimension = 1536
         self.index = None
-        self.documents = []
-        if config.OPENAI_API_KEY:
-            openai.api_key = config.OPENAI_API_KEY
-        elif not os.getenv("OPENAI_API_KEY"): 
+        self.passage_index = None
+        self.passages = PassageTable()
+        self.documents = None
+        self.dedupe = DedupeIndex(config.DEDUPE_SIMHASH_DISTANCE)
+        self.metadata_index = MetadataIndex()
+        self.deleted = set()
+        self._deleted_array = None
+        self._deleted_passages = None
+        self.index_path = f"{config.VECTOR_DB_PATH}/faiss_index.bin"
+        self.passage_index_path = f"{config.VECTOR_DB_PATH}/passage_index.bin"
+        self.passages_path = f"{config.VECTOR_DB_PATH}/passages.npz"
+        self.legacy_documents_path = f"{config.VECTOR_DB_PATH}/documents.pkl"
+        self.dedupe_path = f"{config.VECTOR_DB_PATH}/dedupe.pkl"
+        self.metadata_index_path = f"{config.VECTOR_DB_PATH}/metadata_index.pkl"
+        self.wal_path = f"{config.VECTOR_DB_PATH}/wal.log"
+        self._wal = None
+        self._last_checkpoint = time.time()
+        self._rwlock = ReadWriteLock()
+        self._write_lock = threading.RLock()
+        self._store_lock = FileLock(f"{config.VECTOR_DB_PATH}/store.lock")
+        self._disk_state = None
+        self.embedding_cache = EmbeddingCache(
+            config.EMBEDDING_CACHE_PATH, self.dimension, config.EMBEDDING_CACHE_MAX_ENTRIES
+        )
+        self.clients = get_client_manager()
+        if not config.OPENAI_API_KEY and not os.getenv("OPENAI_API_KEY"):
              print("Warning: OPENAI_API_KEY not found in config.py or environment variables for direct OpenAI client usage.")
-        self.load_or_create_index()
+        with self._writing(reload=False):
+            self.load_or_create_index()
+        atexit.register(self.close)
+
+    def _disk_signature(self):
+        """
+        Identity of the committed document rows and the last checkpoint on
+        disk; it changes whenever any process adds documents or checkpoints.
+        """
+        signature = []
+        for path in (self.documents.offsets_path, self.index_path):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _changed_on_disk(self) -> bool:
+        return self._disk_state is not None and self._disk_signature() != self._disk_state
+
+    @contextmanager
+    def _writing(self, reload: bool = True):
+        """
+        Hold this process's writer lock and the store's file lock. The
+        outermost hold first reloads the store if another process wrote to
+        it, and ends by committing document rows and the log to disk.
+        """
+        with self._write_lock, self._store_lock:
+            outermost = self._store_lock.depth == 1
+            if outermost and reload and self._changed_on_disk():
+                self._reload()
+            try:
+                yield
+            finally:
+                if outermost and self.documents is not None and self._wal is not None:
+                    self.documents.flush()
+                    self._sync_wal()
+                    self._disk_state = self._disk_signature()
+
+    def _reload(self):
+        print("Vector store was changed by another process. Reloading it.")
+        with self._rwlock.write():
+            self._wal.close()
+            self._wal = None
+            self.documents.close()
+            self.index = None
+            self.passage_index = None
+            self.passages = PassageTable()
+            self._deleted_passages = None
+            self.load_or_create_index()
 
     @traceable(name="vectordb_load_or_create_index", run_type="tool")
     def load_or_create_index(self):
-        if os.path.exists(f"{config.VECTOR_DB_PATH}/faiss_index.bin") and \
-           os.path.exists(f"{config.VECTOR_DB_PATH}/documents.pkl"):
+        os.makedirs(config.VECTOR_DB_PATH, exist_ok=True)
+        is_new_store = not DocumentStore.exists(config.VECTOR_DB_PATH)
+        self.documents = DocumentStore(config.VECTOR_DB_PATH)
+        if is_new_store and os.path.exists(self.legacy_documents_path):
             try:
-                self.index = faiss.read_index(f"{config.VECTOR_DB_PATH}/faiss_index.bin")
-                with open(f"{config.VECTOR_DB_PATH}/documents.pkl", "rb") as f:
-                    self.documents = pickle.load(f)
-                if self.index.ntotal > 0 and self.index.d != self.dimension:
+                self._migrate_pickle_store()
+            except Exception as e:
+                print(f"Error migrating documents.pkl: {e}. Moving it aside.")
+                os.replace(self.legacy_documents_path, f"{self.legacy_documents_path}.corrupt")
+        if os.path.exists(self.index_path):
+            try:
+                self.index = self._read_index()
+                if self.index.d != self.dimension:
                     print(f"Warning: Loaded index dimension {self.index.d} differs from expected {self.dimension}. Re-initializing.")
-                    self.index = faiss.IndexFlatL2(self.dimension)
-                    self.documents = []
+                    self.index = ann_index.build_index("flat", self.dimension)
             except Exception as e:
-                print(f"Error loading index or documents: {e}. Starting fresh.")
-                os.makedirs(config.VECTOR_DB_PATH, exist_ok=True)
-                self.index = faiss.IndexFlatL2(self.dimension)
-                self.documents = []
+                # Checkpoints are written atomically, so this is real damage rather
+                # than a torn save. Keep the file around instead of overwriting it.
+                print(f"Error loading index: {e}. Moving it aside and rebuilding from the document store.")
+                os.replace(self.index_path, f"{self.index_path}.corrupt")
+                self.index = ann_index.build_index("flat", self.dimension)
         else:
-            os.makedirs(config.VECTOR_DB_PATH, exist_ok=True)
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.documents = []
+            self.index = ann_index.build_index("flat", self.dimension)
+        self._load_lookup_tables()
+        self._replay_wal()
+        self._catch_up_lookup_tables()
+        if self.index.ntotal < len(self.documents):
+            self._rebuild_missing_vectors()
+        if config.PASSAGE_INDEX_ENABLED:
+            self._load_passages()
+        self._wal = open(self.wal_path, "ab")
+
+    def _read_index(self, path: str = None):
+        path = path or self.index_path
+        if config.FAISS_MMAP:
+            try:
+                index = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+            except RuntimeError:
+                index = None
+            # IVF indexes opened this way keep their inverted lists in
+            # read-only OnDiskInvertedLists, so they could never be added to.
+            if index is not None and ann_index.index_type(index) in ("flat", "hnsw"):
+                return ann_index.configure_search(index)
+        return ann_index.configure_search(faiss.read_index(path))
+
+    def _load_passages(self):
+        """
+        Open the passage index and its parent table, and split and embed
+        documents added since they were last saved (e.g. replayed from the
+        write-ahead log, or the whole store the first time passages are on).
+        """
+        self._deleted_passages = None
+        if os.path.exists(self.passage_index_path) and os.path.exists(self.passages_path):
+            try:
+                self.passage_index = self._read_index(self.passage_index_path)
+                self.passages = PassageTable.load(self.passages_path)
+                if self.passage_index.ntotal != len(self.passages) or self.passage_index.d != self.dimension:
+                    print("Warning: passage index does not match its parent table. Rebuilding passages.")
+                    self.passage_index, self.passages = None, PassageTable()
+            except Exception as e:
+                print(f"Error loading passage index: {e}. Rebuilding passages.")
+                self.passage_index, self.passages = None, PassageTable()
+        if self.passages.indexed_docs < len(self.documents):
+            print(f"Splitting {len(self.documents) - self.passages.indexed_docs} documents into passages")
+            try:
+                self._index_passages(len(self.documents))
+                self.save_index()
+            except Exception as e:
+                print(f"Warning: could not index passages: {e}")
+
+    def _index_passages(self, end: int):
+        """
+        Split documents passages.indexed_docs..end into overlapping passages,
+        embed them in bulk and add them to the passage index.
+        """
+        rows = []
+        for doc_id in range(self.passages.indexed_docs, end):
+            if doc_id not in self.deleted:
+                rows.extend(self._passage_rows(doc_id, self.documents.get_text(doc_id)))
+        texts = [row[3] for row in rows]
+        for start, stop in self._iter_batches(texts):
+            embeddings = self.get_embeddings(texts[start:stop])
+            with self._rwlock.write():
+                self._append_passages(rows[start:stop], embeddings)
+        self.passages.indexed_docs = end
+        self._maybe_promote_passages()
+
+    @staticmethod
+    def _passage_rows(doc_id: int, text: str):
+        """
+        (parent, start, end, text) of each passage of a document.
+        """
+        spans = split_passages(text, config.PASSAGE_CHARS, config.PASSAGE_OVERLAP_CHARS)
+        return [(doc_id, start, stop, text[start:stop]) for start, stop in spans]
+
+    def _append_passages(self, rows, embeddings):
+        """
+        Add embedded passage rows to the passage index. Callers hold the
+        write side of the readers/writer lock.
+        """
+        if not rows:
+            return
+        if self.passage_index is None:
+            self.passage_index = ann_index.build_index("flat", self.dimension)
+        parents, starts, ends, _ = zip(*rows)
+        with metrics.timer("index_add"):
+            self.passage_index.add(embeddings)
+        self.passages.append(parents, starts, ends)
+        self._deleted_passages = None
+
+    def _maybe_promote_passages(self):
+        if self.passage_index is not None and ann_index.should_promote(self.passage_index):
+            print(f"Promoting passage index with {self.passage_index.ntotal} vectors to {config.VECTOR_INDEX_TYPE}")
+            promoted = ann_index.promote(self.passage_index)
+            with self._rwlock.write():
+                self.passage_index = promoted
+
+    def _embed_by_passages(self, texts: list, first_id: int):
+        """
+        Embed documents first_id, first_id + 1, ... through their passages
+        alone. A document's vector is the normalized mean of its passage
+        vectors. Returns the document vectors, the passage rows and the
+        passage vectors.
+        """
+        rows = []
+        for doc_id, text in enumerate(texts, first_id):
+            rows.extend(self._passage_rows(doc_id, text) or [(doc_id, 0, len(text), text)])
+        passage_embeddings = self.get_embeddings([row[3] for row in rows])
+        owners = np.array([row[0] for row in rows], dtype=np.int64) - first_id
+        embeddings = np.zeros((len(texts), passage_embeddings.shape[1]), dtype=np.float32)
+        np.add.at(embeddings, owners, passage_embeddings)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings, rows, passage_embeddings
+
+    def _migrate_pickle_store(self):
+        """
+        One-time import of a documents.pkl store into the columnar document store.
+        """
+        with open(self.legacy_documents_path, "rb") as f:
+            legacy = pickle.load(f)
+        for doc in legacy:
+            doc_id = self.documents.append(doc["text"], doc["metadata"])
+            if doc.get("deleted"):
+                self.documents.mark_deleted(doc_id)
+        self.documents.flush(fsync=True)
+        os.replace(self.legacy_documents_path, f"{self.legacy_documents_path}.migrated")
+        print(f"Migrated {len(legacy)} documents from documents.pkl to the columnar document store")
+
+    def _rebuild_missing_vectors(self):
+        missing = range(self.index.ntotal, len(self.documents))
+        print(f"Index holds {self.index.ntotal} of {len(self.documents)} documents. Re-embedding the rest.")
+        try:
+            texts = [self.documents.get_text(doc_id) for doc_id in missing]
+            for start, end in self._iter_batches(texts):
+                self.index.add(self.get_embeddings(texts[start:end]))
+            self.save_index()
+        except Exception as e:
+            print(f"Warning: could not rebuild missing vectors: {e}")
+
+    def _dedupe_keys(self, doc_id: int):
+        metadata = self.documents.get_metadata(doc_id)
+        chash = metadata.get("content_hash")
+        shash = metadata.get("simhash")
+        if chash is None or (shash is None and config.DEDUPE_NEAR_DUPLICATES):
+            text = self.documents.get_text(doc_id)
+            chash = chash or content_hash(text)
+            if shash is None and config.DEDUPE_NEAR_DUPLICATES:
+                shash = simhash(text)
+        return normalize_url(metadata.get("url")), chash, shash
+
+    def _load_table(self, path: str, name: str):
+        """
+        Load a pickled lookup table and the document count it covers.
+        Returns (None, 0) when it is missing or unusable, so it is rebuilt.
+        """
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    saved = pickle.load(f)
+                if saved["doc_count"] <= len(self.documents):
+                    return saved["index"], saved["doc_count"]
+            except Exception as e:
+                print(f"Error loading {name}: {e}. Rebuilding it.")
+        return None, 0
+
+    def _save_table(self, path: str, table):
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump({"doc_count": len(self.documents), "index": table}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    def _load_lookup_tables(self):
+        dedupe, self._dedupe_watermark = self._load_table(self.dedupe_path, "dedupe index")
+        self.dedupe = dedupe or DedupeIndex(config.DEDUPE_SIMHASH_DISTANCE)
+        metadata_index, self._metadata_watermark = self._load_table(self.metadata_index_path, "metadata index")
+        self.metadata_index = metadata_index or MetadataIndex()
+
+    def _catch_up_lookup_tables(self):
+        self.deleted = set(self.documents.deleted_ids().tolist())
+        self._deleted_array = None
+        self._deleted_passages = None
+        for doc_id in range(min(self._dedupe_watermark, self._metadata_watermark), len(self.documents)):
+            if doc_id >= self._metadata_watermark:
+                self.metadata_index.add(doc_id, self.documents.get_metadata(doc_id))
+            if doc_id >= self._dedupe_watermark and doc_id not in self.deleted:
+                self.dedupe.add(doc_id, *self._dedupe_keys(doc_id))
+
+    def _read_wal(self):
+        """
+        Yield (end_offset, record) for every complete record in the log.
+        A torn record at the tail (crash mid-append) ends the scan.
+        """
+        if not os.path.exists(self.wal_path):
+            return
+        with open(self.wal_path, "rb") as f:
+            offset = 0
+            while True:
+                header = f.read(4)
+                if len(header) < 4:
+                    return
+                (size,) = struct.unpack("<I", header)
+                payload = f.read(size)
+                if len(payload) < size:
+                    return
+                try:
+                    record = pickle.loads(payload)
+                except Exception:
+                    return
+                offset += 4 + size
+                yield offset, record
+
+    def _replay_wal(self):
+        """
+        Re-apply log records that are not yet part of the checkpointed files.
+        Records carry their document id, so replay is idempotent even if the
+        process died between writing the index, committing the document
+        store and truncating the log.
+        """
+        valid_end = 0
+        replayed = 0
+        for offset, record in self._read_wal():
+            doc_id = record["id"]
+            if record.get("op") == "delete":
+                if doc_id < len(self.documents):
+                    self.documents.mark_deleted(doc_id)
+                    url_key, chash, _ = self._dedupe_keys(doc_id)
+                    self.dedupe.remove(doc_id, url_key, chash)
+                valid_end = offset
+                continue
+            if doc_id > len(self.documents):
+                print(f"Warning: write-ahead log skips from document {len(self.documents)} to {doc_id}. Stopping replay.")
+                break
+            vector = record["vector"].reshape(1, -1)
+            if vector.shape[1] != self.index.d:
+                print(f"Warning: write-ahead log record {doc_id} has dimension {vector.shape[1]}, index has {self.index.d}. Stopping replay.")
+                break
+            # An index that is behind the store is caught up by re-embedding
+            # after replay; only extend it here while ids still line up.
+            if doc_id == self.index.ntotal:
+                self.index.add(vector)
+            if doc_id == len(self.documents):
+                self.documents.append(record["text"], record["metadata"])
+                replayed += 1
+            valid_end = offset
+        if os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) != valid_end:
+            # Drop the torn tail so new appends are not hidden behind it.
+            with open(self.wal_path, "r+b") as f:
+                f.truncate(valid_end)
+        if replayed:
+            print(f"Replayed {replayed} documents from the write-ahead log")
+
+    def _append_wal(self, doc_id: int, vector, document: str, metadata: dict):
+        payload = pickle.dumps(
+            {"id": doc_id, "vector": vector, "text": document, "metadata": metadata},
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+        self._write_wal_record(payload)
+
+    def _append_wal_delete(self, doc_id: int):
+        self._write_wal_record(pickle.dumps({"op": "delete", "id": doc_id}, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _write_wal_record(self, payload: bytes):
+        self._wal.write(struct.pack("<I", len(payload)))
+        self._wal.write(payload)
+
+    def _sync_wal(self):
+        self._wal.flush()
+        if config.WAL_FSYNC:
+            os.fsync(self._wal.fileno())
+
+    def _maybe_checkpoint(self):
+        if self._wal.tell() >= config.WAL_CHECKPOINT_BYTES or \
+           time.time() - self._last_checkpoint >= config.WAL_CHECKPOINT_SECONDS:
+            self.checkpoint()
 
     @traceable(name="vectordb_get_embedding", run_type="embedding")
     def get_embedding(self, text: str):
-        if not openai.api_key and config.OPENAI_API_KEY:
-            openai.api_key = config.OPENAI_API_KEY
-        
-        if not openai.api_key and not os.getenv("OPENAI_API_KEY"):
-            raise ValueError("OpenAI API key not configured for direct openai client (embeddings). Set OPENAI_API_KEY environment variable or in config.py.")
-        
-        resp = openai.embeddings.create(
-            model="text-embedding-ada-002",
-            input=text
-        )
-        return np.array([resp.data[0].embedding], dtype=np.float32)
+        return self.get_embeddings([text])
+
+    def _iter_batches(self, texts: list):
+        batch_start = 0
+        batch_chars = 0
+        for i, text in enumerate(texts):
+            size = i - batch_start
+            if size and (size >= config.EMBEDDING_BATCH_SIZE or
+                         batch_chars + len(text) > config.EMBEDDING_BATCH_MAX_CHARS):
+                yield batch_start, i
+                batch_start = i
+                batch_chars = 0
+            batch_chars += len(text)
+        if batch_start < len(texts):
+            yield batch_start, len(texts)
+
+    def _embed_batch(self, texts: list):
+        with metrics.timer("embedding"):
+            resp = self.clients.openai_client().embeddings.create(
+                model=config.EMBEDDING_MODEL,
+                input=texts
+            )
+        usage = getattr(resp, "usage", None)
+        tokens = getattr(usage, "total_tokens", None) or sum(approx_tokens(t) for t in texts)
+        metrics.inc("tokens_total", tokens, kind="embedding", model=config.EMBEDDING_MODEL)
+        # The API returns one item per input, tagged with its position.
+        data = sorted(resp.data, key=lambda d: d.index)
+        return np.array([d.embedding for d in data], dtype=np.float32)
+
+    @traceable(name="vectordb_get_embeddings", run_type="embedding")
+    def get_embeddings(self, texts: list):
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        missing = {}
+        for i, text in enumerate(texts):
+            cached = self.embedding_cache.get(config.EMBEDDING_MODEL, text)
+            if cached is not None:
+                embeddings[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+        metrics.inc("cache_total", len(texts) - sum(map(len, missing.values())), cache="embedding", result="hit")
+        metrics.inc("cache_total", sum(map(len, missing.values())), cache="embedding", result="miss")
+        if missing:
+            miss_texts = list(missing)
+            for start, end in self._iter_batches(miss_texts):
+                batch = self._embed_batch(miss_texts[start:end])
+                if batch.shape[1] != self.dimension:
+                    raise ValueError(f"Embedding model {config.EMBEDDING_MODEL} returned dimension {batch.shape[1]}, expected {self.dimension}")
+                for text, vector in zip(miss_texts[start:end], batch):
+                    embeddings[missing[text]] = vector
+                    self.embedding_cache.put(config.EMBEDDING_MODEL, text, vector)
+        return embeddings
 
     @traceable(name="vectordb_add_document", run_type="tool") 
     def add_document(self, document: str, metadata: dict = None):
-        embedding = self.get_embedding(document)
-        if self.index is None or self.index.d != embedding.shape[1]:
-            print(f"Re-initializing index for dimension {embedding.shape[1]}")
-            self.dimension = embedding.shape[1]
-            self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(embedding)
-        self.documents.append({"text": document, "metadata": metadata or {}})
-        self.save_index()
-        return {"total_docs": len(self.documents)}
+        return self.add_documents([document], [metadata])
+
+    def _plan_ingest(self, documents: list, metadatas: list):
+        """
+        Decide per document whether it is new, replaces an older version at
+        the same URL, or is a duplicate to skip. Runs before any embedding call.
+        """
+        accepted = []
+        skipped = 0
+        seen_urls = set()
+        seen_hashes = set()
+        for document, metadata in zip(documents, metadatas):
+            metadata = dict(metadata or {})
+            url_key = normalize_url(metadata.get("url"))
+            chash = content_hash(document)
+            if chash in self.dedupe.by_hash or chash in seen_hashes or \
+               (url_key and url_key in seen_urls):
+                skipped += 1
+                continue
+            replaces = self.dedupe.by_url.get(url_key) if url_key else None
+            shash = None
+            if config.DEDUPE_NEAR_DUPLICATES:
+                shash = simhash(document)
+                near = self.dedupe.find_near_duplicate(shash)
+                if replaces is None and near is not None:
+                    skipped += 1
+                    continue
+                metadata["simhash"] = shash
+            metadata["content_hash"] = chash
+            seen_hashes.add(chash)
+            if url_key:
+                seen_urls.add(url_key)
+            accepted.append((document, metadata, url_key, chash, shash, replaces))
+        return accepted, skipped
+
+    def _delete_document(self, doc_id: int):
+        url_key, chash, _ = self._dedupe_keys(doc_id)
+        self.dedupe.remove(doc_id, url_key, chash)
+        self.documents.mark_deleted(doc_id)
+        self.deleted.add(doc_id)
+        self._deleted_array = None
+        self._deleted_passages = None
+        self._append_wal_delete(doc_id)
+
+    @property
+    def live_count(self):
+        return len(self.documents) - len(self.deleted)
+
+    @traceable(name="vectordb_add_documents", run_type="tool")
+    def add_documents(self, documents: list, metadatas: list = None):
+        if metadatas is None:
+            metadatas = [None] * len(documents)
+        if len(metadatas) != len(documents):
+            raise ValueError("documents and metadatas must have the same length")
+        with self._writing():
+            return self._add_documents(documents, metadatas)
+
+    def _add_documents(self, documents: list, metadatas: list):
+        accepted, skipped = self._plan_ingest(documents, metadatas)
+        added = 0
+        replaced = 0
+        texts = [item[0] for item in accepted]
+        by_passages = config.PASSAGE_INDEX_ENABLED and bool(accepted)
+        if by_passages and self.passages.indexed_docs < len(self.documents):
+            self._index_passages(len(self.documents))
+        for start, end in self._iter_batches(texts):
+            if by_passages:
+                embeddings, rows, passage_embeddings = self._embed_by_passages(texts[start:end], len(self.documents))
+            else:
+                embeddings = self.get_embeddings(texts[start:end])
+            with self._rwlock.write():
+                with metrics.timer("index_add"):
+                    self.index.add(embeddings)
+                for vector, (document, metadata, url_key, chash, shash, replaces) in zip(embeddings, accepted[start:end]):
+                    doc_id = len(self.documents)
+                    self._append_wal(doc_id, vector, document, metadata)
+                    self.documents.append(document, metadata)
+                    self.metadata_index.add(doc_id, metadata)
+                    if replaces is not None:
+                        self._delete_document(replaces)
+                        replaced += 1
+                    else:
+                        added += 1
+                    self.dedupe.add(doc_id, url_key, chash, shash)
+                if by_passages:
+                    self._append_passages(rows, passage_embeddings)
+                    self.passages.indexed_docs = len(self.documents)
+                self._sync_wal()
+        if by_passages:
+            self._maybe_promote_passages()
+        if ann_index.should_promote(self.index):
+            self.promote_index()
+        elif accepted:
+            self._maybe_checkpoint()
+        return {"total_docs": self.live_count, "added": added, "replaced": replaced, "skipped": skipped}
+
+    @traceable(name="vectordb_promote_index", run_type="tool")
+    def promote_index(self, kind: str = None):
+        """
+        Swap the brute-force index for a trained ANN index of the configured
+        type. Checkpoints right away so the saved index matches the new type.
+        """
+        kind = kind or config.VECTOR_INDEX_TYPE
+        with self._writing():
+            print(f"Promoting {ann_index.index_type(self.index)} index with {self.index.ntotal} vectors to {kind}")
+            # Searches keep using the old index while the new one is trained.
+            promoted = ann_index.promote(self.index, kind)
+            with self._rwlock.write():
+                self.index = promoted
+            self.checkpoint()
+            return {"index_type": ann_index.index_type(self.index), "total_vectors": self.index.ntotal}
+
+    def _deleted_ids(self):
+        if self._deleted_array is None:
+            self._deleted_array = np.array(sorted(self.deleted), dtype=np.int64)
+        return self._deleted_array
+
+    def _scan_ids(self, queries, k: int, ids, index=None):
+        """
+        Exact k-NN restricted to ids, by scoring only their stored vectors.
+        """
+        vectors = ann_index.reconstruct_ids(self.index if index is None else index, ids)
+        distances = (
+            (queries ** 2).sum(axis=1)[:, None]
+            + (vectors ** 2).sum(axis=1)[None, :]
+            - 2.0 * queries @ vectors.T
+        )
+        np.maximum(distances, 0.0, out=distances)
+        top = min(k, len(ids))
+        nearest = np.argpartition(distances, top - 1, axis=1)[:, :top]
+        order = np.take_along_axis(distances, nearest, axis=1).argsort(axis=1)
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        out_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+        out_i = np.full((len(queries), k), -1, dtype=np.int64)
+        out_d[:, :top] = np.take_along_axis(distances, nearest, axis=1)
+        out_i[:, :top] = ids[nearest]
+        return out_d, out_i
+
+    def _search_vectors(self, queries, k: int, filters: dict = None):
+        """
+        k-NN over live documents matching filters. Small filtered sets are
+        scored exactly from their own vectors; larger ones go through FAISS
+        with an IDSelector, so results are the exact top-k within the filter
+        for the flat index.
+        """
+        with metrics.timer("faiss_search"):
+            return self._search_index(queries, k, filters)
+
+    def _search_index(self, queries, k: int, filters: dict = None):
+        allowed = self.metadata_index.select(filters)
+        if allowed is not None:
+            if self.deleted:
+                allowed = allowed[~np.isin(allowed, self._deleted_ids(), assume_unique=True)]
+            allowed = allowed[allowed < self.index.ntotal]
+            if len(allowed) == 0:
+                return (np.full((len(queries), k), np.inf, dtype=np.float32),
+                        np.full((len(queries), k), -1, dtype=np.int64))
+            if len(allowed) <= config.FILTER_EXACT_SCAN_MAX:
+                return self._scan_ids(queries, k, allowed)
+            selector = faiss.IDSelectorBatch(allowed)
+        elif self.deleted:
+            excluded = faiss.IDSelectorBatch(self._deleted_ids())
+            selector = faiss.IDSelectorNot(excluded)
+        else:
+            return self.index.search(queries, k)
+        return self.index.search(queries, k, params=ann_index.search_params(self.index, selector))
+
+    def _passage_ids(self, doc_ids):
+        """
+        Ids of the passages of doc_ids. Passages are stored in parent order,
+        so each document's passages are one contiguous range.
+        """
+        parents = self.passages.parent
+        lo = np.searchsorted(parents, doc_ids, side="left")
+        counts = np.searchsorted(parents, doc_ids, side="right") - lo
+        offsets = np.cumsum(counts) - counts
+        return np.repeat(lo - offsets, counts) + np.arange(counts.sum(), dtype=np.int64)
+
+    def _search_passage_vectors(self, queries, k: int, filters: dict = None):
+        """
+        k-NN over passages whose parent is live and matches filters.
+        """
+        with metrics.timer("faiss_search"):
+            allowed = self.metadata_index.select(filters)
+            if allowed is not None:
+                if self.deleted:
+                    allowed = allowed[~np.isin(allowed, self._deleted_ids(), assume_unique=True)]
+                ids = self._passage_ids(allowed)
+                if len(ids) == 0:
+                    return (np.full((len(queries), k), np.inf, dtype=np.float32),
+                            np.full((len(queries), k), -1, dtype=np.int64))
+                if len(ids) <= config.FILTER_EXACT_SCAN_MAX:
+                    return self._scan_ids(queries, k, ids, self.passage_index)
+                selector = faiss.IDSelectorBatch(ids)
+            elif self.deleted:
+                if self._deleted_passages is None:
+                    self._deleted_passages = self._passage_ids(self._deleted_ids())
+                excluded = faiss.IDSelectorBatch(self._deleted_passages)
+                selector = faiss.IDSelectorNot(excluded)
+            else:
+                return self.passage_index.search(queries, k)
+            return self.passage_index.search(queries, k, params=ann_index.search_params(self.passage_index, selector))
+
+    def _passage_hits(self, distances, indices, k: int):
+        """
+        Merge passage hits per parent document: each hit carries the parent's
+        metadata, its matching passages (overlaps joined, in text order) and
+        the distance of its best passage. Up to k parents per query.
+        """
+        texts = {}
+        results = []
+        parents, starts, ends = self.passages.parent, self.passages.start, self.passages.end
+        for row_d, row_i in zip(distances, indices):
+            best = {}
+            spans = {}
+            for dist, idx in zip(row_d, row_i):
+                if idx == -1:
+                    continue
+                parent = int(parents[idx])
+                if parent not in best:
+                    if len(best) == k:
+                        continue
+                    best[parent] = float(dist)
+                    spans[parent] = []
+                spans[parent].append((int(starts[idx]), int(ends[idx])))
+            hits = []
+            for parent, dist in best.items():
+                if parent not in texts:
+                    texts[parent] = self.documents[parent]
+                doc = texts[parent]
+                merged = merge_spans(spans[parent])
+                hits.append({
+                    "distance": dist,
+                    "text": " ... ".join(doc["text"][start:end].strip() for start, end in merged),
+                    "metadata": doc["metadata"],
+                    "passages": merged
+                })
+            results.append({"hits": hits})
+        return results
 
     @traceable(name="vectordb_search", run_type="retriever") 
-    def search(self, query: str, k: int = 5):
-        if self.index is None or self.index.ntotal == 0:
-            return {"hits": []}
-        q_emb = self.get_embedding(query)
+    def search(self, query: str, k: int = 5, filters: dict = None):
+        return self.search_many([query], k, filters)[0]
+
+    @traceable(name="vectordb_search_many", run_type="retriever")
+    def search_many(self, queries: list, k: int = 5, filters: dict = None):
+        """
+        Search several queries with one embeddings request and one batched
+        index search. Returns one {"hits": [...]} per query, in order; a
+        document hit by several queries is read from the store once.
+
+        With the passage index, each hit's text is only the document's
+        matching passages (its "passages" lists their character spans), and
+        hits are ranked by their best passage.
+        """
+        if self._changed_on_disk():
+            with self._writing():
+                pass
+        if self.index is None or self.index.ntotal == 0 or not queries:
+            return [{"hits": []} for _ in queries]
+        q_emb = self.get_embeddings(queries)
+        with self._rwlock.read():
+            return self._search_embeddings(q_emb, k, filters)
+
+    def _search_embeddings(self, q_emb, k: int, filters: dict = None):
         if q_emb.shape[1] != self.index.d:
             print(f"Query embedding dimension {q_emb.shape[1]} does not match index dimension {self.index.d}")
-            return {"hits": []}
-        distances, indices = self.index.search(q_emb, k)
-        hits = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx != -1 and idx < len(self.documents):
-                doc = self.documents[idx]
-                hits.append({
-                    "distance": float(dist),
-                    "text": doc["text"],
-                    "metadata": doc["metadata"]
-                })
-        return {"hits": hits}
+            return [{"hits": []} for _ in q_emb]
+        if config.PASSAGE_INDEX_ENABLED and self.passage_index is not None and self.passage_index.ntotal > 0:
+            distances, indices = self._search_passage_vectors(q_emb, k * config.PASSAGE_SEARCH_FANOUT, filters)
+            return self._passage_hits(distances, indices, k)
+        distances, indices = self._search_vectors(q_emb, k, filters)
+        docs = {
+            int(idx): self.documents[int(idx)]
+            for idx in np.unique(indices)
+            if idx != -1 and idx < len(self.documents)
+        }
+        results = []
+        for row_d, row_i in zip(distances, indices):
+            hits = []
+            for dist, idx in zip(row_d, row_i):
+                doc = docs.get(int(idx))
+                if doc is not None:
+                    hits.append({
+                        "distance": float(dist),
+                        "text": doc["text"],
+                        "metadata": doc["metadata"]
+                    })
+            results.append({"hits": hits})
+        return results
 
     @traceable(name="vectordb_save_index", run_type="tool") 
     def save_index(self):
         if self.index is not None:
-            faiss.write_index(self.index, f"{config.VECTOR_DB_PATH}/faiss_index.bin")
-            with open(f"{config.VECTOR_DB_PATH}/documents.pkl", "wb") as f:
-                pickle.dump(self.documents, f)
\ No newline at end of file
+            # The document store is append-only; commit its new rows before the
+            # index that points at them. The index and lookup tables are written
+            # to temp files and renamed into place, so a crash mid-save leaves
+            # the previous checkpoint intact.
+            self.documents.flush(fsync=True)
+            faiss.write_index(self.index, f"{self.index_path}.tmp")
+            os.replace(f"{self.index_path}.tmp", self.index_path)
+            if self.passage_index is not None:
+                faiss.write_index(self.passage_index, f"{self.passage_index_path}.tmp")
+                os.replace(f"{self.passage_index_path}.tmp", self.passage_index_path)
+                self.passages.save(self.passages_path)
+            self._save_table(self.dedupe_path, self.dedupe)
+            self._save_table(self.metadata_index_path, self.metadata_index)
+
+    @traceable(name="vectordb_checkpoint", run_type="tool")
+    def checkpoint(self):
+        """
+        Fold the write-ahead log into the index files and truncate it.
+        """
+        with self._writing(), self._rwlock.write():
+            self.save_index()
+            self.embedding_cache.flush()
+            if self._wal is not None:
+                self._wal.truncate(0)
+                self._wal.seek(0)
+            self._last_checkpoint = time.time()
+
+    def close(self):
+        with self._write_lock, self._store_lock:
+            if self._wal is None:
+                return
+            self.embedding_cache.flush()
+            # A process that wrote after us has loaded our log records and
+            # checkpoints them itself; folding our stale view in would undo it.
+            if self._wal.tell() > 0 and not self._changed_on_disk():
+                self.checkpoint()
+            self._wal.close()
+            self._wal = None
+            self.documents.close()
+            atexit.unregister(self.close)
@@ -0,0 +1,100 @@
+import re
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import numpy as np
+
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src"}
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = 64 // SIMHASH_BANDS
+_WORD_RE = re.compile(r"\w+")
+
+def normalize_url(url: str):
+    """
+    Canonical form of a URL for duplicate detection: lowercase host without
+    "www.", no fragment, no tracking parameters, sorted query, no trailing slash.
+    """
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", host, path, urlencode(query), ""))
+
+def content_hash(text: str) -> str:
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    64-bit SimHash over word shingles; near-identical texts differ in few bits.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return 0
+    n = max(len(words) - shingle_size + 1, 1)
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(" ".join(words[i:i + shingle_size]).encode("utf-8"),
+                                        digest_size=8).digest(), "little")
+         for i in range(n)),
+        dtype=np.uint64, count=n
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - n
+    return sum(1 << int(i) for i in np.flatnonzero(votes > 0))
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class DedupeIndex:
+    """
+    In-memory lookup tables over live documents: normalized URL, content hash
+    and (optionally) SimHash bands for near-duplicate candidates. Pickled at
+    each checkpoint with the document count it covers; on load, documents
+    added after that (e.g. replayed from the write-ahead log) are added from
+    their metadata, and a missing or unreadable pickle is rebuilt from all of it.
+    """
+    def __init__(self, near_duplicate_distance: int = 3):
+        self.near_duplicate_distance = near_duplicate_distance
+        self.by_url = {}
+        self.by_hash = {}
+        self.simhashes = {}
+        self.bands = [{} for _ in range(SIMHASH_BANDS)]
+
+    @staticmethod
+    def _band_keys(value: int):
+        mask = (1 << SIMHASH_BAND_BITS) - 1
+        return [(value >> (i * SIMHASH_BAND_BITS)) & mask for i in range(SIMHASH_BANDS)]
+
+    def add(self, doc_id: int, url_key, chash: str, shash=None):
+        if url_key:
+            self.by_url[url_key] = doc_id
+        self.by_hash[chash] = doc_id
+        if shash is not None:
+            self.simhashes[doc_id] = shash
+            for band, key in zip(self.bands, self._band_keys(shash)):
+                band.setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_id: int, url_key, chash: str):
+        if url_key and self.by_url.get(url_key) == doc_id:
+            del self.by_url[url_key]
+        if self.by_hash.get(chash) == doc_id:
+            del self.by_hash[chash]
+        shash = self.simhashes.pop(doc_id, None)
+        if shash is not None:
+            for band, key in zip(self.bands, self._band_keys(shash)):
+                band.get(key, set()).discard(doc_id)
+
+    def find_near_duplicate(self, shash: int):
+        candidates = set()
+        for band, key in zip(self.bands, self._band_keys(shash)):
+            candidates.update(band.get(key, ()))
+        for doc_id in candidates:
+            if hamming_distance(shash, self.simhashes[doc_id]) <= self.near_duplicate_distance:
+                return doc_id
+        return None
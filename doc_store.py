@@ -0,0 +1,183 @@
+import os
+import json
+import mmap
+import threading
+import numpy as np
+
+FLAG_DELETED = 1
+
+class DocumentStore:
+    """
+    Append-only columnar document store opened with mmap.
+
+    documents.text     UTF-8 text of every document, back to back
+    documents.meta     compact JSON metadata of every document, back to back
+    documents.offsets  fixed-width int64 rows: text start/end, meta start/end
+    documents.flags    one byte per document (deleted bit)
+
+    A row in documents.offsets is written last, so it is the commit point of
+    an append: bytes past the last committed row are dropped when reopening.
+    Documents are only decoded when read by id.
+    """
+    def __init__(self, path: str):
+        self.text_path = f"{path}/documents.text"
+        self.meta_path = f"{path}/documents.meta"
+        self.offsets_path = f"{path}/documents.offsets"
+        self.flags_path = f"{path}/documents.flags"
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._recover()
+        self._text_file = open(self.text_path, "ab")
+        self._meta_file = open(self.meta_path, "ab")
+        self._offsets_file = open(self.offsets_path, "ab")
+        self._flags_file = open(self.flags_path, "r+b")
+        self._text_end = os.path.getsize(self.text_path)
+        self._meta_end = os.path.getsize(self.meta_path)
+        self._committed = os.path.getsize(self.offsets_path) // 32
+        self._pending = []
+        self._text_map = None
+        self._meta_map = None
+        self._offsets = None
+        self._remap()
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}/documents.offsets")
+
+    def _recover(self):
+        for p in (self.text_path, self.meta_path, self.offsets_path, self.flags_path):
+            if not os.path.exists(p):
+                open(p, "wb").close()
+        rows = os.path.getsize(self.offsets_path) // 32
+        with open(self.offsets_path, "r+b") as f:
+            f.truncate(rows * 32)
+        text_end = meta_end = 0
+        if rows:
+            last = np.fromfile(self.offsets_path, dtype=np.int64, count=4, offset=(rows - 1) * 32)
+            text_end, meta_end = int(last[1]), int(last[3])
+        for p, end in ((self.text_path, text_end), (self.meta_path, meta_end), (self.flags_path, rows)):
+            size = os.path.getsize(p)
+            if size > end:
+                with open(p, "r+b") as f:
+                    f.truncate(end)
+            elif p == self.flags_path and size < end:
+                with open(p, "ab") as f:
+                    f.write(bytes(end - size))
+
+    def _remap(self):
+        for m in (self._text_map, self._meta_map):
+            if m is not None:
+                m.close()
+        self._text_file.flush()
+        self._meta_file.flush()
+        self._text_map = self._map(self.text_path)
+        self._meta_map = self._map(self.meta_path)
+        if self._committed:
+            self._offsets = np.memmap(self.offsets_path, dtype=np.int64, mode="r", shape=(self._committed, 4))
+        else:
+            self._offsets = np.empty((0, 4), dtype=np.int64)
+
+    @staticmethod
+    def _map(path: str):
+        if os.path.getsize(path) == 0:
+            return None
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self._committed + len(self._pending)
+
+    def append(self, text: str, metadata: dict) -> int:
+        """
+        Append a document and return its id. The row is not committed until
+        flush(); until then it is served from memory.
+        """
+        text_bytes = text.encode("utf-8")
+        meta_bytes = json.dumps(metadata, separators=(",", ":"), default=str).encode("utf-8")
+        with self._lock:
+            doc_id = len(self)
+            self._pending.append((
+                self._text_end, self._text_end + len(text_bytes),
+                self._meta_end, self._meta_end + len(meta_bytes)
+            ))
+            self._text_file.write(text_bytes)
+            self._meta_file.write(meta_bytes)
+            self._flags_file.seek(0, os.SEEK_END)
+            self._flags_file.write(b"\x00")
+            self._text_end += len(text_bytes)
+            self._meta_end += len(meta_bytes)
+            return doc_id
+
+    def flush(self, fsync: bool = False):
+        with self._lock:
+            if self._pending:
+                self._text_file.flush()
+                self._meta_file.flush()
+                self._flags_file.flush()
+                if fsync:
+                    for f in (self._text_file, self._meta_file, self._flags_file):
+                        os.fsync(f.fileno())
+                self._offsets_file.write(np.array(self._pending, dtype=np.int64).tobytes())
+                self._offsets_file.flush()
+                self._committed += len(self._pending)
+                self._pending = []
+                self._remap()
+            else:
+                self._flags_file.flush()
+            if fsync:
+                os.fsync(self._offsets_file.fileno())
+                os.fsync(self._flags_file.fileno())
+
+    def _row(self, doc_id: int):
+        if doc_id < self._committed:
+            return self._offsets[doc_id]
+        row = self._pending[doc_id - self._committed]
+        if self._text_map is None or row[1] > len(self._text_map) or \
+           self._meta_map is None or row[3] > len(self._meta_map):
+            self._remap()
+        return row
+
+    def get_text(self, doc_id: int) -> str:
+        with self._lock:
+            t0, t1, _, _ = self._row(doc_id)
+            return self._text_map[t0:t1].decode("utf-8") if t1 > t0 else ""
+
+    def get_metadata(self, doc_id: int) -> dict:
+        with self._lock:
+            _, _, m0, m1 = self._row(doc_id)
+            return json.loads(self._meta_map[m0:m1]) if m1 > m0 else {}
+
+    def __getitem__(self, doc_id: int) -> dict:
+        if doc_id < 0 or doc_id >= len(self):
+            raise IndexError(doc_id)
+        return {"text": self.get_text(doc_id), "metadata": self.get_metadata(doc_id)}
+
+    def is_deleted(self, doc_id: int) -> bool:
+        with self._lock:
+            self._flags_file.seek(doc_id)
+            return bool(self._flags_file.read(1)[0] & FLAG_DELETED)
+
+    def mark_deleted(self, doc_id: int):
+        with self._lock:
+            self._flags_file.seek(doc_id)
+            self._flags_file.write(bytes([FLAG_DELETED]))
+
+    def deleted_ids(self):
+        with self._lock:
+            self._flags_file.flush()
+            flags = np.fromfile(self.flags_path, dtype=np.uint8, count=len(self))
+        return np.flatnonzero(flags & FLAG_DELETED)
+
+    def iter_metadata(self, start: int = 0):
+        for doc_id in range(start, len(self)):
+            yield doc_id, self.get_metadata(doc_id)
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            for f in (self._text_file, self._meta_file, self._flags_file, self._offsets_file):
+                f.close()
+            for m in (self._text_map, self._meta_map):
+                if m is not None:
+                    m.close()
+            self._text_map = self._meta_map = None
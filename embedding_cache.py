@@ -0,0 +1,141 @@
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by a hash of (model, text).
+
+    Vectors live in a float32 memory-mapped file; a small index maps each
+    key to its slot (row offset) in LRU order. The file grows by doubling
+    as slots are taken, up to max_entries rows; when the cache is full the
+    least recently used slot is reused.
+    """
+    INITIAL_ROWS = 1024
+
+    def __init__(self, path: str, dimension: int, max_entries: int):
+        self.path = path
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.vectors_path = f"{path}/embeddings.f32"
+        self.tags_path = f"{path}/embeddings.tags"
+        self.index_path = f"{path}/embeddings_index.pkl"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        os.makedirs(path, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        slots = None
+        if os.path.exists(self.index_path) and os.path.exists(self.vectors_path) \
+           and os.path.exists(self.tags_path):
+            try:
+                with open(self.index_path, "rb") as f:
+                    meta = pickle.load(f)
+                if meta["dimension"] == self.dimension and meta["capacity"] == self.max_entries:
+                    slots = meta["slots"]
+                else:
+                    print("Embedding cache layout changed. Starting with an empty cache.")
+            except Exception as e:
+                print(f"Error loading embedding cache index: {e}. Starting with an empty cache.")
+        if slots is None:
+            for path in (self.vectors_path, self.tags_path):
+                open(path, "wb").close()
+        self.slots = slots if slots is not None else OrderedDict()
+        self._next_slot = max(self.slots.values(), default=-1) + 1
+        rows = os.path.getsize(self.vectors_path) // (4 * self.dimension)
+        self._map(max(rows, self._next_slot, min(self.INITIAL_ROWS, self.max_entries)))
+
+    def _map(self, rows: int):
+        """
+        (Re)open both files with room for rows slots, extending them if needed.
+        """
+        self.vectors = self.tags = None
+        for path, row_bytes in ((self.vectors_path, 4 * self.dimension), (self.tags_path, 8)):
+            if os.path.getsize(path) < rows * row_bytes:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * row_bytes)
+        self.rows = rows
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(rows, self.dimension))
+        # Per-slot tag so a slot reused after the last flush cannot be read back
+        # under the key it held before.
+        self.tags = np.memmap(self.tags_path, dtype=np.uint64, mode="r+", shape=(rows,))
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()[:16]
+
+    @staticmethod
+    def _tag(key: bytes) -> int:
+        return int.from_bytes(key[:8], "little") or 1
+
+    def get(self, model: str, text: str):
+        key = self.make_key(model, text)
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None or int(self.tags[slot]) != self._tag(key):
+                if slot is not None:
+                    del self.slots[key]
+                self.misses += 1
+                return None
+            self.slots.move_to_end(key)
+            self.hits += 1
+            return np.array(self.vectors[slot])
+
+    def put(self, model: str, text: str, vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dimension:
+            return
+        key = self.make_key(model, text)
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                if self._next_slot < self.max_entries:
+                    slot = self._next_slot
+                    if slot >= self.rows:
+                        self.vectors.flush()
+                        self.tags.flush()
+                        self._map(min(2 * self.rows, self.max_entries))
+                    self._next_slot += 1
+                else:
+                    _, slot = self.slots.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self.slots.move_to_end(key)
+            self.vectors[slot] = vector
+            self.tags[slot] = self._tag(key)
+            self.slots[key] = slot
+            self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.vectors.flush()
+            self.tags.flush()
+            with open(f"{self.index_path}.tmp", "wb") as f:
+                pickle.dump({
+                    "dimension": self.dimension,
+                    "capacity": self.max_entries,
+                    "slots": self.slots
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{self.index_path}.tmp", self.index_path)
+            self._dirty = False
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.slots),
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0
+        }
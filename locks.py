@@ -0,0 +1,99 @@
+import os
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: no flock; only one writing process is supported there
+    fcntl = None
+
+class ReadWriteLock:
+    """
+    Many readers or one writer. Waiting writers block new readers, so a
+    steady stream of searches cannot starve ingest. The writing thread may
+    re-enter either side; a reader must not ask for the write side.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._writes = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+            self._writes += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writes -= 1
+                if self._writes == 0:
+                    self._writer = None
+                    self._cond.notify_all()
+
+class FileLock:
+    """
+    Exclusive advisory lock (flock) on a file, held across processes. Within
+    a process it is re-entrant and also excludes other threads; depth is how
+    many times the holder has entered it.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.depth = 0
+        self._lock = threading.RLock()
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            if self.depth == 0:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a+b")
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._lock.release()
+            raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+        return False
@@ -1,42 +1,154 @@
-from advisor import FantasyAdvisor
+# Keep module-level imports light: --help, argument errors and --server
+# must not pay for faiss, langchain, openai or exa. Heavy modules are
+# imported by the command that needs them.
 import argparse
+import contextlib
+import json
 import sys
+import time
 import config
 import os
-from dotenv import load_dotenv
-load_dotenv()
 
+def load_environment():
+    from dotenv import load_dotenv
+    load_dotenv()
+    print("---- Environment Variables after loading .env ----")
+    print(f"LANGSMITH_API_KEY Loaded: {os.getenv('LANGSMITH_API_KEY') is not None}")
+    print(f"LANGSMITH_TRACING: {os.getenv('LANGSMITH_TRACING')}")
+    print(f"LANGSMITH_PROJECT: {os.getenv('LANGSMITH_PROJECT')}")
+    print(f"OPENAI_API_KEY Loaded: {os.getenv('OPENAI_API_KEY') is not None}")
+    print("-------------------------------------------------")
 
+def read_player_names(path: str):
+    f = sys.stdin if path == '-' else open(path)
+    try:
+        names = [line.strip() for line in f]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return [name for name in names if name and not name.startswith('#')]
 
-print("---- Environment Variables after loading .env ----")
-print(f"LANGSMITH_API_KEY Loaded: {os.getenv('LANGSMITH_API_KEY') is not None}")
-print(f"LANGSMITH_TRACING: {os.getenv('LANGSMITH_TRACING')}")
-print(f"LANGSMITH_PROJECT: {os.getenv('LANGSMITH_PROJECT')}")
-print(f"OPENAI_API_KEY Loaded: {os.getenv('OPENAI_API_KEY') is not None}")
-print("-------------------------------------------------")
+def print_token(text: str):
+    print(text, end="", flush=True)
 
-def main():
-    print("Starting Fantasy IPL Cricket Advisor...")
+def print_latency(result: dict):
+    print(f"Time to first token: {result['time_to_first_token']:.2f}s, total: {result['total_latency']:.2f}s")
+
+def print_lineup(rank: int, lineup: dict):
+    print(f"\nLINEUP {rank}: {lineup['projected_points']:.1f} projected points, {lineup['credits']:.1f} credits")
+    print(f"Captain: {lineup['captain']}, vice-captain: {lineup['vice_captain']}")
+    print("Roles: " + ", ".join(f"{role} {count}" for role, count in lineup['roles'].items()))
+    print("Players: " + ", ".join(lineup['players']))
+
+def run_optimizer(args):
+    from optimizer import load_players, score_with_advisor, optimize_lineups
+    try:
+        players = load_players(args.optimize)
+    except (OSError, ValueError) as e:
+        print(f"Error reading player pool: {e}")
+        sys.exit(1)
+    unscored = sum(1 for p in players if "projection" not in p)
+    if unscored:
+        print(f"Scoring {unscored} players without projections from recommendations...")
+        try:
+            if args.server:
+                from advisor_client import AdvisorClient
+                advisor = AdvisorClient(args.server)
+            else:
+                load_environment()
+                from advisor import FantasyAdvisor
+                advisor = FantasyAdvisor()
+            score_with_advisor(players, advisor)
+        except Exception as e:
+            print(f"Error scoring players: {e}")
+            sys.exit(1)
+    print(f"Optimizing lineups from {len(players)} players...")
+    lineups = optimize_lineups(players, args.top_n)
+    if not lineups:
+        print("No lineup satisfies the role, credit and per-team limits.")
+        return
+    for rank, lineup in enumerate(lineups, 1):
+        print_lineup(rank, lineup)
+    if args.output != '-':
+        with open(args.output, 'w') as f:
+            json.dump(lineups, f, indent=2)
+        print(f"\nLineups written to {args.output}")
 
+def build_parser():
     parser = argparse.ArgumentParser(description='Fantasy IPL Cricket Advisor')
     parser.add_argument('--update', action='store_true', help='Update knowledge base')
     parser.add_argument('--player', type=str, help='Get recommendation for a specific player')
+    parser.add_argument('--players-file', type=str, help='Get recommendations for every player listed in a file (one per line, "-" for stdin), written as JSON Lines')
+    parser.add_argument('--output', type=str, default='-', help='Where --players-file writes its JSON Lines, or --optimize its lineups as JSON (default: stdout)')
     parser.add_argument('--team', type=str, help='Get advice for picking players from a team')
     parser.add_argument('--captain', type=str, nargs='+', help='Get captain recommendation from list of players')
     parser.add_argument('--match', nargs=2, metavar=('TEAM1', 'TEAM2'), help='Get match analysis for TEAM1 vs TEAM2')
+    parser.add_argument('--stream', action='store_true', help='Print recommendations token by token as they are generated')
+    parser.add_argument('--serve', action='store_true', help='Run the advisor as a local JSON API server')
+    parser.add_argument('--host', type=str, default=config.SERVER_HOST, help='Address for --serve to bind')
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT, help='Port for --serve to bind')
+    parser.add_argument('--refresh-once', action='store_true', help='Refresh every stale knowledge-base topic (teams, tracked players, injuries) once')
+    parser.add_argument('--refresh-daemon', action='store_true', help='Keep refreshing stale knowledge-base topics until interrupted')
+    parser.add_argument('--optimize', type=str, metavar='FILE', help='Pick the best XI, captain and vice-captain from a CSV or JSON player pool (name, team, role, credits, optional projection)')
+    parser.add_argument('--top-n', type=int, default=config.OPTIMIZER_TOP_N, help='How many alternate lineups --optimize prints')
+    parser.add_argument('--metrics', choices=['prometheus', 'json'], help='Print local stage timings, counters and cost estimates after the command')
+    parser.add_argument('--server', type=str, metavar='URL', help='Send requests to a running advisor server instead of starting one, e.g. http://127.0.0.1:8765')
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    records = sys.stdout
+    # --players-file writes JSON Lines to stdout by default; every other
+    # message (progress, warnings from the store) goes to stderr so the
+    # records stay parseable.
+    diagnostics = sys.stderr if args.players_file and args.output == '-' else sys.stdout
+    with contextlib.redirect_stdout(diagnostics):
+        print("Starting Fantasy IPL Cricket Advisor...")
+        print(f"Arguments received: {args}")
+        run(args, records)
 
-    print("Parsing arguments...")
-    args = parser.parse_args()
-    print(f"Arguments received: {args}")
+def run(args, records):
+
+    if args.serve:
+        load_environment()
+        from server import serve
+        serve(args.host, args.port)
+        return
+
+    if args.refresh_once or args.refresh_daemon:
+        load_environment()
+        from refresh import KnowledgeBaseRefresher
+        refresher = KnowledgeBaseRefresher()
+        if args.refresh_daemon:
+            refresher.run_forever()
+        else:
+            print(refresher.run_once())
+        return
+
+    if args.optimize:
+        run_optimizer(args)
+        return
+
+    if not any([args.update, args.player, args.players_file, args.team, args.captain, args.match]):
+        print("No action specified. Use --help to see available options.")
+        return
 
     print("Initializing advisor...")
     try:
-        advisor = FantasyAdvisor() 
+        if args.server:
+            from advisor_client import AdvisorClient
+            advisor = AdvisorClient(args.server)
+        else:
+            load_environment()
+            from advisor import FantasyAdvisor
+            advisor = FantasyAdvisor()
         print("Advisor initialized successfully")
     except Exception as e:
         print(f"Error initializing advisor: {e}")
         sys.exit(1)
 
+    on_token = print_token if args.stream else None
+
     if args.update:
         print("Updating knowledge base...")
         try:
@@ -49,19 +161,48 @@ def main():
     if args.player:
         print(f"Getting recommendation for {args.player}...")
         try:
-            rec = advisor.get_player_recommendation(args.player)
             print("\nRECOMMENDATION:")
-            print(rec["recommendation"])
+            rec = advisor.get_player_recommendation(args.player, on_token=on_token)
+            if args.stream:
+                print()
+            else:
+                print(rec["recommendation"])
+            print_latency(rec)
             print(f"Confidence: {rec['confidence_label']} ({rec['confidence_score']:.2f})")
         except Exception as e:
             print(f"Error getting player recommendation: {e}")
 
+    if args.players_file:
+        try:
+            players = read_player_names(args.players_file)
+            print(f"Getting recommendations for {len(players)} players...")
+            out = records if args.output == '-' else open(args.output, 'w')
+            started = time.perf_counter()
+            errors = 0
+            try:
+                for rec in advisor.get_player_recommendations(players):
+                    errors += rec["error"] is not None
+                    out.write(json.dumps(rec) + "\n")
+                    out.flush()
+            finally:
+                if out is not records:
+                    out.close()
+            elapsed = time.perf_counter() - started
+            print(f"{len(players)} players in {elapsed:.1f}s ({len(players) / max(elapsed, 1e-9):.2f} players/s), "
+                  f"{errors} errors", file=sys.stderr)
+        except Exception as e:
+            print(f"Error getting player recommendations: {e}")
+
     if args.team:
         print(f"Getting advice for team {args.team}...")
         try:
-            adv = advisor.get_team_advice(args.team)
             print("\nTEAM ADVICE:")
-            print(adv["advice"])
+            adv = advisor.get_team_advice(args.team, on_token=on_token)
+            if args.stream:
+                print()
+            else:
+                print(adv["advice"])
+            print_latency(adv)
             print(f"Confidence: {adv['confidence_label']} ({adv['confidence_score']:.2f})")
         except Exception as e:
             print(f"Error getting team advice: {e}")
@@ -69,9 +210,13 @@ def main():
     if args.captain:
         print(f"Getting captain recommendation from {', '.join(args.captain)}...")
         try:
-            cap = advisor.get_captain_recommendation(args.captain)
             print("\nCAPTAIN RECOMMENDATION:")
-            print(cap["recommendation"])
+            cap = advisor.get_captain_recommendation(args.captain, on_token=on_token)
+            if args.stream:
+                print()
+            else:
+                print(cap["recommendation"])
+            print_latency(cap)
             print(f"Confidence: {cap['confidence_label']} ({cap['confidence_score']:.2f})")
         except Exception as e:
             print(f"Error getting captain recommendation: {e}")
@@ -80,15 +225,20 @@ def main():
         team1, team2 = args.match
         print(f"Getting match analysis for {team1} vs {team2}...")
         try:
-            analysis = advisor.get_match_analysis(team1, team2)
             print("\nMATCH ANALYSIS:")
-            print(analysis["analysis"])
+            analysis = advisor.get_match_analysis(team1, team2, on_token=on_token)
+            if args.stream:
+                print()
+            else:
+                print(analysis["analysis"])
+            print_latency(analysis)
             print(f"Confidence: {analysis['confidence_label']} ({analysis['confidence_score']:.2f})")
         except Exception as e:
             print(f"Error getting match analysis: {e}")
 
-    if not any([args.update, args.player, args.team, args.captain, args.match]):
-        print("No action specified. Use --help to see available options.")
+    if args.metrics and not args.server:
+        import metrics
+        print(metrics.registry.to_json() if args.metrics == 'json' else metrics.registry.to_prometheus())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
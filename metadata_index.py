@@ -0,0 +1,94 @@
+import bisect
+from datetime import datetime
+from urllib.parse import urlsplit
+import numpy as np
+
+FILTER_KEYS = ("type", "source", "date_from", "date_to")
+
+def source_of(url: str):
+    """
+    Source of a document for filtering: the URL host without "www.".
+    """
+    if not url:
+        return None
+    host = urlsplit(url.strip()).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+def to_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value.timestamp()
+
+class MetadataIndex:
+    """
+    Inverted index over document metadata for filtered search.
+
+    "type" and "source" map each value to the ascending list of document ids
+    that have it; dates are kept as a sorted list of (timestamp, id) so a range
+    is two bisects. Selecting ids therefore costs time proportional to the
+    matching documents, not to the ones filtered out.
+    """
+    def __init__(self):
+        self.by_field = {"type": {}, "source": {}}
+        self.dates = []
+
+    def add(self, doc_id: int, metadata: dict):
+        values = {
+            "type": metadata.get("type") or "general",
+            "source": source_of(metadata.get("url")),
+        }
+        for field, value in values.items():
+            if value is not None:
+                self.by_field[field].setdefault(value, []).append(doc_id)
+        ts = to_timestamp(metadata.get("date"))
+        if ts is not None:
+            bisect.insort(self.dates, (ts, doc_id))
+
+    def _field_ids(self, field: str, wanted):
+        if isinstance(wanted, str):
+            wanted = [wanted]
+        if field == "source":
+            wanted = [source_of(w if "://" in w else f"https://{w}") for w in wanted]
+        lists = [self.by_field[field].get(w, []) for w in wanted]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([np.asarray(l, dtype=np.int64) for l in lists]))
+
+    def _date_ids(self, date_from, date_to):
+        lo = 0
+        hi = len(self.dates)
+        ts_from = to_timestamp(date_from)
+        ts_to = to_timestamp(date_to)
+        if ts_from is not None:
+            lo = bisect.bisect_left(self.dates, (ts_from, -1))
+        if ts_to is not None:
+            hi = bisect.bisect_right(self.dates, (ts_to, float("inf")))
+        return np.sort(np.fromiter((doc_id for _, doc_id in self.dates[lo:hi]), dtype=np.int64))
+
+    def select(self, filters: dict):
+        """
+        Sorted array of document ids matching every filter, or None when
+        filters is empty. Accepted keys: type, source (a value or a list of
+        values), date_from and date_to (ISO strings, datetimes or timestamps).
+        """
+        if not filters:
+            return None
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unsupported search filters: {', '.join(sorted(unknown))}")
+        selected = None
+        for field in ("type", "source"):
+            if filters.get(field) is not None:
+                ids = self._field_ids(field, filters[field])
+                selected = ids if selected is None else np.intersect1d(selected, ids, assume_unique=True)
+        if filters.get("date_from") is not None or filters.get("date_to") is not None:
+            ids = self._date_ids(filters.get("date_from"), filters.get("date_to"))
+            selected = ids if selected is None else np.intersect1d(selected, ids, assume_unique=True)
+        return selected
@@ -0,0 +1,221 @@
+import json
+import time
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+import config
+
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "ipl_advisor_"
+
+def _label_key(labels: dict):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key, extra: dict = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+class Histogram:
+    """
+    Count and sum of all observations, and quantiles over the most recent
+    `window` of them.
+    """
+    def __init__(self, window: int):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+class MetricsRegistry:
+    """
+    In-process counters and latency histograms, independent of LangSmith.
+    Safe to use from any thread; each update takes one short lock.
+    """
+    def __init__(self, window: int = None):
+        self.window = window or config.METRICS_WINDOW
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.window)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """
+        Time a block as stage_seconds{stage=...} and count it in
+        stage_calls_total with status ok/error.
+        """
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - started, stage=stage, **labels)
+            self.inc("stage_calls_total", stage=stage, status=status, **labels)
+
+    def samples(self, name: str, **labels) -> list:
+        """
+        The recent observations (up to the window) of one histogram series.
+        """
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(_label_key(labels))
+            return list(histogram.samples) if histogram else []
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def collect(self, fn):
+        """
+        Register fn, called on every snapshot, for counters kept elsewhere
+        (e.g. by connection pools). It returns (name, labels, value) tuples.
+        """
+        with self._lock:
+            self._collectors.append(fn)
+
+    def snapshot(self):
+        """
+        JSON-serializable view: counters by name and label set, histograms with
+        count, sum and p50/p95/p99.
+        """
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: (h.count, h.sum, list(h.samples)) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+            collectors = list(self._collectors)
+        for fn in collectors:
+            for name, labels, value in fn():
+                counters.setdefault(name, {})[_label_key(labels)] = value
+        out = {"counters": {}, "histograms": {}}
+        for name, series in counters.items():
+            out["counters"][name] = [{"labels": dict(key), "value": value} for key, value in series.items()]
+        for name, series in histograms.items():
+            out["histograms"][name] = []
+            for key, (count, total, samples) in series.items():
+                quantiles = np.quantile(samples, QUANTILES).tolist() if samples else [0.0] * len(QUANTILES)
+                out["histograms"][name].append({
+                    "labels": dict(key),
+                    "count": count,
+                    "sum": total,
+                    **{f"p{int(q * 100)}": v for q, v in zip(QUANTILES, quantiles)},
+                })
+        return out
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format; histograms are exported as
+        summaries with 0.5/0.95/0.99 quantiles.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in sorted(snapshot["counters"].items()):
+            metric = PREFIX + name
+            if name in self._help:
+                lines.append(f"# HELP {metric} {self._help[name]}")
+            lines.append(f"# TYPE {metric} counter")
+            for entry in series:
+                lines.append(f"{metric}{_format_labels(_label_key(entry['labels']))} {entry['value']}")
+        for name, series in sorted(snapshot["histograms"].items()):
+            metric = PREFIX + name
+            if name in self._help:
+                lines.append(f"# HELP {metric} {self._help[name]}")
+            lines.append(f"# TYPE {metric} summary")
+            for entry in series:
+                key = _label_key(entry["labels"])
+                for q in QUANTILES:
+                    lines.append(f"{metric}{_format_labels(key, {'quantile': str(q)})} {entry[f'p{int(q * 100)}']}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {entry['sum']}")
+                lines.append(f"{metric}_count{_format_labels(key)} {entry['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+registry = MetricsRegistry()
+registry.describe("stage_seconds", "Wall time per pipeline stage")
+registry.describe("stage_calls_total", "Calls per pipeline stage and outcome")
+registry.describe("request_seconds", "End-to-end wall time per advisor method")
+registry.describe("requests_total", "Advisor requests by method and outcome")
+registry.describe("tokens_total", "Tokens by kind (prompt, completion, embedding); estimated when the API does not report usage")
+registry.describe("bytes_total", "Bytes of text received, by source")
+registry.describe("results_total", "Search results received, by source")
+registry.describe("cost_usd_total", "Estimated spend from LLM_COST_PER_1K_TOKENS and EXA_COST_PER_RESULT")
+registry.describe("cache_total", "Cache lookups by cache and result")
+registry.describe("refresh_topics_total", "Knowledge-base refresh topics by kind and outcome")
+registry.describe("http_requests_total", "HTTP requests through the shared API clients, by client")
+registry.describe("http_connections_total", "Connections used by those requests, by client and whether they were reused")
+registry.describe("http_retries_total", "Transient failures retried with backoff, by client")
+
+def timer(stage: str, **labels):
+    return registry.timer(stage, **labels)
+
+def inc(name: str, value: float = 1, **labels):
+    registry.inc(name, value, **labels)
+
+def observe(name: str, value: float, **labels):
+    registry.observe(name, value, **labels)
+
+def timed_request(method: str):
+    """
+    Decorator recording end-to-end request_seconds{method} and
+    requests_total{method,status}.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                observe("request_seconds", time.perf_counter() - started, method=method)
+                inc("requests_total", method=method, status=status)
+        return wrapper
+    return decorator
+
+def record_llm_tokens(prompt_tokens: int, completion_tokens: int, model: str = None):
+    model = model or config.MODEL_NAME
+    inc("tokens_total", prompt_tokens, kind="prompt", model=model)
+    inc("tokens_total", completion_tokens, kind="completion", model=model)
+    inc("cost_usd_total", (prompt_tokens + completion_tokens) / 1000 * config.LLM_COST_PER_1K_TOKENS, service="llm")
+
+def record_exa_results(results: list):
+    inc("results_total", len(results), source="exa")
+    inc("bytes_total", sum(len((getattr(r, "text", None) or "").encode("utf-8")) for r in results), source="exa")
+    inc("cost_usd_total", len(results) * config.EXA_COST_PER_RESULT, service="exa")
@@ -1,9 +1,13 @@
 from langsmith import Client
 import config
+import scoring
 import time
 import uuid
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+from telemetry import TelemetryExporter
 
 class LangSmithMonitor:
     def __init__(self):
@@ -12,6 +16,21 @@ class LangSmithMonitor:
             api_url=config.LANGCHAIN_ENDPOINT
         )
         self.project_name = config.LANGCHAIN_PROJECT
+        self.exporter = TelemetryExporter(self.client, spill_path=config.TELEMETRY_SPILL_PATH)
+        # run_id -> (trace_id, dotted_order) of recent runs, so children
+        # logged later can be placed in their parent's trace.
+        self._traces = OrderedDict()
+        self._traces_lock = threading.Lock()
+
+    def _trace_position(self, run_id: str, start_time: datetime, parent_run_id: Optional[str]):
+        own = f"{start_time.strftime('%Y%m%dT%H%M%S%fZ')}{run_id}"
+        with self._traces_lock:
+            parent = self._traces.get(parent_run_id) if parent_run_id else None
+            trace_id, dotted_order = (parent[0], f"{parent[1]}.{own}") if parent else (run_id, own)
+            self._traces[run_id] = (trace_id, dotted_order)
+            while len(self._traces) > config.TELEMETRY_TRACE_CACHE_SIZE:
+                self._traces.popitem(last=False)
+        return trace_id, dotted_order, parent is not None
 
     def log_run(self,
                 run_type: str,
@@ -23,79 +42,81 @@ class LangSmithMonitor:
                ) -> str:
         """
         Log a run to LangSmith, optionally nesting under a parent_run_id.
+        Runs and metric feedback are queued for the background exporter;
+        this never waits on the network.
         """
-        try:
-            run_id = str(uuid.uuid4())
-            start_time = datetime.now()
-
-            run_data = {
-                "id": run_id,
-                "name": f"{run_type}_{int(time.time())}",
-                "run_type": "chain",
-                "inputs": inputs,
-                "project_name": self.project_name,
-                "start_time": start_time
-            }
-
-            if parent_run_id:
-                run_data["parent_run_id"] = parent_run_id
-
-            if error:
-                run_data.update({
-                    "outputs": {"error": str(error)},
-                    "error": str(error),
-                    "end_time": datetime.now(),
-                })
-            else:
-                run_data.update({
-                    "outputs": outputs or {},
-                    "end_time": datetime.now(),
+        run_id = str(uuid.uuid4())
+        start_time = datetime.now(timezone.utc)
+        trace_id, dotted_order, nested = self._trace_position(run_id, start_time, parent_run_id)
+
+        run_data = {
+            "id": run_id,
+            "trace_id": trace_id,
+            "dotted_order": dotted_order,
+            "name": f"{run_type}_{int(time.time())}",
+            "run_type": "chain",
+            "inputs": inputs,
+            "session_name": self.project_name,
+            "start_time": start_time,
+            "end_time": datetime.now(timezone.utc),
+        }
+
+        if nested:
+            run_data["parent_run_id"] = parent_run_id
+        elif parent_run_id:
+            # Parent is not in this process's recent runs; keep the link as metadata.
+            run_data["extra"] = {"metadata": {"parent_run_id": parent_run_id}}
+
+        if error:
+            run_data.update({
+                "outputs": {"error": str(error)},
+                "error": str(error),
+            })
+        else:
+            run_data["outputs"] = outputs or {}
+
+        self.exporter.submit_run(run_data)
+
+        if metrics:
+            for metric_name, metric_value in metrics.items():
+                try:
+                    score = float(metric_value)
+                except (TypeError, ValueError) as e:
+                    print(f"Warning: Could not log metric {metric_name}: {e}")
+                    continue
+                self.exporter.submit_feedback({
+                    "run_id": run_id,
+                    "key": f"metric_{metric_name}",
+                    "score": score,
+                    "comment": f"Automated metric: {metric_name}"
                 })
 
-            self.client.create_run(**run_data)
-
-            if metrics:
-                for metric_name, metric_value in metrics.items():
-                    try:
-                        self.client.create_feedback(
-                            run_id=run_id,
-                            key=f"metric_{metric_name}",
-                            score=float(metric_value),
-                            comment=f"Automated metric: {metric_name}"
-                        )
-                    except Exception as feedback_error:
-                        print(f"Warning: Could not log metric {metric_name}: {feedback_error}")
-
-            return run_id
-
-        except Exception as logging_error:
-            print(f"Warning: LangSmith logging failed: {logging_error}")
-            return str(uuid.uuid4())
+        return run_id
 
     def log_simple_event(self, event_name: str, data: Dict[str, Any]):
         """
         Simple event logging without run tracking.
         """
-        try:
-            event_data = {
-                "event_name": event_name,
-                "timestamp": datetime.now().isoformat(),
-                "data": data,
-                "project_name": self.project_name
-            }
-            run_id = str(uuid.uuid4())
-            self.client.create_run(
-                id=run_id,
-                name=f"event_{event_name}_{int(time.time())}",
-                run_type="chain",
-                inputs=event_data,
-                outputs={"status": "logged"},
-                project_name=self.project_name,
-                start_time=datetime.now(),
-                end_time=datetime.now()
-            )
-        except Exception as e:
-            print(f"Warning: Event logging failed: {e}")
+        event_data = {
+            "event_name": event_name,
+            "timestamp": datetime.now().isoformat(),
+            "data": data,
+            "project_name": self.project_name
+        }
+        run_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
+        self.exporter.submit_run({
+            "id": run_id,
+            "trace_id": run_id,
+            "dotted_order": f"{now.strftime('%Y%m%dT%H%M%S%fZ')}{run_id}",
+            "name": f"event_{event_name}_{int(time.time())}",
+            "run_type": "chain",
+            "inputs": event_data,
+            "outputs": {"status": "logged"},
+            "session_name": self.project_name,
+            "start_time": now,
+            "end_time": now
+        })
 
     def calculate_confidence(self,
                             recommendation: str,
@@ -106,36 +127,13 @@ class LangSmithMonitor:
         """
         Calculate confidence score for a recommendation.
         """
-        uncertainty_phrases = [
-            "uncertain", "unclear", "might", "may", "could be",
-            "possibly", "perhaps", "not enough data", "limited information"
-        ]
-
-        certainty_factor = 1.0
-        for phrase in uncertainty_phrases:
-            if phrase in recommendation.lower():
-                certainty_factor *= 0.9
-
-        confidence = (
-            0.4 * data_quality +
-            0.3 * data_recency +
-            0.3 * data_relevance
-        ) * certainty_factor
-
-        return min(max(confidence, 0.0), 1.0)
+        return scoring.confidence(recommendation, data_quality, data_recency, data_relevance)
 
     def get_confidence_label(self, confidence: float) -> str:
         """
         Convert numerical confidence to a human‐readable label.
         """
-        if confidence >= config.HIGH_CONFIDENCE:
-            return "High Confidence"
-        elif confidence >= config.MEDIUM_CONFIDENCE:
-            return "Medium Confidence"
-        elif confidence >= config.LOW_CONFIDENCE:
-            return "Low Confidence"
-        else:
-            return "Very Low Confidence"
+        return scoring.confidence_label(confidence)
 
 class SimpleLangSmithMonitor(LangSmithMonitor):
     """
@@ -179,3 +177,12 @@ class SimpleLangSmithMonitor(LangSmithMonitor):
             metrics=metrics,
             parent_run_id=parent_run_id
         )
+
+    def log_simple_event(self, event_name: str, data: Dict[str, Any]):
+        """
+        Override: if disabled, just print.
+        """
+        if not self.enabled:
+            print(f"[MONITOR EVENT] {event_name}: {data}")
+            return
+        super().log_simple_event(event_name, data)
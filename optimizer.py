@@ -0,0 +1,322 @@
+"""
+Fantasy XI optimizer: picks the best 11 players plus captain and vice-captain
+from a candidate pool under role, credit and players-per-team limits.
+
+Exact branch and bound. Players are searched in descending score order, so
+the first two picks of a lineup are its captain and vice-captain. Each node
+is bounded by the role minimums still to fill plus the best remaining scores,
+with the credit limit relaxed by Lagrange multipliers (all from precomputed
+NumPy tables), and the last pick is scored for all remaining candidates at
+once, which is where the top-N alternates come from.
+"""
+import csv
+import json
+import heapq
+import numpy as np
+import config
+
+ROLES = ("WK", "BAT", "AR", "BOWL")
+ROLE_ALIASES = {
+    "WK": "WK", "KEEPER": "WK", "WICKETKEEPER": "WK", "WICKET-KEEPER": "WK",
+    "BAT": "BAT", "BATTER": "BAT", "BATSMAN": "BAT",
+    "AR": "AR", "ALLROUNDER": "AR", "ALL-ROUNDER": "AR",
+    "BOWL": "BOWL", "BOWLER": "BOWL",
+}
+
+def normalize_role(role: str) -> str:
+    key = str(role or "").strip().upper().replace(" ", "")
+    if key not in ROLE_ALIASES:
+        raise ValueError(f"Unknown role {role!r}. Expected one of {', '.join(ROLES)}.")
+    return ROLE_ALIASES[key]
+
+def load_players(path: str):
+    """
+    Candidates from a CSV (header row) or JSON list with name, team, role,
+    credits and, optionally, projection.
+    """
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            rows = json.load(f)
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    players = []
+    for i, row in enumerate(rows, 1):
+        missing = [field for field in ("name", "team", "role", "credits") if not row.get(field)]
+        if missing:
+            raise ValueError(f"Player {i} in {path} is missing {', '.join(missing)}")
+        player = {
+            "name": str(row["name"]).strip(),
+            "team": str(row["team"]).strip(),
+            "role": normalize_role(row["role"]),
+            "credits": float(row["credits"]),
+        }
+        if row.get("projection") not in (None, ""):
+            player["projection"] = float(row["projection"])
+        players.append(player)
+    return players
+
+def recommendation_score(rec: dict) -> float:
+    """
+    Score for a player from a get_player_recommendation result: confidence
+    weighted by data quality, on a 0-100 scale. A rough proxy for expected
+    points; prefer real projections when they are available.
+    """
+    return 100.0 * rec["confidence_score"] * (0.5 + 0.5 * rec["data_quality"])
+
+def score_with_advisor(players: list, advisor):
+    """
+    Fill in "projection" for players that lack one, from the advisor's
+    recommendations (fetched concurrently). Players whose recommendation
+    failed score 0.
+    """
+    pending = {}
+    for p in players:
+        if "projection" not in p:
+            pending.setdefault(p["name"], []).append(p)
+    if not pending:
+        return players
+    for rec in advisor.get_player_recommendations(list(pending)):
+        if rec.get("error"):
+            print(f"Warning: no recommendation for {rec['player']}: {rec['error']}")
+            score = 0.0
+        else:
+            score = recommendation_score(rec)
+        for player in pending[rec["player"]]:
+            player["projection"] = score
+    return players
+
+class LineupOptimizer:
+    """
+    Best lineups for a candidate pool. Limits default to the
+    OPTIMIZER_* settings in config.py.
+    """
+    def __init__(self, team_size: int = None, credit_limit: float = None, max_per_team: int = None,
+                 role_limits: dict = None, captain_multiplier: float = None, vice_captain_multiplier: float = None):
+        self.team_size = team_size or config.OPTIMIZER_TEAM_SIZE
+        self.credit_limit = credit_limit if credit_limit is not None else config.OPTIMIZER_CREDIT_LIMIT
+        self.max_per_team = max_per_team or config.OPTIMIZER_MAX_PER_TEAM
+        self.role_limits = role_limits or config.OPTIMIZER_ROLE_LIMITS
+        self.captain_multiplier = captain_multiplier or config.OPTIMIZER_CAPTAIN_MULTIPLIER
+        self.vice_captain_multiplier = vice_captain_multiplier or config.OPTIMIZER_VICE_CAPTAIN_MULTIPLIER
+        self.nodes = 0
+
+    def _prune_dominated(self, players: list, top_n: int):
+        """
+        Drop players that no top_n lineup needs. players is in search order.
+        A player goes when at least top_n players kept before it have the same
+        role, score at least as much and cost no more, counting only those
+        that could replace it in any lineup: not already alongside it in the
+        role, and not from a team that is already full.
+        """
+        full_teams = (self.team_size - 1) // self.max_per_team
+        kept = []
+        by_role = {role: ([], []) for role in ROLES}
+        for player in players:
+            role = normalize_role(player["role"])
+            credits, teams = by_role[role]
+            if credits:
+                cheaper = np.array(credits) <= player["credits"] + 1e-9
+                others = [team for team, ok in zip(teams, cheaper) if ok and team != player["team"]]
+                blocked = sorted(np.unique(others, return_counts=True)[1], reverse=True)[:full_teams] if others else []
+                swaps = int(cheaper.sum()) - (self.role_limits[role][1] - 1) - int(sum(blocked))
+                if swaps >= top_n:
+                    continue
+            kept.append(player)
+            credits.append(player["credits"])
+            teams.append(player["team"])
+        return kept
+
+    def _prepare(self, players: list, top_n: int = 1):
+        order = sorted(range(len(players)), key=lambda i: (-players[i]["projection"], players[i]["credits"]))
+        self.players = self._prune_dominated([players[i] for i in order], top_n)
+        n = len(self.players)
+        self.scores = np.array([p["projection"] for p in self.players], dtype=np.float64)
+        self.credits = np.array([p["credits"] for p in self.players], dtype=np.float64)
+        self.roles = np.array([ROLES.index(normalize_role(p["role"])) for p in self.players], dtype=np.int64)
+        teams = sorted({p["team"] for p in self.players})
+        self.teams = np.array([teams.index(p["team"]) for p in self.players], dtype=np.int64)
+        self.num_teams = len(teams)
+        self.role_min = np.array([self.role_limits[r][0] for r in ROLES], dtype=np.int64)
+        self.role_max = np.array([self.role_limits[r][1] for r in ROLES], dtype=np.int64)
+
+        # Bounds relax the credit limit with Lagrange multipliers: for any
+        # lam >= 0, a lineup within budget B scores at most
+        # lam * B + the best sum of (score - lam * credits). Tables are kept
+        # for a few multipliers around the one that is tightest for the full
+        # pool; lam = 0 is the plain best-scores bound.
+        self.lambdas = self._choose_lambdas()
+        adjusted = self.scores[None, :] - self.lambdas[:, None] * self.credits[None, :]
+        k = self.team_size
+        num_lambdas = len(self.lambdas)
+        # best_sum[l, i, r]: best sum of r adjusted scores among players i..
+        self.best_sum = np.full((num_lambdas, n + 1, k + 1), -np.inf)
+        # role_best[l, i, role, r]: the same, restricted to one role
+        self.role_best = np.full((num_lambdas, n + 1, len(ROLES), k + 1), -np.inf)
+        # cheapest[i, r]: fewest credits that buy r players among players i..
+        self.cheapest = np.full((n + 1, k + 1), np.inf)
+        self.best_sum[:, :, 0] = 0.0
+        self.role_best[:, :, :, 0] = 0.0
+        self.cheapest[:, 0] = 0.0
+        for i in range(n):
+            top = min(k, n - i)
+            self.cheapest[i, 1:top + 1] = np.cumsum(np.sort(self.credits[i:])[:top])
+            suffix = adjusted[:, i:]
+            self.best_sum[:, i, 1:top + 1] = np.cumsum(-np.sort(-suffix, axis=1)[:, :top], axis=1)
+            for role in range(len(ROLES)):
+                role_suffix = suffix[:, self.roles[i:] == role]
+                count = min(k, role_suffix.shape[1])
+                if count:
+                    self.role_best[:, i, role, 1:count + 1] = np.cumsum(-np.sort(-role_suffix, axis=1)[:, :count], axis=1)
+        self._role_ids = np.arange(len(ROLES))
+        # knapsack[i, r, b]: best sum of r scores among players i.. costing at
+        # most b credit steps, with prices rounded down to a step. Exact on
+        # credits where the Lagrangian bound is loose, but blind to roles;
+        # each node takes the smaller of the two.
+        self.steps = int(np.floor(self.credit_limit / config.OPTIMIZER_CREDIT_STEP + 1e-9))
+        prices = np.floor(self.credits / config.OPTIMIZER_CREDIT_STEP + 1e-9).astype(np.int64)
+        self.knapsack = np.full((n + 1, k + 1, self.steps + 1), -np.inf)
+        self.knapsack[:, 0, :] = 0.0
+        for i in range(n - 1, -1, -1):
+            self.knapsack[i] = self.knapsack[i + 1]
+            price = prices[i]
+            if price <= self.steps:
+                self.knapsack[i, 1:, price:] = np.maximum(
+                    self.knapsack[i + 1, 1:, price:], self.knapsack[i + 1, :-1, :self.steps + 1 - price] + self.scores[i])
+
+    def _choose_lambdas(self):
+        k = min(self.team_size, len(self.scores))
+        if k == 0:
+            return np.zeros(1)
+        ratios = self.scores / np.maximum(self.credits, 1e-9)
+        grid = np.linspace(0.0, max(float(ratios.max()), 0.0), 64)
+        adjusted = self.scores[None, :] - grid[:, None] * self.credits[None, :]
+        root = grid * self.credit_limit + (-np.sort(-adjusted, axis=1)[:, :k]).sum(axis=1)
+        best = grid[int(np.argmin(root))]
+        return np.unique(np.linspace(0.0, 2.0, 17) * best)
+
+    def _multiplier(self, position: int) -> float:
+        if position == 0:
+            return self.captain_multiplier
+        if position == 1:
+            return self.vice_captain_multiplier
+        return 1.0
+
+    def _bound(self, i: int, count: int, spent: float, role_counts, value: float, threshold: float = -np.inf) -> float:
+        """
+        Upper bound on a lineup completed from players i.., or -inf if no
+        completion can meet the role minimums, size and credit limit. Once
+        the bound is at most threshold, tighter terms are not computed.
+        """
+        remaining = self.team_size - count
+        needs = np.maximum(self.role_min - role_counts, 0)
+        need = int(needs.sum())
+        if need > remaining or self.cheapest[i, remaining] > self.credit_limit - spent + 1e-9:
+            return -np.inf
+        # Captain and vice-captain bonuses for picks not made yet; the best
+        # remaining scores are an upper bound for them.
+        bonus = 0.0
+        if count == 0:
+            bonus += (self.captain_multiplier - 1) * self.scores[i]
+        if count <= 1 and i + (1 - count) < len(self.scores):
+            bonus += (self.vice_captain_multiplier - 1) * self.scores[i + (1 - count)]
+        budget = min(self.steps, int(np.floor((self.credit_limit - spent) / config.OPTIMIZER_CREDIT_STEP + 1e-9)))
+        bound = value + bonus + self.knapsack[i, remaining, budget]
+        if bound <= threshold:
+            return bound if np.isfinite(bound) else -np.inf
+        required = self.role_best[:, i, self._role_ids, needs].sum(axis=1)
+        relaxed = self.lambdas * (self.credit_limit - spent) + required + self.best_sum[:, i, remaining - need]
+        bound = min(bound, value + bonus + relaxed.min())
+        return bound if np.isfinite(bound) else -np.inf
+
+    def _threshold(self, heap: list, top_n: int) -> float:
+        return heap[0][0] if len(heap) >= top_n else -np.inf
+
+    def _push(self, heap: list, top_n: int, value: float, picks: tuple):
+        if len(heap) < top_n:
+            heapq.heappush(heap, (value, picks))
+        elif value > heap[0][0]:
+            heapq.heapreplace(heap, (value, picks))
+
+    def _last_pick(self, i: int, picks: list, spent: float, role_counts, team_counts, value: float, heap: list, top_n: int):
+        """
+        Score every candidate for the final slot at once.
+        """
+        candidates = np.arange(i, len(self.scores))
+        ok = self.credits[i:] <= self.credit_limit - spent + 1e-9
+        ok &= team_counts[self.teams[i:]] < self.max_per_team
+        ok &= role_counts[self.roles[i:]] < self.role_max[self.roles[i:]]
+        deficits = np.maximum(self.role_min - role_counts, 0)
+        if deficits.sum() > 1:
+            return
+        if deficits.sum() == 1:
+            ok &= self.roles[i:] == int(np.argmax(deficits))
+        candidates = candidates[ok]
+        if len(candidates) == 0:
+            return
+        values = value + self.scores[candidates] * self._multiplier(len(picks))
+        keep = values > self._threshold(heap, top_n)
+        candidates, values = candidates[keep], values[keep]
+        if len(candidates) > top_n:
+            best = np.argpartition(-values, top_n - 1)[:top_n]
+            candidates, values = candidates[best], values[best]
+        self.nodes += len(candidates)
+        for j, lineup_value in zip(candidates.tolist(), values.tolist()):
+            self._push(heap, top_n, lineup_value, tuple(picks) + (j,))
+
+    def _search(self, i: int, picks: list, spent: float, role_counts, team_counts, value: float, heap: list, top_n: int):
+        self.nodes += 1
+        if len(picks) == self.team_size - 1:
+            self._last_pick(i, picks, spent, role_counts, team_counts, value, heap, top_n)
+            return
+        multiplier = self._multiplier(len(picks))
+        for j in range(i, len(self.scores)):
+            # The bound only shrinks as j moves on, so once it cannot beat
+            # the current top-N, no later player can either.
+            threshold = self._threshold(heap, top_n)
+            if self._bound(j, len(picks), spent, role_counts, value, threshold) <= threshold:
+                return
+            role, team = self.roles[j], self.teams[j]
+            if role_counts[role] >= self.role_max[role] or team_counts[team] >= self.max_per_team:
+                continue
+            if spent + self.credits[j] > self.credit_limit + 1e-9:
+                continue
+            role_counts[role] += 1
+            team_counts[team] += 1
+            picks.append(j)
+            self._search(j + 1, picks, spent + self.credits[j], role_counts, team_counts,
+                         value + self.scores[j] * multiplier, heap, top_n)
+            picks.pop()
+            role_counts[role] -= 1
+            team_counts[team] -= 1
+
+    def optimize(self, players: list, top_n: int = 1):
+        """
+        The top_n best lineups, best first. players are dicts with name,
+        team, role, credits and projection. Returns [] when no lineup
+        satisfies the limits.
+        """
+        if any("projection" not in p for p in players):
+            raise ValueError("Every player needs a projection; see score_with_advisor")
+        self.nodes = 0
+        self._prepare(players, top_n)
+        heap = []
+        if len(self.players) >= self.team_size:
+            self._search(0, [], 0.0, np.zeros(len(ROLES), dtype=np.int64),
+                         np.zeros(self.num_teams, dtype=np.int64), 0.0, heap, top_n)
+        lineups = []
+        for value, picks in sorted(heap, reverse=True):
+            chosen = [self.players[j] for j in picks]
+            lineups.append({
+                "players": [p["name"] for p in chosen],
+                "captain": chosen[0]["name"],
+                "vice_captain": chosen[1]["name"] if len(chosen) > 1 else None,
+                "projected_points": value,
+                "credits": float(self.credits[list(picks)].sum()),
+                "roles": {role: sum(1 for p in chosen if normalize_role(p["role"]) == role) for role in ROLES},
+                "teams": {team: sum(1 for p in chosen if p["team"] == team) for team in sorted({p["team"] for p in chosen})},
+            })
+        return lineups
+
+def optimize_lineups(players: list, top_n: int = None, **limits):
+    return LineupOptimizer(**limits).optimize(players, top_n or config.OPTIMIZER_TOP_N)
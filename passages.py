@@ -0,0 +1,107 @@
+import os
+import numpy as np
+
+def split_passages(text: str, size: int, overlap: int):
+    """
+    Character spans (start, end) of overlapping passages of about size
+    characters. Passages end at a sentence or line break when there is one
+    in the second half of the window, else at a space; each passage starts
+    about overlap characters before the previous one ended, on a word.
+    """
+    n = len(text)
+    if not text.strip():
+        return []
+    if n <= size:
+        return [(0, n)]
+    spans = []
+    start = 0
+    while start < n:
+        end = min(start + size, n)
+        if end < n:
+            floor = start + size // 2
+            cut = max(text.rfind(". ", floor, end), text.rfind("\n", floor, end))
+            if cut != -1:
+                end = cut + 1
+            else:
+                space = text.rfind(" ", floor, end)
+                if space != -1:
+                    end = space
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= n:
+            break
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return spans
+
+def merge_spans(spans):
+    """
+    Sorted, non-overlapping union of (start, end) spans.
+    """
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(span) for span in merged]
+
+class PassageTable:
+    """
+    Passage -> parent mapping for the passage index: passage i is
+    text[start[i]:end[i]] of document parent[i]. Three NumPy arrays grown by
+    doubling, so appends are amortized O(1) and the table costs 16 bytes per
+    passage. indexed_docs is how many documents (by id) have been split.
+    """
+    def __init__(self):
+        self.size = 0
+        self.indexed_docs = 0
+        self._parent = np.empty(0, dtype=np.int64)
+        self._start = np.empty(0, dtype=np.int32)
+        self._end = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def parent(self):
+        return self._parent[:self.size]
+
+    @property
+    def start(self):
+        return self._start[:self.size]
+
+    @property
+    def end(self):
+        return self._end[:self.size]
+
+    def append(self, parents, starts, ends):
+        count = len(parents)
+        needed = self.size + count
+        if needed > len(self._parent):
+            capacity = max(needed, 2 * len(self._parent), 1024)
+            for name in ("_parent", "_start", "_end"):
+                old = getattr(self, name)
+                grown = np.empty(capacity, dtype=old.dtype)
+                grown[:self.size] = old[:self.size]
+                setattr(self, name, grown)
+        self._parent[self.size:needed] = parents
+        self._start[self.size:needed] = starts
+        self._end[self.size:needed] = ends
+        self.size = needed
+
+    def save(self, path: str):
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(f, parent=self.parent, start=self.start, end=self.end,
+                     indexed_docs=np.array([self.indexed_docs], dtype=np.int64))
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path: str):
+        table = cls()
+        with np.load(path) as data:
+            parents = data["parent"]
+            table.append(parents, data["start"], data["end"])
+            table.indexed_docs = int(data["indexed_docs"][0])
+        return table
@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from langsmith import traceable
+from dedupe import content_hash
+import metrics
+import config
+
+_END = object()
+
+class TokenBucket:
+    """
+    Blocking token bucket: up to capacity calls at once, then rate per second.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: threading.Event = None) -> bool:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+def refresh_topics():
+    """
+    Every topic the scheduler keeps fresh: each team, each tracked player,
+    and injuries. Keys are stable, since watermarks are stored under them.
+    """
+    topics = [
+        {"key": f"team:{team}", "kind": "team", "method": "get_team_news", "params": {"team_name": team}}
+        for team in config.REFRESH_TEAMS
+    ]
+    topics += [
+        {"key": f"player:{player}", "kind": "player", "method": "get_player_data", "params": {"player_name": player}}
+        for player in config.REFRESH_PLAYERS
+    ]
+    topics.append({"key": "injuries", "kind": "injuries", "method": "get_injury_updates", "params": {}})
+    return topics
+
+def _published_timestamp(item):
+    value = getattr(item, "published_date", None)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+class KnowledgeBaseRefresher:
+    """
+    Incremental knowledge-base refresh.
+
+    Each topic has a watermark (when it was last refreshed) in
+    REFRESH_STATE_PATH. A cycle fetches only the topics that are due, asking
+    Exa for results published since the watermark, and streams them through
+    fetch -> filter -> batch -> index stages joined by bounded queues, so a
+    cycle holds at most a few queues' worth of documents in memory. Exa calls
+    go through a token bucket and at most REFRESH_MAX_CONCURRENCY run at once.
+    A watermark only moves once everything fetched for the topic is indexed.
+    """
+    def __init__(self, vector_db=None, data_fetcher=None, topics: list = None, state_path: str = None):
+        if vector_db is None:
+            from database import VectorDatabase
+            vector_db = VectorDatabase()
+        if data_fetcher is None:
+            from data_fetcher import CricketDataFetcher
+            data_fetcher = CricketDataFetcher()
+        self.vector_db = vector_db
+        self.data_fetcher = data_fetcher
+        self.topics = topics if topics is not None else refresh_topics()
+        self.state_path = state_path or config.REFRESH_STATE_PATH
+        self.bucket = TokenBucket(config.REFRESH_RATE_PER_SECOND, config.REFRESH_BURST)
+        self.state = self._load_state()
+        self._stop = threading.Event()
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read refresh state {self.state_path}: {e}. Refreshing every topic.")
+            return {}
+
+    def _save_state(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.state_path}.tmp", "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    def _is_due(self, topic: dict, now: float) -> bool:
+        entry = self.state.get(topic["key"], {})
+        interval = config.REFRESH_INTERVALS.get(topic["kind"], min(config.REFRESH_INTERVALS.values()))
+        if now - entry.get("refreshed_at", 0) < interval:
+            return False
+        return not entry.get("error") or now - entry.get("attempted_at", 0) >= config.REFRESH_RETRY_SECONDS
+
+    def due_topics(self, now: float = None):
+        now = now if now is not None else time.time()
+        return [topic for topic in self.topics if self._is_due(topic, now)]
+
+    def next_due_in(self, now: float = None) -> float:
+        """
+        Seconds until the next topic is due (0 if one already is).
+        """
+        now = now if now is not None else time.time()
+        waits = []
+        for topic in self.topics:
+            entry = self.state.get(topic["key"], {})
+            interval = config.REFRESH_INTERVALS.get(topic["kind"], min(config.REFRESH_INTERVALS.values()))
+            due = entry.get("refreshed_at", 0) + interval
+            if entry.get("error"):
+                due = max(due, entry.get("attempted_at", 0) + config.REFRESH_RETRY_SECONDS)
+            waits.append(max(0.0, due - now))
+        return min(waits) if waits else float("inf")
+
+    def _fetch_topic(self, topic: dict, fetched: queue.Queue):
+        """
+        Fetch stage (one call per worker thread). Puts ("doc", topic, item)
+        for every result, then ("done", topic, started_at, error).
+        """
+        started = time.time()
+        entry = self.state.get(topic["key"], {})
+        since = entry.get("refreshed_at")
+        if since is not None:
+            since -= config.REFRESH_OVERLAP_SECONDS
+        error = None
+        if not self.bucket.acquire(self._stop):
+            error = "stopped"
+        else:
+            try:
+                for item in self.data_fetcher.fetch_since(topic["method"], since, **topic["params"]):
+                    fetched.put(("doc", topic, item))
+            except Exception as e:
+                print(f"Warning: refresh of {topic['key']} failed: {e}")
+                error = str(e)
+        fetched.put(("done", topic, started, error))
+
+    def _filter_stage(self, fetched: queue.Queue, filtered: queue.Queue, stats: dict):
+        """
+        Drop results that are empty, older than the topic's watermark, or
+        already stored or seen this cycle (exact text match). URL replacement
+        and near-duplicates are left to VectorDatabase.add_documents.
+        """
+        seen = set()
+        while True:
+            message = fetched.get()
+            if message is _END:
+                filtered.put(_END)
+                return
+            if message[0] != "doc":
+                filtered.put(message)
+                continue
+            _, topic, item = message
+            stats["fetched"] += 1
+            text = getattr(item, "text", None) or ""
+            if len(text) < config.REFRESH_MIN_CHARS:
+                stats["filtered"] += 1
+                continue
+            watermark = self.state.get(topic["key"], {}).get("refreshed_at")
+            published = _published_timestamp(item)
+            if watermark is not None and published is not None and \
+               published < watermark - config.REFRESH_OVERLAP_SECONDS:
+                stats["filtered"] += 1
+                continue
+            chash = content_hash(text)
+            if chash in seen or chash in self.vector_db.dedupe.by_hash:
+                stats["duplicates"] += 1
+                continue
+            seen.add(chash)
+            metadata = {"title": getattr(item, "title", None), "url": getattr(item, "url", None),
+                        "topic": topic["key"], "date": datetime.now().isoformat()}
+            if getattr(item, "published_date", None):
+                metadata["published_date"] = item.published_date
+            if topic["kind"] == "injuries":
+                metadata["type"] = "injury"
+            filtered.put(("doc", topic, text, metadata))
+
+    def _batch_stage(self, filtered: queue.Queue, batched: queue.Queue):
+        """
+        Group documents into add_documents batches. A topic's "done" marker
+        is held back until the batch holding its last documents has gone out.
+        Embedding is left to add_documents, which skips duplicates and URL
+        replacements first and, in passage mode, embeds only passages.
+        """
+        batch = []
+        markers = []
+
+        def flush():
+            if batch:
+                batched.put(("batch", list(batch)))
+                batch.clear()
+            for marker in markers:
+                batched.put(marker)
+            markers.clear()
+
+        while True:
+            try:
+                message = filtered.get(timeout=config.REFRESH_BATCH_WAIT_SECONDS)
+            except queue.Empty:
+                flush()
+                continue
+            if message is _END:
+                flush()
+                batched.put(_END)
+                return
+            if message[0] == "doc":
+                _, topic, text, metadata = message
+                batch.append((topic, text, metadata))
+                if len(batch) >= config.EMBEDDING_BATCH_SIZE:
+                    flush()
+            elif batch:
+                markers.append(message)
+            else:
+                batched.put(message)
+
+    def _index_stage(self, batched: queue.Queue, failed: set, stats: dict):
+        """
+        Embed and add batches to the vector store and advance watermarks as
+        topics complete.
+        """
+        while True:
+            message = batched.get()
+            if message is _END:
+                return
+            if message[0] == "batch":
+                batch = message[1]
+                try:
+                    result = self.vector_db.add_documents([text for _, text, _ in batch],
+                                                          [metadata for _, _, metadata in batch])
+                except Exception as e:
+                    print(f"Warning: indexing {len(batch)} refreshed documents failed: {e}")
+                    failed.update(topic["key"] for topic, _, _ in batch)
+                    continue
+                stats["added"] += result["added"]
+                stats["replaced"] += result["replaced"]
+                stats["skipped"] += result["skipped"]
+                continue
+            _, topic, started, error = message
+            if error == "stopped":
+                continue
+            entry = self.state.setdefault(topic["key"], {})
+            entry["attempted_at"] = started
+            if error is None and topic["key"] not in failed:
+                entry["refreshed_at"] = started
+                entry["error"] = None
+                stats["topics_refreshed"] += 1
+                metrics.inc("refresh_topics_total", kind=topic["kind"], status="ok")
+            else:
+                entry["error"] = error or "indexing failed"
+                stats["topics_failed"] += 1
+                metrics.inc("refresh_topics_total", kind=topic["kind"], status="error")
+            self._save_state()
+
+    @traceable(name="refresh_cycle", run_type="chain")
+    def run_once(self):
+        """
+        Refresh every due topic once. Returns counts for the cycle.
+        """
+        started = time.perf_counter()
+        due = self.due_topics()
+        stats = {
+            "topics_due": len(due), "topics_refreshed": 0, "topics_failed": 0,
+            "fetched": 0, "filtered": 0, "duplicates": 0,
+            "added": 0, "replaced": 0, "skipped": 0,
+        }
+        if due:
+            fetched = queue.Queue(maxsize=config.REFRESH_QUEUE_SIZE)
+            filtered = queue.Queue(maxsize=config.REFRESH_QUEUE_SIZE)
+            batched = queue.Queue(maxsize=max(2, config.REFRESH_QUEUE_SIZE // config.EMBEDDING_BATCH_SIZE))
+            failed = set()
+            stages = [
+                threading.Thread(target=self._filter_stage, args=(fetched, filtered, stats), daemon=True, name="refresh-filter"),
+                threading.Thread(target=self._batch_stage, args=(filtered, batched), daemon=True, name="refresh-batch"),
+            ]
+            for stage in stages:
+                stage.start()
+
+            def fetch_all():
+                with ThreadPoolExecutor(max_workers=config.REFRESH_MAX_CONCURRENCY, thread_name_prefix="refresh-fetch") as pool:
+                    for topic in due:
+                        pool.submit(self._fetch_topic, topic, fetched)
+                fetched.put(_END)
+
+            fetcher = threading.Thread(target=fetch_all, daemon=True, name="refresh-fetch")
+            fetcher.start()
+            self._index_stage(batched, failed, stats)
+            fetcher.join()
+            for stage in stages:
+                stage.join()
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+
+    def run_forever(self):
+        """
+        Run cycles until stop() or Ctrl-C, sleeping until the next topic is due.
+        """
+        print(f"Refresh daemon tracking {len(self.topics)} topics")
+        try:
+            while not self._stop.is_set():
+                stats = self.run_once()
+                if stats["topics_due"]:
+                    print(f"Refreshed {stats['topics_refreshed']}/{stats['topics_due']} topics: "
+                          f"{stats['added']} added, {stats['replaced']} replaced, "
+                          f"{stats['duplicates'] + stats['skipped']} duplicates in {stats['seconds']:.1f}s")
+                self._stop.wait(max(config.REFRESH_MIN_SLEEP_SECONDS, self.next_due_in()))
+        except KeyboardInterrupt:
+            print("Refresh daemon stopping")
+        self.vector_db.checkpoint()
+
+    def stop(self):
+        self._stop.set()
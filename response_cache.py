@@ -0,0 +1,135 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import faiss
+import numpy as np
+
+def source_fingerprint(items) -> str:
+    """
+    Order-independent fingerprint of the sources behind a prompt (URL + text).
+    """
+    digests = sorted(
+        hashlib.sha256(f"{getattr(item, 'url', '')}\0{getattr(item, 'text', '')}".encode("utf-8")).hexdigest()
+        for item in items
+    )
+    return hashlib.sha256("\n".join(digests).encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM responses.
+
+    Exact tier: hash of (method, prompt). Semantic tier: a small FAISS index
+    of query embeddings; a cached answer is reused for a query within
+    distance_threshold of a cached one, but only when it was generated from
+    the same source fingerprint. Entries expire after ttl seconds, and a new
+    answer for the same (method, query) replaces the old one.
+    """
+    def __init__(self, embed_fn, dimension: int, ttl: float, distance_threshold: float, max_entries: int):
+        self.embed_fn = embed_fn
+        self.ttl = ttl
+        self.distance_threshold = distance_threshold
+        self.max_entries = max_entries
+        self.index = faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+        self.entries = OrderedDict()
+        self.by_prompt = {}
+        self.by_query = {}
+        self.by_source = {}
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prompt_key(method: str, prompt: str) -> str:
+        return hashlib.sha256(f"{method}\0{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _query_key(method: str, query: str):
+        return method, " ".join(query.lower().split())
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+        if self.by_prompt.get(entry["prompt_key"]) == entry_id:
+            del self.by_prompt[entry["prompt_key"]]
+        if self.by_query.get(entry["query_key"]) == entry_id:
+            del self.by_query[entry["query_key"]]
+        source_key = (entry["method"], entry["fingerprint"])
+        self.by_source[source_key] -= 1
+        if not self.by_source[source_key]:
+            del self.by_source[source_key]
+
+    def _valid(self, entry, fingerprint: str) -> bool:
+        return entry["fingerprint"] == fingerprint and time.time() - entry["created"] <= self.ttl
+
+    def _lookup(self, method: str, query: str, prompt_key: str, fingerprint: str):
+        with self._lock:
+            entry_id = self.by_prompt.get(prompt_key)
+            if entry_id is not None:
+                entry = self.entries[entry_id]
+                if self._valid(entry, fingerprint):
+                    self.hits["exact"] += 1
+                    return entry["response"], "exact", None
+                self._remove(entry_id)
+            has_candidates = (method, fingerprint) in self.by_source
+        embedding = np.asarray(self.embed_fn(f"{method}: {query}"), dtype=np.float32).reshape(1, -1)
+        if has_candidates:
+            with self._lock:
+                k = min(8, self.index.ntotal)
+                if k:
+                    distances, ids = self.index.search(embedding, k)
+                    for dist, entry_id in zip(distances[0], ids[0]):
+                        entry = self.entries.get(int(entry_id))
+                        if entry is None or dist > self.distance_threshold:
+                            continue
+                        if entry["method"] == method and self._valid(entry, fingerprint):
+                            self.hits["semantic"] += 1
+                            return entry["response"], "semantic", embedding
+        with self._lock:
+            self.misses += 1
+        return None, None, embedding
+
+    def _store(self, method: str, query: str, prompt_key: str, fingerprint: str, response: str, embedding):
+        query_key = self._query_key(method, query)
+        with self._lock:
+            for stale in {self.by_prompt.get(prompt_key), self.by_query.get(query_key)}:
+                if stale is not None:
+                    self._remove(stale)
+            while len(self.entries) >= self.max_entries:
+                self._remove(next(iter(self.entries)))
+            entry_id = self._next_id
+            self._next_id += 1
+            self.entries[entry_id] = {
+                "method": method,
+                "prompt_key": prompt_key,
+                "query_key": query_key,
+                "fingerprint": fingerprint,
+                "response": response,
+                "created": time.time(),
+            }
+            self.index.add_with_ids(embedding, np.array([entry_id], dtype=np.int64))
+            self.by_prompt[prompt_key] = entry_id
+            self.by_query[query_key] = entry_id
+            source_key = (method, fingerprint)
+            self.by_source[source_key] = self.by_source.get(source_key, 0) + 1
+
+    def get_or_generate(self, method: str, query: str, prompt: str, fingerprint: str, generate):
+        """
+        Return (response, hit) where hit is "exact", "semantic" or None when
+        generate() had to be called.
+        """
+        prompt_key = self._prompt_key(method, prompt)
+        response, hit, embedding = self._lookup(method, query, prompt_key, fingerprint)
+        if hit is not None:
+            return response, hit
+        response = generate()
+        self._store(method, query, prompt_key, fingerprint, response, embedding)
+        return response, None
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self.entries), "exact_hits": self.hits["exact"],
+                    "semantic_hits": self.hits["semantic"], "misses": self.misses}
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+RESULT_FIELDS = ("id", "title", "url", "text", "published_date", "author", "score")
+
+class CachedResult:
+    """
+    Search result restored from the cache. Exposes the same attributes that
+    callers read from Exa results (title, url, text, ...).
+    """
+    def __init__(self, **fields):
+        for name in RESULT_FIELDS:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_result(cls, item):
+        return cls(**{name: getattr(item, name, None) for name in RESULT_FIELDS})
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in RESULT_FIELDS}
+
+    def __repr__(self):
+        return f"CachedResult(title={self.title!r}, url={self.url!r})"
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+class ResultCache:
+    """
+    SQLite-backed cache of search results keyed by
+    (method, normalized query, num_results, max_chars).
+    Entries are evicted least-recently-used beyond max_entries.
+    """
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " method TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(method: str, query: str, num_results: int, max_chars: int) -> str:
+        raw = json.dumps([method, normalize_query(query), num_results, max_chars])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Return (results, age_seconds) for a cached entry, or None.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        payload, created = row
+        return [CachedResult(**fields) for fields in json.loads(payload)], now - created
+
+    def put(self, key: str, method: str, results: list):
+        now = time.time()
+        payload = json.dumps([CachedResult.from_result(r).to_dict() for r in results], default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, method, payload, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, method, payload, now, now)
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN"
+                    " (SELECT key FROM results ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def clear(self, method: str = None):
+        with self._lock:
+            if method:
+                self._conn.execute("DELETE FROM results WHERE method = ?", (method,))
+            else:
+                self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        return {"entries": count, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,84 @@
+import re
+from datetime import datetime
+import config
+
+STAT_UNITS = ("runs", "wickets", "average", "strike rate", "economy", "points")
+UNCERTAINTY_PHRASES = (
+    "uncertain", "unclear", "might", "may", "could be",
+    "possibly", "perhaps", "not enough data", "limited information"
+)
+
+# One case-insensitive pass finds stats, years and uncertainty phrases.
+# Phrases match as substrings, like the original `phrase in text.lower()`.
+_SCAN_RE = re.compile(
+    r"(?P<stat>\b(?P<number>\d+(?:\.\d+)?)\s*(?:" + "|".join(STAT_UNITS) + r")\b)"
+    r"|(?P<year>\b20\d{2}\b)"
+    r"|(?P<phrase>" + "|".join(re.escape(p) for p in UNCERTAINTY_PHRASES) + r")",
+    re.IGNORECASE
+)
+_YEAR_RE = re.compile(r"20\d{2}")
+
+def scan(text: str) -> dict:
+    """
+    Signals of one text: {"chars", "stats", "years": {year: count}, "phrases"}.
+    """
+    stats = 0
+    years = {}
+    phrases = set()
+    for match in _SCAN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == "stat":
+            stats += 1
+            # A stat like "2024 runs" also counts as a year mention.
+            for part in match.group("number").split("."):
+                if _YEAR_RE.fullmatch(part):
+                    years[int(part)] = years.get(int(part), 0) + 1
+        elif kind == "year":
+            year = int(match.group())
+            years[year] = years.get(year, 0) + 1
+        else:
+            phrases.add(match.group().lower())
+    return {"chars": len(text), "stats": stats, "years": years, "phrases": phrases}
+
+def merge(signals_list) -> dict:
+    """
+    Signals of the concatenation of several texts, from their own signals.
+    """
+    merged = {"chars": 0, "stats": 0, "years": {}, "phrases": set()}
+    for signals in signals_list:
+        merged["chars"] += signals["chars"]
+        merged["stats"] += signals["stats"]
+        for year, n in signals["years"].items():
+            merged["years"][int(year)] = merged["years"].get(int(year), 0) + n
+        merged["phrases"].update(signals.get("phrases", ()))
+    return merged
+
+def quality(signals: dict, current_year: int = None):
+    """
+    (data_quality, data_recency, data_relevance) of one text's signals.
+    """
+    current_year = current_year or datetime.now().year
+    years = sum(signals["years"].values())
+    recent = sum(n for y, n in signals["years"].items() if int(y) >= current_year - 1)
+    length_score = min(signals["chars"] / 10000, 1.0)
+    stats_score = min(signals["stats"] / 20, 1.0)
+    recency = recent / years if years else 0.5
+    return 0.6 * length_score + 0.4 * stats_score, recency, stats_score
+
+def confidence(response, data_quality: float, data_recency: float, data_relevance: float) -> float:
+    """
+    Confidence in a response: the data scores, discounted by 10% for each
+    distinct uncertainty phrase in it. response is the text or its signals.
+    """
+    phrases = scan(response)["phrases"] if isinstance(response, str) else response["phrases"]
+    score = (0.4 * data_quality + 0.3 * data_recency + 0.3 * data_relevance) * 0.9 ** len(phrases)
+    return min(max(score, 0.0), 1.0)
+
+def confidence_label(score: float) -> str:
+    if score >= config.HIGH_CONFIDENCE:
+        return "High Confidence"
+    elif score >= config.MEDIUM_CONFIDENCE:
+        return "Medium Confidence"
+    elif score >= config.LOW_CONFIDENCE:
+        return "Low Confidence"
+    return "Very Low Confidence"
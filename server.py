@@ -0,0 +1,165 @@
+import json
+import inspect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import config
+import metrics
+
+ADVISOR_METHODS = (
+    "get_player_recommendation",
+    "get_team_advice",
+    "get_captain_recommendation",
+    "get_match_analysis",
+    "update_knowledge_base",
+)
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs fn,
+    later callers for the same key wait for it and share its result or error.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Return (result, shared) where shared is True for a coalesced caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        if call.error is not None:
+            raise call.error
+        return call.result, False
+
+class AdvisorRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API over FantasyAdvisor:
+      GET  /health
+      GET  /metrics               Prometheus text, or JSON with ?format=json
+      POST /<advisor method>  body: keyword arguments as a JSON object,
+                              plus "stream": true for NDJSON token events.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            if parse_qs(url.query).get("format") == ["json"]:
+                self._send_json(200, metrics.registry.snapshot())
+                return
+            body = metrics.registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if url.path != "/health":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        self._send_json(200, {"status": "ok", "documents": self.server.advisor.vector_db.live_count})
+
+    def do_POST(self):
+        method = urlsplit(self.path).path.strip("/")
+        if method not in ADVISOR_METHODS:
+            self._send_json(404, {"error": f"Unknown method {method}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("request body must be a JSON object")
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid request body: {e}"})
+            return
+        stream = params.pop("stream", False) and method != "update_knowledge_base"
+        fn = getattr(self.server.advisor, method)
+        try:
+            inspect.signature(fn).bind(**params)
+        except TypeError as e:
+            self._send_json(400, {"error": f"Invalid arguments for {method}: {e}"})
+            return
+        if stream:
+            self._stream(method, params)
+            return
+        key = (method, json.dumps(params, sort_keys=True))
+        try:
+            result, shared = self.server.flights.do(key, lambda: fn(**params))
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, result, {"X-Coalesced": "1" if shared else "0"})
+
+    def _stream(self, method: str, params: dict):
+        # Streamed responses are not coalesced; each client gets its own tokens.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for kind, value in self.server.advisor.stream(method, **params):
+                self.wfile.write((json.dumps({kind: value}) + "\n").encode("utf-8"))
+                self.wfile.flush()
+        except Exception as e:
+            self.wfile.write((json.dumps({"error": str(e)}) + "\n").encode("utf-8"))
+
+class AdvisorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, advisor):
+        super().__init__(address, AdvisorRequestHandler)
+        self.advisor = advisor
+        self.flights = SingleFlight()
+
+def serve(host: str = None, port: int = None, advisor=None):
+    """
+    Serve the advisor until interrupted, keeping its clients, caches and
+    index warm between requests.
+    """
+    if advisor is None:
+        from advisor import FantasyAdvisor
+        advisor = FantasyAdvisor()
+    server = AdvisorServer((host or config.SERVER_HOST, port or config.SERVER_PORT), advisor)
+    print(f"Serving Fantasy IPL Cricket Advisor on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down server...")
+    finally:
+        server.server_close()
+        advisor.vector_db.close()
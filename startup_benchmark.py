@@ -0,0 +1,98 @@
+"""
+Cold-start benchmark for the CLI, based on `python -X importtime`.
+
+Each scenario runs in a fresh interpreter several times. The benchmark
+reports the median wall time, the import time and the modules with the
+slowest imports (by their own time), and exits with status 1 when a
+scenario's median wall time is over its budget in config.STARTUP_BUDGETS_MS.
+
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 10 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# "player" imports everything `main.py --player` loads before its first
+# network call, without making that call.
+SCENARIOS = {
+    "help": ["main.py", "--help"],
+    "player": ["-c", "import main, advisor"],
+}
+
+def parse_importtime(stderr: str):
+    """
+    (total import microseconds, {module: self microseconds}) from
+    -X importtime output. The total sums top-level cumulative times only,
+    since nested imports are already part of their parent's.
+    """
+    total = 0
+    self_times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        self_times[name.strip()] = self_times.get(name.strip(), 0) + int(own)
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total, self_times
+
+def run_scenario(args: list, runs: int):
+    walls = []
+    imports = []
+    self_times = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", *args],
+            cwd=HERE, capture_output=True, text=True
+        )
+        walls.append((time.perf_counter() - started) * 1000)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} exited with {proc.returncode}: {proc.stderr[-2000:]}")
+        total, self_times = parse_importtime(proc.stderr)
+        imports.append(total / 1000)
+    slowest = sorted(self_times.items(), key=lambda kv: kv[1], reverse=True)[:10]
+    return {
+        "wall_ms": statistics.median(walls),
+        "import_ms": statistics.median(imports),
+        "slowest_imports_ms": {name: us / 1000 for name, us in slowest},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario (median is reported)")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    failed = []
+    for name in args.scenarios:
+        result = run_scenario(SCENARIOS[name], args.runs)
+        result["budget_ms"] = config.STARTUP_BUDGETS_MS.get(name)
+        result["ok"] = result["budget_ms"] is None or result["wall_ms"] <= result["budget_ms"]
+        results[name] = result
+        if not result["ok"]:
+            failed.append(name)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            status = "ok" if result["ok"] else "OVER BUDGET"
+            print(f"{name}: {result['wall_ms']:.0f} ms wall, {result['import_ms']:.0f} ms imports"
+                  f" (budget {result['budget_ms']} ms) {status}")
+            for module, ms in result["slowest_imports_ms"].items():
+                print(f"    {ms:8.1f} ms  {module}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
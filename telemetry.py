@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+import config
+
+_CLOSE = object()
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+class TelemetryExporter:
+    """
+    Ships LangSmith runs and feedback from a background thread.
+
+    Callers only enqueue: submit_run/submit_feedback never block and drop
+    the item (counted in stats()) when the bounded queue is full. The worker
+    sends runs in bulk with batch_ingest_runs, then the batch's feedback.
+    Batches that fail are appended to spill_path (if set) and re-sent once
+    the backend accepts data again. Pending items are flushed at exit.
+    """
+    def __init__(self, client, max_queue: int = None, batch_size: int = None,
+                 flush_interval: float = None, spill_path: str = None):
+        self.client = client
+        self.batch_size = batch_size or config.TELEMETRY_BATCH_SIZE
+        self.flush_interval = flush_interval or config.TELEMETRY_FLUSH_INTERVAL_SECONDS
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue or config.TELEMETRY_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.counters = {
+            "runs_submitted": 0,
+            "feedback_submitted": 0,
+            "runs_exported": 0,
+            "feedback_exported": 0,
+            "runs_dropped": 0,
+            "feedback_dropped": 0,
+            "items_spilled": 0,
+            "items_replayed": 0,
+            "failed_exports": 0,
+        }
+        self._thread = threading.Thread(target=self._worker, daemon=True, name="telemetry-exporter")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def _submit(self, kind: str, item: dict) -> bool:
+        if self._closed:
+            self._count(f"{kind}_dropped")
+            return False
+        try:
+            self._queue.put_nowait((kind, item))
+        except queue.Full:
+            self._count(f"{kind}_dropped")
+            return False
+        self._count(f"{kind}_submitted")
+        return True
+
+    def submit_run(self, run: dict) -> bool:
+        """
+        Queue a run for batch_ingest_runs; it must carry id, trace_id and
+        dotted_order. Returns False if it was dropped.
+        """
+        return self._submit("runs", run)
+
+    def submit_feedback(self, feedback: dict) -> bool:
+        """
+        Queue keyword arguments for client.create_feedback.
+        """
+        return self._submit("feedback", feedback)
+
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return [], False
+        batch, closing = [], first is _CLOSE
+        if not closing:
+            batch.append(first)
+        # On close, drain everything that is left; otherwise one batch.
+        while closing or len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _CLOSE:
+                closing = True
+            else:
+                batch.append(item)
+        return batch, closing
+
+    def _worker(self):
+        while True:
+            batch, closing = self._next_batch()
+            if batch:
+                self._export(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if closing:
+                self._queue.task_done()
+                return
+
+    def _send(self, batch: list):
+        """
+        Send one batch: runs in bulk, then feedback. Returns the items that
+        were not accepted (empty when everything went through).
+        """
+        runs = [item for kind, item in batch if kind == "runs"]
+        feedback = [item for kind, item in batch if kind == "feedback"]
+        for start in range(0, len(runs), self.batch_size):
+            chunk = runs[start:start + self.batch_size]
+            try:
+                self.client.batch_ingest_runs(create=chunk)
+            except Exception as e:
+                print(f"Warning: telemetry export of {len(chunk)} runs failed: {e}")
+                self._count("failed_exports")
+                return [("runs", run) for run in runs[start:]] + [("feedback", fb) for fb in feedback]
+            self._count("runs_exported", len(chunk))
+        for i, fb in enumerate(feedback):
+            try:
+                self.client.create_feedback(**fb)
+            except Exception as e:
+                print(f"Warning: telemetry export of feedback failed: {e}")
+                self._count("failed_exports")
+                return [("feedback", item) for item in feedback[i:]]
+            self._count("feedback_exported")
+        return []
+
+    def _export(self, batch: list):
+        failed = self._send(batch)
+        if failed:
+            self._spill(failed)
+        else:
+            self._replay_spill()
+
+    def _spill(self, items: list):
+        if not self.spill_path:
+            for kind, _ in items:
+                self._count(f"{kind}_dropped")
+            return
+        try:
+            size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for kind, item in items:
+                    line = json.dumps({"kind": kind, "item": item}, default=_json_default) + "\n"
+                    if size + len(line) > config.TELEMETRY_SPILL_MAX_BYTES:
+                        self._count(f"{kind}_dropped")
+                        continue
+                    f.write(line)
+                    size += len(line)
+                    self._count("items_spilled")
+        except OSError as e:
+            print(f"Warning: could not spill telemetry to {self.spill_path}: {e}")
+            for kind, _ in items:
+                self._count(f"{kind}_dropped")
+
+    def _replay_spill(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        replay_path = f"{self.spill_path}.replay"
+        try:
+            os.replace(self.spill_path, replay_path)
+            with open(replay_path, encoding="utf-8") as f:
+                items = [(entry["kind"], entry["item"]) for entry in map(json.loads, f) if entry]
+            os.remove(replay_path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read spilled telemetry: {e}")
+            return
+        self._count("items_replayed", len(items))
+        for start in range(0, len(items), self.batch_size):
+            failed = self._send(items[start:start + self.batch_size])
+            if failed:
+                # Still unavailable: keep the rest for the next attempt.
+                self._spill(failed + items[start + self.batch_size:])
+                return
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until everything queued so far has been exported or spilled.
+        """
+        deadline = time.monotonic() + (timeout if timeout is not None else config.TELEMETRY_SHUTDOWN_TIMEOUT_SECONDS)
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline or not self._thread.is_alive():
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: float = None):
+        """
+        Stop accepting items, export what is queued and stop the worker.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        timeout = timeout if timeout is not None else config.TELEMETRY_SHUTDOWN_TIMEOUT_SECONDS
+        try:
+            self._queue.put(_CLOSE, timeout=timeout)
+        except queue.Full:
+            print("Warning: telemetry queue still full at shutdown; pending items were not exported")
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["queued"] = self._queue.qsize()
+        return stats
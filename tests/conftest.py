@@ -0,0 +1,64 @@
+import os
+import sys
+import hashlib
+import threading
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from clients import get_client_manager
+
+class FakeEmbeddings:
+    """
+    Stands in for openai.OpenAI().embeddings: deterministic unit vectors
+    seeded by the text, and a record of every create() call's inputs.
+    """
+    def __init__(self, dimension: int = 1536):
+        self.dimension = dimension
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def create(self, model: str, input):
+        texts = [input] if isinstance(input, str) else list(input)
+        with self._lock:
+            self.calls.append(texts)
+        data = []
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            data.append(SimpleNamespace(index=i, embedding=vector / np.linalg.norm(vector)))
+        return SimpleNamespace(data=data, usage=SimpleNamespace(total_tokens=sum(len(t.split()) for t in texts)))
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    Point every on-disk store at a temporary directory.
+    """
+    path = str(tmp_path / "store")
+    monkeypatch.setattr(config, "VECTOR_DB_PATH", path)
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_PATH", f"{path}/embedding_cache")
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_MAX_ENTRIES", 1000)
+    monkeypatch.setattr(config, "FETCH_CACHE_PATH", f"{path}/fetch_cache.sqlite3")
+    monkeypatch.setattr(config, "TELEMETRY_SPILL_PATH", f"{path}/telemetry_spill.jsonl")
+    monkeypatch.setattr(config, "REFRESH_STATE_PATH", f"{path}/refresh_state.json")
+    return path
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """
+    Put a FakeEmbeddings behind the shared ClientManager.
+    """
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(get_client_manager(), "_openai", SimpleNamespace(embeddings=embeddings))
+    return embeddings
+
+def make_texts(count: int, words: int = 60, seed: int = 0):
+    """
+    Distinct random-word documents, far apart by SimHash.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"w{i}" for i in range(5000)]
+    return [" ".join(rng.choice(vocabulary, words)) for _ in range(count)]
@@ -0,0 +1,58 @@
+from datetime import datetime
+import pytest
+import config
+from advisor import FantasyAdvisor
+
+class StubVectorDatabase:
+    def __init__(self, hits):
+        self.hits = hits
+        self.queries = []
+
+    def search_many(self, queries, k, filters=None):
+        self.queries.extend(queries)
+        return [{"hits": list(self.hits)} for _ in queries]
+
+def hit(title, text, distance=0.1, **metadata):
+    return {"distance": distance, "text": text,
+            "metadata": {"title": title, "url": f"https://example.com/{title}", "date": datetime.now().isoformat(), **metadata}}
+
+@pytest.fixture
+def advisor(monkeypatch):
+    monkeypatch.setattr(config, "RETRIEVAL_LOCAL_FIRST", True)
+    monkeypatch.setattr(config, "RETRIEVAL_MIN_HITS", 2)
+    # Only the retrieval planner is exercised, so skip building clients and stores.
+    return FantasyAdvisor.__new__(FantasyAdvisor)
+
+def test_close_hits_about_other_players_are_not_local(advisor):
+    advisor.vector_db = StubVectorDatabase([
+        hit("Gill stars in chase", "Shubman Gill scored 80 runs."),
+        hit("Bumrah fitness update", "Jasprit Bumrah bowled four overs."),
+        hit("Kohli in the nets", "Virat Kohli batted for an hour.", distance=0.2),
+    ])
+
+    assert advisor._local_results("get_player_data", [{"player_name": "Virat Kohli"}]) == [None]
+
+def test_hits_naming_the_player_or_fetched_for_its_topic_are_local(advisor):
+    advisor.vector_db = StubVectorDatabase([
+        hit("Kohli in the nets", "Virat Kohli batted for an hour."),
+        hit("RCB preview", "The captain looked in form.", topic="player:Virat Kohli"),
+        hit("Gill stars in chase", "Shubman Gill scored 80 runs."),
+        hit("VIRAT KOHLI returns", "Back after a break.", distance=config.RETRIEVAL_MAX_DISTANCE + 0.1),
+    ])
+
+    [results] = advisor._local_results("get_player_data", [{"player_name": "Virat Kohli"}])
+
+    assert [r.title for r in results] == ["Kohli in the nets", "RCB preview"]
+
+def test_match_hits_must_cover_both_teams(advisor):
+    advisor.vector_db = StubVectorDatabase([
+        hit("CSK v MI preview", "Chennai Super Kings host Mumbai Indians."),
+        hit("CSK news", "Chennai Super Kings named an unchanged side."),
+        hit("Rivalry", "Mumbai Indians lead the head to head.", topic="team:Chennai Super Kings"),
+    ])
+
+    [results] = advisor._local_results(
+        "get_match_predictions", [{"team1": "Chennai Super Kings", "team2": "Mumbai Indians"}]
+    )
+
+    assert [r.title for r in results] == ["CSK v MI preview", "Rivalry"]
@@ -0,0 +1,21 @@
+import metrics
+from clients import get_client_manager
+
+def counter(snapshot, name, **labels):
+    for entry in snapshot["counters"].get(name, []):
+        if entry["labels"] == labels:
+            return entry["value"]
+    return None
+
+def test_connection_stats_are_in_the_metrics_snapshot(monkeypatch):
+    manager = get_client_manager()
+    monkeypatch.setattr(manager, "counters", {"http_requests": 5, "new_connections": 2, "reused_connections": 3, "retries": 1})
+
+    snapshot = metrics.registry.snapshot()
+
+    assert counter(snapshot, "http_requests_total", client="openai") == 5
+    assert counter(snapshot, "http_connections_total", client="openai", reused="true") == 3
+    assert counter(snapshot, "http_connections_total", client="openai", reused="false") == 2
+    assert counter(snapshot, "http_retries_total", client="exa") == 1
+    assert counter(snapshot, "http_requests_total", client="exa") == 0
+    assert 'ipl_advisor_http_connections_total{client="openai",reused="true"} 3' in metrics.registry.to_prometheus()
@@ -0,0 +1,234 @@
+import atexit
+import threading
+import numpy as np
+import pytest
+import config
+import ann_index
+from database import VectorDatabase
+from conftest import make_texts
+
+class CountingIndex:
+    """
+    Wraps a FAISS index and counts add() calls.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.adds = []
+
+    def add(self, vectors):
+        self.adds.append(len(vectors))
+        return self.index.add(vectors)
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+@pytest.fixture
+def vector_db(data_dir, fake_embeddings):
+    db = VectorDatabase()
+    yield db
+    if isinstance(db.index, CountingIndex):
+        db.index = db.index.index
+    db.close()
+
+def test_add_documents_embeds_in_size_capped_batches(vector_db, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(config, "EMBEDDING_BATCH_SIZE", 100)
+    vector_db.index = CountingIndex(vector_db.index)
+    texts = make_texts(250)
+
+    result = vector_db.add_documents(texts, [{"title": f"doc {i}"} for i in range(len(texts))])
+
+    assert result["added"] == 250
+    assert [len(call) for call in fake_embeddings.calls] == [100, 100, 50]
+    assert vector_db.index.adds == [100, 100, 50]
+    assert vector_db.index.ntotal == 250
+
+def test_add_documents_caps_batches_by_characters(vector_db, fake_embeddings, monkeypatch):
+    texts = make_texts(10)
+    monkeypatch.setattr(config, "EMBEDDING_BATCH_MAX_CHARS", 3 * max(map(len, texts)))
+    vector_db.index = CountingIndex(vector_db.index)
+
+    vector_db.add_documents(texts)
+
+    assert [len(call) for call in fake_embeddings.calls] == [3, 3, 3, 1]
+    assert vector_db.index.adds == [3, 3, 3, 1]
+
+def test_add_documents_skips_duplicates_before_embedding(vector_db, fake_embeddings):
+    texts = make_texts(5)
+    vector_db.add_documents(texts)
+    calls = len(fake_embeddings.calls)
+
+    result = vector_db.add_documents(texts)
+
+    assert result == {"total_docs": 5, "added": 0, "replaced": 0, "skipped": 5}
+    assert len(fake_embeddings.calls) == calls
+
+def test_add_document_is_one_call(vector_db, fake_embeddings):
+    vector_db.add_document(make_texts(1)[0], {"title": "one"})
+
+    assert len(fake_embeddings.calls) == 1
+    assert vector_db.search(make_texts(1)[0], k=1)["hits"][0]["metadata"]["title"] == "one"
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf_flat", "ivf_pq"])
+def test_reopened_index_accepts_new_documents(data_dir, fake_embeddings, monkeypatch, kind):
+    monkeypatch.setattr(config, "FAISS_MMAP", True)
+    monkeypatch.setattr(config, "VECTOR_INDEX_TYPE", kind)
+    monkeypatch.setattr(config, "INDEX_PROMOTION_THRESHOLD", 300)
+    texts = make_texts(320)
+    db = VectorDatabase()
+    db.add_documents(texts[:300])
+    assert ann_index.index_type(db.index) == kind
+    db.close()
+
+    # Reopen after a crash, so the write-ahead log is replayed into the index.
+    db = VectorDatabase()
+    db.add_documents(texts[300:310])
+    atexit.unregister(db.close)
+    db = VectorDatabase()
+    db.add_document(texts[310])
+    db.add_documents(texts[311:])
+
+    assert ann_index.index_type(db.index) == kind
+    assert db.index.ntotal == len(db.documents) == 320
+    db.close()
+
+def test_search_while_ingesting(vector_db, monkeypatch):
+    # FAISS add() reallocates the vectors that search() reads; without the
+    # readers/writer lock this crashes the interpreter.
+    monkeypatch.setattr(config, "EMBEDDING_BATCH_SIZE", 20)
+    texts = make_texts(2000, words=20, seed=1)
+    vector_db.add_documents(texts[:20])
+    errors = []
+    done = threading.Event()
+
+    def ingest():
+        try:
+            vector_db.add_documents(texts[20:])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def search(seed):
+        queries = make_texts(4, words=10, seed=seed)
+        try:
+            while not done.is_set():
+                for result in vector_db.search_many(queries, k=5):
+                    assert len(result["hits"]) == 5
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=ingest)] + [threading.Thread(target=search, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert vector_db.index.ntotal == len(vector_db.documents) == 2000
+
+def test_instances_sharing_a_store_see_each_others_writes(data_dir, fake_embeddings):
+    # Stands in for --serve, --refresh-daemon and a cron --update running
+    # side by side: each VectorDatabase locks the store file while writing.
+    texts = make_texts(60, seed=2)
+    first, second = VectorDatabase(), VectorDatabase()
+    first.add_documents(texts[:20])
+    second.add_documents(texts[20:40])
+    first.add_documents(texts[40:])
+
+    for db in (first, second):
+        assert db.search(texts[30], k=1)["hits"][0]["text"] == texts[30]
+        assert db.search(texts[50], k=1)["hits"][0]["text"] == texts[50]
+        assert db.index.ntotal == len(db.documents) == 60
+    second.close()
+    first.close()
+
+    db = VectorDatabase()
+    assert db.index.ntotal == len(db.documents) == 60
+    assert [db.documents.get_text(i) for i in range(60)] == texts
+    db.close()
+
+def test_concurrent_writers_sharing_a_store(data_dir, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(config, "EMBEDDING_BATCH_SIZE", 10)
+    texts = make_texts(200, words=20, seed=3)
+    writers = [VectorDatabase(), VectorDatabase()]
+    errors = []
+
+    def ingest(db, chunk):
+        try:
+            for start in range(0, len(chunk), 10):
+                db.add_documents(chunk[start:start + 10])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=ingest, args=(db, texts[i::2])) for i, db in enumerate(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for db in writers:
+        db.close()
+
+    assert errors == []
+    db = VectorDatabase()
+    assert db.index.ntotal == len(db.documents) == 200
+    assert sorted(db.documents.get_text(i) for i in range(200)) == sorted(texts)
+    for text in texts[::25]:
+        assert db.search(text, k=1)["hits"][0]["text"] == text
+    db.close()
+
+@pytest.fixture
+def passage_db(data_dir, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(config, "PASSAGE_INDEX_ENABLED", True)
+    monkeypatch.setattr(config, "PASSAGE_CHARS", 200)
+    monkeypatch.setattr(config, "PASSAGE_OVERLAP_CHARS", 40)
+    db = VectorDatabase()
+    yield db
+    db.close()
+
+def first_passage(db, doc_id):
+    # The fake embeddings are not semantic; a passage's own text finds it.
+    i = int(np.searchsorted(db.passages.parent, doc_id))
+    return db.documents.get_text(doc_id)[db.passages.start[i]:db.passages.end[i]]
+
+def test_passage_mode_embeds_only_passages(passage_db, fake_embeddings):
+    texts = make_texts(20)
+
+    passage_db.add_documents(texts)
+
+    embedded = [text for call in fake_embeddings.calls for text in call]
+    assert len(fake_embeddings.calls) == 1
+    assert not set(texts) & set(embedded)
+    assert len(embedded) == len(passage_db.passages) == passage_db.passage_index.ntotal
+    assert passage_db.passages.indexed_docs == passage_db.index.ntotal == 20
+    hit = passage_db.search(first_passage(passage_db, 7), k=1)["hits"][0]
+    assert hit["text"] == first_passage(passage_db, 7).strip()
+    assert hit["distance"] < 1e-4
+
+@pytest.mark.parametrize("exact_scan_max", [0, 4096])
+def test_passage_search_skips_filtered_and_replaced_documents(passage_db, monkeypatch, exact_scan_max):
+    monkeypatch.setattr(config, "FILTER_EXACT_SCAN_MAX", exact_scan_max)
+    texts = make_texts(40, seed=4)
+    metadatas = [{"type": "news" if i % 2 else "stats", "url": f"https://example.com/{i}"} for i in range(40)]
+    passage_db.add_documents(texts, metadatas)
+    replacement = make_texts(1, seed=5)[0]
+    passage_db.add_documents([replacement], [{"type": "news", "url": "https://example.com/3"}])
+    parents = passage_db.passages.parent
+
+    def hit_urls(query, filters=None):
+        hits = passage_db.search(query, k=40, filters=filters)["hits"]
+        assert all(np.diff([hit["distance"] for hit in hits]) >= 0)
+        return [hit["metadata"]["url"] for hit in hits]
+
+    replaced = first_passage(passage_db, 3)
+
+    hits = passage_db.search(replaced, k=40)["hits"]
+    assert len(hits) == 40 and all(hit["distance"] > 1e-4 for hit in hits)
+    assert set(parents[passage_db._deleted_passages]) == {3}
+
+    news = hit_urls(first_passage(passage_db, 5), {"type": "news"})
+    assert news[0] == "https://example.com/5"
+    assert sorted(news) == sorted(f"https://example.com/{i}" for i in range(1, 40, 2))
+    assert hit_urls(replaced, {"type": "news"}).count("https://example.com/3") == 1
+    stats = hit_urls(first_passage(passage_db, 4), {"type": "stats"})
+    assert stats[0] == "https://example.com/4"
+    assert sorted(stats) == sorted(f"https://example.com/{i}" for i in range(0, 40, 2))
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+def vector(seed: int, dimension: int = 8):
+    return np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+
+def test_file_grows_on_demand(tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingCache, "INITIAL_ROWS", 4)
+    cache = EmbeddingCache(str(tmp_path), 8, 100)
+    assert os.path.getsize(cache.vectors_path) == 4 * 8 * 4
+
+    for i in range(10):
+        cache.put("model", f"text {i}", vector(i))
+
+    assert cache.rows == 16
+    assert os.path.getsize(cache.vectors_path) == 16 * 8 * 4
+    assert all(np.array_equal(cache.get("model", f"text {i}"), vector(i)) for i in range(10))
+
+def test_reopen_keeps_entries_and_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingCache, "INITIAL_ROWS", 4)
+    cache = EmbeddingCache(str(tmp_path), 8, 100)
+    for i in range(6):
+        cache.put("model", f"text {i}", vector(i))
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), 8, 100)
+
+    assert reopened.rows == 8
+    assert np.array_equal(reopened.get("model", "text 5"), vector(5))
+    reopened.put("model", "text 6", vector(6))
+    assert reopened.slots[EmbeddingCache.make_key("model", "text 6")] == 6
+
+def test_growth_stops_at_capacity_and_evicts(tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingCache, "INITIAL_ROWS", 4)
+    cache = EmbeddingCache(str(tmp_path), 8, 6)
+    for i in range(8):
+        cache.put("model", f"text {i}", vector(i))
+
+    assert cache.rows == 6
+    assert cache.evictions == 2
+    assert cache.get("model", "text 0") is None
+    assert np.array_equal(cache.get("model", "text 7"), vector(7))
@@ -0,0 +1,29 @@
+import json
+import sys
+import advisor_client
+import main
+
+class FakeAdvisorClient:
+    def __init__(self, url):
+        print("Warning: a diagnostic that must not reach the records")
+
+    def get_player_recommendations(self, player_names):
+        for name in player_names:
+            if name == "Unknown":
+                yield {"player": name, "error": "no data"}
+            else:
+                yield {"player": name, "error": None, "recommendation": f"Pick {name}"}
+
+def test_players_file_writes_only_json_lines_to_stdout(tmp_path, monkeypatch, capsys):
+    players = tmp_path / "players.txt"
+    players.write_text("Virat Kohli\n# comment\nUnknown\nJasprit Bumrah\n")
+    monkeypatch.setattr(advisor_client, "AdvisorClient", FakeAdvisorClient)
+    monkeypatch.setattr(sys, "argv", ["main.py", "--players-file", str(players), "--server", "http://127.0.0.1:1"])
+
+    main.main()
+
+    out, err = capsys.readouterr()
+    records = [json.loads(line) for line in out.splitlines()]
+    assert [rec["player"] for rec in records] == ["Virat Kohli", "Unknown", "Jasprit Bumrah"]
+    assert "Warning: a diagnostic" in err and "Starting" in err
+    assert "players/s" in err and "1 errors" in err
@@ -0,0 +1,99 @@
+from itertools import combinations
+import numpy as np
+import pytest
+from optimizer import LineupOptimizer, ROLES
+
+SMALL_LIMITS = {
+    "team_size": 6,
+    "max_per_team": 4,
+    "role_limits": {"WK": (1, 2), "BAT": (1, 3), "AR": (1, 2), "BOWL": (1, 3)},
+}
+
+def random_pool(rng, size: int, teams: int = 3):
+    # Every role appears about size / 4 times, so most pools are feasible.
+    roles = rng.permutation([ROLES[i % len(ROLES)] for i in range(size)])
+    return [{
+        "name": f"p{i}",
+        "team": f"T{rng.integers(teams)}",
+        "role": str(roles[i]),
+        "credits": float(rng.choice([rng.integers(12, 23) / 2, round(rng.uniform(6, 11), 2)])),
+        "projection": float(rng.choice([rng.integers(10, 80), round(rng.uniform(10, 80), 1)])),
+    } for i in range(size)]
+
+def brute_force(optimizer, players: list, top_n: int):
+    """
+    Values of the top_n lineups, by scoring every combination.
+    """
+    values = []
+    for chosen in combinations(players, optimizer.team_size):
+        roles = [sum(p["role"] == role for p in chosen) for role in ROLES]
+        if any(not optimizer.role_limits[role][0] <= n <= optimizer.role_limits[role][1] for role, n in zip(ROLES, roles)):
+            continue
+        if sum(p["credits"] for p in chosen) > optimizer.credit_limit + 1e-9:
+            continue
+        if max(sum(p["team"] == q["team"] for q in chosen) for p in chosen) > optimizer.max_per_team:
+            continue
+        scores = sorted((p["projection"] for p in chosen), reverse=True)
+        values.append(sum(scores) + (optimizer.captain_multiplier - 1) * scores[0]
+                      + (optimizer.vice_captain_multiplier - 1) * scores[1])
+    return sorted(values, reverse=True)[:top_n]
+
+def check_lineup(optimizer, players: list, lineup: dict):
+    by_name = {p["name"]: p for p in players}
+    chosen = [by_name[name] for name in lineup["players"]]
+    assert len(set(lineup["players"])) == optimizer.team_size
+    assert sum(p["credits"] for p in chosen) <= optimizer.credit_limit + 1e-9
+    assert max(lineup["teams"].values()) <= optimizer.max_per_team
+    for role in ROLES:
+        low, high = optimizer.role_limits[role]
+        assert low <= lineup["roles"][role] <= high
+    assert by_name[lineup["captain"]]["projection"] == max(p["projection"] for p in chosen)
+    scores = sorted((p["projection"] for p in chosen), reverse=True)
+    assert by_name[lineup["vice_captain"]]["projection"] == scores[1]
+
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_exhaustive_search_on_small_pools(seed):
+    rng = np.random.default_rng(seed)
+    players = random_pool(rng, int(rng.integers(8, 13)))
+    optimizer = LineupOptimizer(credit_limit=float(rng.uniform(46, 60)), **SMALL_LIMITS)
+    top_n = int(rng.integers(1, 4))
+
+    lineups = optimizer.optimize(players, top_n)
+
+    expected = brute_force(optimizer, players, top_n)
+    assert [lineup["projected_points"] for lineup in lineups] == pytest.approx(expected)
+    for lineup in lineups:
+        check_lineup(optimizer, players, lineup)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_exhaustive_search_with_default_limits(seed):
+    rng = np.random.default_rng(100 + seed)
+    players = random_pool(rng, 15)
+    optimizer = LineupOptimizer(credit_limit=90.0)
+
+    lineups = optimizer.optimize(players, 3)
+
+    assert [lineup["projected_points"] for lineup in lineups] == pytest.approx(brute_force(optimizer, players, 3))
+    for lineup in lineups:
+        check_lineup(optimizer, players, lineup)
+
+@pytest.mark.parametrize("change", ["roles", "credits", "teams", "size"])
+def test_infeasible_pool_has_no_lineup(change):
+    rng = np.random.default_rng(7)
+    players = random_pool(rng, 12)
+    for i, player in enumerate(players):
+        player["role"] = ROLES[i % len(ROLES)]
+        player["team"] = f"T{i % 2}"
+    limits = dict(SMALL_LIMITS, credit_limit=200.0)
+    if change == "roles":
+        players = [p for p in players if p["role"] != "WK"]
+    elif change == "credits":
+        limits["credit_limit"] = 6 * min(p["credits"] for p in players) - 0.5
+    elif change == "teams":
+        limits["max_per_team"] = 2
+    else:
+        players = players[:5]
+    optimizer = LineupOptimizer(**limits)
+
+    assert optimizer.optimize(players, 3) == []
+    assert brute_force(optimizer, players, 3) == []
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+import pytest
+import config
+from database import VectorDatabase
+from refresh import KnowledgeBaseRefresher
+from conftest import make_texts
+
+class FakeFetcher:
+    """
+    Returns the given texts as search results for every topic.
+    """
+    def __init__(self, texts):
+        self.texts = texts
+
+    def fetch_since(self, method, since=None, **params):
+        return [SimpleNamespace(text=text, title=f"result {i}", url=f"https://example.com/{i}", published_date=None)
+                for i, text in enumerate(self.texts)]
+
+@pytest.fixture
+def make_refresher(data_dir, fake_embeddings):
+    dbs = []
+
+    def make(texts):
+        db = VectorDatabase()
+        dbs.append(db)
+        topics = [{"key": "team:India", "kind": "team", "method": "get_team_news", "params": {"team_name": "India"}}]
+        return KnowledgeBaseRefresher(db, FakeFetcher(texts), topics)
+
+    yield make
+    for db in dbs:
+        db.close()
+
+def test_refresh_skips_near_duplicates_before_embedding(make_refresher, fake_embeddings):
+    stored = make_texts(3, words=200, seed=6)
+    near_duplicate = stored[0] + " w1"
+    refresher = make_refresher([near_duplicate])
+    refresher.vector_db.add_documents(stored)
+    calls = len(fake_embeddings.calls)
+
+    stats = refresher.run_once()
+
+    assert stats["skipped"] == 1 and stats["added"] == 0
+    assert len(fake_embeddings.calls) == calls
+    assert stats["topics_refreshed"] == 1
+
+def test_refresh_in_passage_mode_embeds_only_passages(make_refresher, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(config, "PASSAGE_INDEX_ENABLED", True)
+    monkeypatch.setattr(config, "PASSAGE_CHARS", 200)
+    monkeypatch.setattr(config, "PASSAGE_OVERLAP_CHARS", 40)
+    texts = make_texts(5, seed=7)
+    refresher = make_refresher(texts)
+
+    stats = refresher.run_once()
+
+    embedded = {text for call in fake_embeddings.calls for text in call}
+    assert stats["added"] == 5
+    assert not embedded & set(texts)
+    assert len(embedded) == len(refresher.vector_db.passages)
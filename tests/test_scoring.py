@@ -0,0 +1,54 @@
+import re
+import pytest
+import scoring
+
+# The per-method formulas that scoring.py replaced, kept as the reference.
+STATS_RE = re.compile(r'\b\d+(?:\.\d+)?\s*(?:runs|wickets|average|strike rate|economy|points)\b')
+YEAR_RE = re.compile(r'\b(20\d{2})\b')
+
+def old_assess(context: str, current_year: int):
+    length_score = min(len(context) / 10000, 1.0)
+    stats_score = min(len(STATS_RE.findall(context.lower())) / 20, 1.0)
+    years = [int(y) for y in YEAR_RE.findall(context)]
+    recency_score = 0.5
+    if years:
+        recency_score = len([y for y in years if y >= current_year - 1]) / max(len(years), 1)
+    return 0.6 * length_score + 0.4 * stats_score, recency_score, stats_score
+
+def old_confidence(response: str, data_quality, data_recency, data_relevance):
+    certainty_factor = 1.0
+    for phrase in scoring.UNCERTAINTY_PHRASES:
+        if phrase in response.lower():
+            certainty_factor *= 0.9
+    confidence = (0.4 * data_quality + 0.3 * data_recency + 0.3 * data_relevance) * certainty_factor
+    return min(max(confidence, 0.0), 1.0)
+
+CONTEXTS = [
+    "",
+    "No numbers here at all.",
+    "Kohli scored 973 runs in 2016 at an average of 81.08 and a Strike Rate of 152.",
+    "He took 24 Wickets in 2025, 18 wickets in 2024 and 9 wickets in 2019; economy 7.1 economy.",
+    "2024 runs across 2023 and 2024.5 points, then 12.5 points and 3 runs in 2026.",
+    "Form might improve, possibly, but it is UNCLEAR and there is limited information. It may rain.",
+    "Bumrah: 20 wickets " * 30 + "in 2025",
+    "x" * 12000 + " 5 runs in 2010",
+]
+
+@pytest.mark.parametrize("context", CONTEXTS)
+def test_single_pass_scores_match_the_old_formulas(context):
+    signals = scoring.scan(context)
+
+    assert scoring.quality(signals, current_year=2025) == pytest.approx(old_assess(context, 2025))
+    for response in CONTEXTS:
+        expected = old_confidence(response, *old_assess(context, 2025))
+        assert scoring.confidence(response, *scoring.quality(signals, 2025)) == pytest.approx(expected)
+        assert scoring.confidence(scoring.scan(response), *scoring.quality(signals, 2025)) == pytest.approx(expected)
+
+def test_merged_signals_match_a_scan_of_the_joined_text():
+    parts = CONTEXTS[2:6]
+    merged = scoring.merge(scoring.scan(part) for part in parts)
+    joined = scoring.scan("\n".join(parts))
+
+    assert merged["stats"] == joined["stats"]
+    assert merged["years"] == joined["years"]
+    assert merged["phrases"] == joined["phrases"]
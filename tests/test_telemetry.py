@@ -0,0 +1,133 @@
+import os
+import threading
+import pytest
+from telemetry import TelemetryExporter
+
+class FakeLangSmithClient:
+    """
+    Records batch_ingest_runs and create_feedback calls. While down is set
+    every call fails; while gate is cleared, batch_ingest_runs blocks.
+    """
+    def __init__(self):
+        self.batches = []
+        self.feedback = []
+        self.down = False
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def batch_ingest_runs(self, create=None, **kwargs):
+        self.entered.set()
+        self.gate.wait(5)
+        if self.down:
+            raise ConnectionError("backend unavailable")
+        self.batches.append([run["id"] for run in create])
+
+    def create_feedback(self, **kwargs):
+        if self.down:
+            raise ConnectionError("backend unavailable")
+        self.feedback.append(kwargs)
+
+    @property
+    def run_ids(self):
+        return [run_id for batch in self.batches for run_id in batch]
+
+def run(i: int) -> dict:
+    return {"id": f"run-{i}", "trace_id": f"run-{i}", "dotted_order": f"20260101T000000000000Zrun-{i}", "name": "test"}
+
+@pytest.fixture
+def client():
+    return FakeLangSmithClient()
+
+@pytest.fixture
+def make_exporter(client):
+    exporters = []
+
+    def make(**kwargs):
+        kwargs.setdefault("flush_interval", 0.01)
+        exporter = TelemetryExporter(client, **kwargs)
+        exporters.append(exporter)
+        return exporter
+
+    yield make
+    for exporter in exporters:
+        exporter.close()
+
+def test_runs_are_sent_in_batches(client, make_exporter):
+    exporter = make_exporter(batch_size=10)
+    client.gate.clear()
+    exporter.submit_run(run(0))
+    assert client.entered.wait(5)
+    # Everything below queues up behind the blocked first call.
+    for i in range(1, 25):
+        exporter.submit_run(run(i))
+    exporter.submit_feedback({"run_id": "run-0", "key": "confidence", "score": 0.9})
+    client.gate.set()
+
+    assert exporter.flush(5)
+    assert [len(batch) for batch in client.batches] == [1, 10, 10, 4]
+    assert client.run_ids == [f"run-{i}" for i in range(25)]
+    assert client.feedback == [{"run_id": "run-0", "key": "confidence", "score": 0.9}]
+    assert exporter.stats()["runs_exported"] == 25
+    assert exporter.stats()["feedback_exported"] == 1
+
+def test_full_queue_drops_and_counts(client, make_exporter):
+    exporter = make_exporter(max_queue=2, batch_size=10)
+    client.gate.clear()
+    assert exporter.submit_run(run(0))
+    assert client.entered.wait(5)
+
+    accepted = [exporter.submit_run(run(i)) for i in range(1, 6)]
+    dropped_feedback = exporter.submit_feedback({"run_id": "run-0", "key": "k", "score": 1})
+    client.gate.set()
+
+    assert accepted == [True, True, False, False, False]
+    assert dropped_feedback is False
+    assert exporter.flush(5)
+    stats = exporter.stats()
+    assert stats["runs_dropped"] == 3
+    assert stats["feedback_dropped"] == 1
+    assert client.run_ids == ["run-0", "run-1", "run-2"]
+
+def test_spills_while_down_and_replays_on_recovery(client, make_exporter, tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    exporter = make_exporter(batch_size=10, spill_path=spill_path)
+    client.down = True
+    for i in range(3):
+        exporter.submit_run(run(i))
+    exporter.submit_feedback({"run_id": "run-0", "key": "confidence", "score": 0.5})
+
+    assert exporter.flush(5)
+    assert client.batches == [] and client.feedback == []
+    assert exporter.stats()["items_spilled"] == 4
+    assert os.path.exists(spill_path)
+
+    client.down = False
+    exporter.submit_run(run(3))
+
+    assert exporter.flush(5)
+    assert sorted(client.run_ids) == [f"run-{i}" for i in range(4)]
+    assert client.feedback == [{"run_id": "run-0", "key": "confidence", "score": 0.5}]
+    assert exporter.stats()["items_replayed"] == 4
+    assert not os.path.exists(spill_path)
+
+def test_spill_disabled_drops_failed_batches(client, make_exporter):
+    exporter = make_exporter(batch_size=10, spill_path=None)
+    client.down = True
+    exporter.submit_run(run(0))
+
+    assert exporter.flush(5)
+    assert exporter.stats()["runs_dropped"] == 1
+
+def test_close_flushes_pending_items(client, make_exporter):
+    exporter = make_exporter(batch_size=10, flush_interval=60)
+    for i in range(15):
+        exporter.submit_run(run(i))
+    exporter.submit_feedback({"run_id": "run-1", "key": "k", "score": 1})
+
+    exporter.close(timeout=5)
+
+    assert client.run_ids == [f"run-{i}" for i in range(15)]
+    assert len(client.feedback) == 1
+    assert exporter.submit_run(run(99)) is False
+    assert exporter.stats()["runs_dropped"] == 1